@@ -1,32 +1,207 @@
 # api_gateway/app.py
-from flask import Flask, jsonify, request
-import requests
+import hashlib
+import os
+import sys
+import time
+from functools import wraps
+# Módulos compartidos entre el gateway y los servicios (common/, en la raíz del proyecto)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import Flask, Response, g, jsonify, request
 from requests.exceptions import ConnectionError, Timeout, RequestException
+from werkzeug.wsgi import ClosingIterator
+from config import (AUTH_SERVICE_URL, USER_SERVICE_URL, TASK_SERVICE_URL, GATEWAY_PORT,
+                    PROXY_MODE, STREAM_CHUNK_SIZE, HEALTH_TIMEOUT, UPSTREAM_TIMEOUT,
+                    CACHE_ENABLED, SINGLEFLIGHT_ENABLED, SINGLEFLIGHT_MAX_BYTES, EDGE_AUTH_ENABLED,
+                    RATE_LIMIT_ENABLED, COMPRESSION_ENABLED, COMPRESSION_MIN_SIZE, GZIP_LEVEL,
+                    BROTLI_ENABLED, BROTLI_LEVEL, TRACE_SAMPLE_RATE, TRACE_FILE, TRACE_COLLECTOR_URL)
+from upstream import get_pool, health_status, pool_stats, guard_stats, HOP_BY_HOP_HEADERS, REGENERATED_RESPONSE_HEADERS
+from cache import ResponseCache
+from singleflight import SingleFlight
+from batch import BatchRunner, BatchError
+from ratelimit import create_limiter
+from common.compression import Compressor
+from common import metrics
+from common import tracing
+from tokens import (IDENTITY_HEADER, TokenError, identity_header, token_memo,
+                    token_subject, verify_token)
 
 app = Flask(__name__)
+metrics.install(app)
+tracing.install(app, 'api_gateway', TRACE_SAMPLE_RATE, TRACE_FILE, TRACE_COLLECTOR_URL, edge=True)
 
-# URLs de los microservicios
-AUTH_SERVICE_URL = 'http://localhost:5001'
-USER_SERVICE_URL = 'http://localhost:5002'
-TASK_SERVICE_URL = 'http://localhost:5003'  # Task Service
+UPSTREAM_LATENCY = metrics.registry.histogram(
+    'gateway_upstream_duration_seconds', 'Tiempo hasta recibir las cabeceras de la respuesta del servicio',
+    ('service', 'outcome'))
+UPSTREAM_ERRORS = metrics.registry.counter(
+    'gateway_upstream_errors_total', 'Llamadas a servicios sin respuesta (conexión, timeout u otro error)',
+    ('service', 'outcome'))
 
-def proxy_request(service_url, path):
-    """Función auxiliar para hacer proxy de requests"""
-    url = f"{service_url}/{path}"
-    
+# Caché de lecturas de tareas, por usuario
+task_cache = ResponseCache()
+# Agrupación de lecturas idénticas concurrentes
+flights = SingleFlight()
+# Ejecución de POST /batch
+batches = BatchRunner(app)
+# Límite de peticiones por cliente y grupo de rutas
+limiter = create_limiter()
+# Compresión de las respuestas al cliente
+compressor = Compressor(COMPRESSION_MIN_SIZE, GZIP_LEVEL, BROTLI_LEVEL, BROTLI_ENABLED)
+
+class _BodyStream:
+    """Cuerpo de la petición entrante leído por bloques con longitud conocida"""
+
+    def __init__(self, stream, length):
+        self._stream = stream
+        # requests usa este atributo para enviar Content-Length en vez de chunked
+        self.len = length
+
+    def read(self, size=-1):
+        return self._stream.read(size)
+
+
+def _upstream_headers():
+    """Cabeceras de la petición que se reenvían al servicio"""
     headers = {}
     for key, value in request.headers:
-        if key.lower() != 'host':
+        lower = key.lower()
+        if lower != 'host' and lower != 'content-length' and lower not in HOP_BY_HOP_HEADERS:
             headers[key] = value
+    # La identidad solo la puede enviar el gateway, nunca el cliente; la traza tampoco
+    # (_traced_request añade la del gateway)
+    headers.pop(IDENTITY_HEADER, None)
+    headers.pop(tracing.TRACEPARENT_HEADER, None)
+    identity = g.get('identity')
+    if identity:
+        headers[IDENTITY_HEADER] = identity
+    return headers
+
+
+def edge_authenticated(f):
+    """
+    Con GATEWAY_EDGE_AUTH, verificar el token en el gateway: los tokens no válidos
+    se rechazan sin llamar al servicio y los válidos viajan como X-Identity firmada.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if EDGE_AUTH_ENABLED:
+            try:
+                claims = verify_token(request.headers.get('Authorization'))
+            except TokenError as e:
+                return jsonify({"error": str(e)}), 401
+            g.subject = claims['sub']
+            g.identity = identity_header(claims)
+        return f(*args, **kwargs)
+    return decorated
+
+
+def _upstream_body():
+    """Cuerpo de la petición entrante como stream, sin cargarlo en memoria"""
+    if request.content_length:
+        return _BodyStream(request.stream, request.content_length)
+    if request.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+        return iter(lambda: request.stream.read(STREAM_CHUNK_SIZE), b'')
+    return None
+
+
+def _passthrough_headers(resp):
+    """Cabeceras de la respuesta del servicio que se devuelven al cliente"""
+    return [
+        (key, value) for key, value in resp.raw.headers.items()
+        if key.lower() not in HOP_BY_HOP_HEADERS and key.lower() not in REGENERATED_RESPONSE_HEADERS
+    ]
+
+
+def _stream_response(resp, on_close):
+    """Reenviar la respuesta del servicio por bloques y sin decodificarla"""
+    body = resp.raw.stream(STREAM_CHUNK_SIZE, decode_content=False)
+    # Con direct_passthrough el servidor recibe este iterable tal cual (sin los call_on_close de
+    # la respuesta) y llama a su close() al terminar: la conexión vuelve al pool, o se cierra si el
+    # cliente se desconectó antes, y se ejecuta on_close
+    body = ClosingIterator(body, [resp.close, on_close])
+    return Response(body, status=resp.status_code, headers=_passthrough_headers(resp),
+                    direct_passthrough=True)
+
+
+def _unavailable(message, retry_after):
+    """Respuesta 503 inmediata cuando el servicio no puede atender la petición"""
+    response = jsonify({"error": message})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def _timeout_route():
+    """
+    Ruta cuyo p99 fija el timeout de lectura de la petición actual, o None para usar el
+    timeout fijo: las escrituras (bcrypt, lotes) y los streams pueden tardar mucho más que el p99
+    """
+    if request.method not in ('GET', 'HEAD') or request.url_rule is None:
+        return None
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return None
+    return f"{request.method} {request.url_rule.rule}"
+
+
+def _record_upstream(pool, outcome, latency):
+    """Registrar el resultado de una llamada al servicio: código de estado o tipo de error"""
+    route = _timeout_route()
+    if isinstance(outcome, int):
+        pool.guard.record(outcome < 500, latency, route)
+        outcome = str(outcome)
+    else:
+        # Sin respuesta: solo el timeout cuenta como llamada lenta para el circuit breaker
+        pool.guard.record(False, latency if outcome == 'timeout' else None, route)
+        UPSTREAM_ERRORS.inc((pool.name, outcome))
+    UPSTREAM_LATENCY.observe(latency, (pool.name, outcome))
+
+
+def _traced_request(pool, path, **kwargs):
+    """Llamada al servicio medida como span CLIENT, con X-Request-ID y traceparent propagados"""
+    with tracing.span(f"{request.method} {pool.name}", kind='CLIENT', **{'peer.service': pool.name}) as client:
+        kwargs['headers'].update(tracing.outgoing_headers())
+        resp = pool.request(request.method, path, **kwargs)
+        client.tag('http.status_code', resp.status_code)
+        return resp
+
+
+def proxy_request(service_url, path):
+    """Función auxiliar para hacer proxy de requests"""
+    pool = get_pool(service_url)
+    guard = pool.guard
+    if request.query_string:
+        path = f"{path}?{request.query_string.decode('latin-1')}"
     
+    rejection = guard.admit()
+    if rejection:
+        return _unavailable(*rejection)
+    
+    # En modo stream el hueco y la réplica se liberan cuando termina de enviarse el cuerpo
+    release_now = True
+    resp = None
+    started = time.monotonic()
     try:
-        resp = requests.request(
-            method=request.method,
-            url=url,
+        if PROXY_MODE == 'stream':
+            resp = _traced_request(
+                pool,
+                path,
+                data=_upstream_body(),
+                headers=_upstream_headers(),
+                timeout=guard.timeout(_timeout_route()),
+                stream=True
+            )
+            _record_upstream(pool, resp.status_code, time.monotonic() - started)
+            response = _stream_response(resp, lambda: (pool.release(resp), guard.release()))
+            release_now = False
+            return response
+
+        resp = _traced_request(
+            pool,
+            path,
             json=request.get_json() if request.is_json else None,
-            headers=headers,
-            timeout=30
+            headers=_upstream_headers(),
+            timeout=guard.timeout(_timeout_route())
         )
+        _record_upstream(pool, resp.status_code, time.monotonic() - started)
         
         # Intentar devolver JSON, si no es posible devolver texto
         try:
@@ -35,21 +210,177 @@ def proxy_request(service_url, path):
             return resp.text, resp.status_code
             
     except ConnectionError:
+        _record_upstream(pool, 'connection_error', time.monotonic() - started)
         return jsonify({"error": "Servicio no disponible"}), 503
     except Timeout:
+        _record_upstream(pool, 'timeout', time.monotonic() - started)
         return jsonify({"error": "Timeout del servicio"}), 504
     except RequestException as e:
+        _record_upstream(pool, 'error', time.monotonic() - started)
         return jsonify({"error": f"Error en la solicitud: {str(e)}"}), 500
+    finally:
+        if release_now:
+            if resp is not None:
+                pool.release(resp)
+            guard.release()
+
+
+class SharedResponse:
+    """Respuesta de un servicio leída completa, que se puede cachear o compartir"""
+
+    __slots__ = ('status', 'headers', 'body')
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+def _shared_to_response(shared, cache_state=None):
+    """Construir la respuesta al cliente a partir de una respuesta compartida o cacheada"""
+    response = Response(shared.body, status=shared.status, headers=shared.headers)
+    if cache_state:
+        response.headers['X-Cache'] = cache_state
+    return response
+
+
+def _request_subject():
+    """Usuario del token de la petición actual (se valida una sola vez por petición)"""
+    if 'subject' not in g:
+        g.subject = token_subject(request.headers.get('Authorization'))
+    return g.subject
+
+
+def _identity_key():
+    """Identidad de quien hace la petición, para no compartir respuestas entre usuarios"""
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return ''
+    subject = _request_subject()
+    if subject is not None:
+        return f"sub:{subject}"
+    return f"auth:{hashlib.sha256(auth_header.encode('utf-8')).hexdigest()}"
+
+
+def rate_limited(group):
+    """Limitar las peticiones de cada cliente (usuario del token o IP) al grupo de rutas"""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not RATE_LIMIT_ENABLED:
+                return f(*args, **kwargs)
+            subject = _request_subject()
+            client = f"sub:{subject}" if subject is not None else f"ip:{request.remote_addr}"
+            decision = limiter.check(group, client)
+            if not decision.allowed:
+                response = jsonify({"error": "Demasiadas peticiones, intente más tarde"})
+                response.status_code = 429
+            else:
+                response = app.make_response(f(*args, **kwargs))
+            response.headers.update(decision.headers())
+            return response
+        return decorated
+    return decorator
+
+
+def _buffered_fetch(service_url, path, max_bytes):
+    """Hacer la petición y, si la respuesta es pequeña, leerla completa para compartirla"""
+    response = app.make_response(proxy_request(service_url, path))
+    length = response.content_length
+    if length is None or length > max_bytes:
+        return response, False
+    
+    body = b''.join(response.iter_encoded())
+    response.close()
+    headers = [(k, v) for k, v in response.headers.items() if k.lower() != 'content-length']
+    return SharedResponse(response.status_code, headers, body), True
+
+
+def read_proxy(service_url, path, max_bytes=SINGLEFLIGHT_MAX_BYTES):
+    """
+    Proxy para lecturas idempotentes: las peticiones idénticas concurrentes
+    comparten una sola llamada al servicio.
+
+    Devuelve (SharedResponse o Response, es_lider).
+    """
+    if not SINGLEFLIGHT_ENABLED or request.method != 'GET':
+        return _buffered_fetch(service_url, path, max_bytes)[0], True
+    
+    key = (request.method, request.path, request.query_string, _identity_key(),
+           request.headers.get('Accept-Encoding', ''))
+    value, leader = flights.do(
+        key,
+        lambda: _buffered_fetch(service_url, path, max_bytes),
+        timeout=UPSTREAM_TIMEOUT + 5
+    )
+    if value is None:
+        # La respuesta del líder no se podía compartir: hacer la llamada propia
+        return _buffered_fetch(service_url, path, max_bytes)[0], True
+    return value, leader
+
+
+def coalesced_proxy(service_url, path):
+    """Proxy de lecturas con agrupación de peticiones idénticas"""
+    value, _ = read_proxy(service_url, path)
+    if isinstance(value, SharedResponse):
+        return _shared_to_response(value)
+    return value
+
+
+def cached_proxy(service_url, path):
+    """Proxy con caché por usuario para las lecturas de tareas"""
+    subject = _request_subject()
+    if not CACHE_ENABLED or subject is None:
+        return coalesced_proxy(service_url, path)
+    
+    key = (subject, request.full_path, request.headers.get('Accept-Encoding', ''))
+    entry = task_cache.get(key)
+    if entry is not None:
+        return _shared_to_response(entry, 'HIT')
+    
+    generation = task_cache.generation(subject)
+    value, leader = read_proxy(service_url, path, max_bytes=task_cache.max_entry_bytes)
+    if not isinstance(value, SharedResponse):
+        return value
+    
+    if leader and value.status == 200 and not any(
+            k.lower() == 'cache-control' and 'no-store' in v for k, v in value.headers):
+        task_cache.put(key, subject, value.status, value.headers, value.body, generation)
+    return _shared_to_response(value, 'MISS')
+
+
+def invalidating_proxy(service_url, path):
+    """Proxy para escrituras de tareas: invalida la caché del usuario si tiene éxito"""
+    response = app.make_response(proxy_request(service_url, path))
+    if CACHE_ENABLED and response.status_code < 400:
+        subject = _request_subject()
+        if subject is not None:
+            task_cache.invalidate(subject)
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    """Comprimir la respuesta si el cliente lo acepta y el servicio no la comprimió ya"""
+    if not COMPRESSION_ENABLED:
+        return response
+    return compressor.compress(response, request.headers.get('Accept-Encoding'), request.method)
 
 
 @app.route('/auth/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
+@rate_limited('auth')
 def auth_proxy(path):
     """Proxy para el servicio de autenticación"""
+    if request.method == 'GET':
+        return coalesced_proxy(AUTH_SERVICE_URL, path)
     return proxy_request(AUTH_SERVICE_URL, path)
 
 @app.route('/user/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
+@rate_limited('user')
 def user_proxy(path):
     """Proxy para el servicio de usuarios"""
+    if request.method == 'GET':
+        return coalesced_proxy(USER_SERVICE_URL, path)
     return proxy_request(USER_SERVICE_URL, path)
 
 # ===========================================
@@ -58,87 +389,160 @@ def user_proxy(path):
 
 # Endpoints de autenticación del Task Service
 @app.route('/login', methods=['POST'])
+@rate_limited('auth')
 def login_proxy():
     """Proxy directo para login del Task Service"""
     return proxy_request(TASK_SERVICE_URL, 'login')
 
 @app.route('/register', methods=['POST'])
+@rate_limited('auth')
 def register_proxy():
     """Proxy directo para registro del Task Service"""
     return proxy_request(TASK_SERVICE_URL, 'register')
 
+@app.route('/refresh', methods=['POST'])
+@rate_limited('auth')
+def refresh_proxy():
+    """Proxy directo para renovar el token con un refresh token"""
+    return proxy_request(TASK_SERVICE_URL, 'refresh')
+
+@app.route('/logout', methods=['POST'])
+@rate_limited('auth')
+def logout_proxy():
+    """Proxy directo para cerrar la sesión (revocar el refresh token)"""
+    return proxy_request(TASK_SERVICE_URL, 'logout')
+
 # Endpoints principales de tareas
 @app.route('/tasks', methods=['GET'])
+@rate_limited('task')
+@edge_authenticated
 def get_tasks_proxy():
     """Proxy para obtener todas las tareas"""
-    return proxy_request(TASK_SERVICE_URL, 'tasks')
+    return cached_proxy(TASK_SERVICE_URL, 'tasks')
 
 @app.route('/task', methods=['POST'])
+@rate_limited('task')
+@edge_authenticated
 def create_task_proxy():
     """Proxy para crear una nueva tarea"""
-    return proxy_request(TASK_SERVICE_URL, 'task')
+    return invalidating_proxy(TASK_SERVICE_URL, 'task')
 
 @app.route('/task/<int:task_id>', methods=['GET'])
+@rate_limited('task')
+@edge_authenticated
 def get_task_proxy(task_id):
     """Proxy para obtener una tarea específica"""
-    return proxy_request(TASK_SERVICE_URL, f'task/{task_id}')
+    return cached_proxy(TASK_SERVICE_URL, f'task/{task_id}')
 
 @app.route('/task/<int:task_id>', methods=['PUT'])
+@rate_limited('task')
+@edge_authenticated
 def update_task_proxy(task_id):
     """Proxy para actualizar una tarea"""
-    return proxy_request(TASK_SERVICE_URL, f'task/{task_id}')
+    return invalidating_proxy(TASK_SERVICE_URL, f'task/{task_id}')
 
 @app.route('/task/<int:task_id>', methods=['DELETE'])
+@rate_limited('task')
+@edge_authenticated
 def delete_task_proxy(task_id):
     """Proxy para eliminar una tarea"""
-    return proxy_request(TASK_SERVICE_URL, f'task/{task_id}')
+    return invalidating_proxy(TASK_SERVICE_URL, f'task/{task_id}')
+
+@app.route('/tasks/bulk', methods=['POST', 'PATCH', 'DELETE'])
+@rate_limited('task')
+@edge_authenticated
+def bulk_tasks_proxy():
+    """Proxy para crear, actualizar o eliminar varias tareas en una sola petición"""
+    return invalidating_proxy(TASK_SERVICE_URL, 'tasks/bulk')
 
 # Endpoints adicionales de tareas
+@app.route('/tasks/search', methods=['GET'])
+@rate_limited('task')
+@edge_authenticated
+def search_tasks_proxy():
+    """Proxy para buscar tareas por texto (?q=)"""
+    return cached_proxy(TASK_SERVICE_URL, 'tasks/search')
+
+@app.route('/tasks/overdue', methods=['GET'])
+@rate_limited('task')
+@edge_authenticated
+def overdue_tasks_proxy():
+    """Proxy para obtener las tareas vencidas"""
+    return cached_proxy(TASK_SERVICE_URL, 'tasks/overdue')
+
+@app.route('/tasks/upcoming', methods=['GET'])
+@rate_limited('task')
+@edge_authenticated
+def upcoming_tasks_proxy():
+    """Proxy para obtener las tareas que vencen pronto (?within=)"""
+    return cached_proxy(TASK_SERVICE_URL, 'tasks/upcoming')
+
 @app.route('/tasks/status/<status>', methods=['GET'])
+@rate_limited('task')
+@edge_authenticated
 def tasks_by_status_proxy(status):
     """Proxy para obtener tareas por status"""
-    return proxy_request(TASK_SERVICE_URL, f'tasks/status/{status}')
+    return cached_proxy(TASK_SERVICE_URL, f'tasks/status/{status}')
 
 # Endpoint de información del sistema
 @app.route('/info', methods=['GET'])
+@rate_limited('task')
+@edge_authenticated
 def info_proxy():
     """Proxy para información del sistema"""
-    return proxy_request(TASK_SERVICE_URL, 'info')
+    return coalesced_proxy(TASK_SERVICE_URL, 'info')
+
+@app.route('/batch', methods=['POST'])
+def batch_proxy():
+    """Ejecutar varias peticiones del gateway en paralelo y devolver todas las respuestas juntas"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Se requiere un cuerpo JSON con la lista 'requests'"}), 400
+    try:
+        responses = batches.run(data.get('requests'), request.headers, request.remote_addr)
+    except BatchError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"responses": responses, "count": len(responses)})
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    """Verificar el estado de todos los servicios"""
-    services = {
-        'auth_service': AUTH_SERVICE_URL,
-        'user_service': USER_SERVICE_URL,
-        'task_service': TASK_SERVICE_URL
-    }
-    
-    status = {}
-    for service_name, service_url in services.items():
-        try:
-            # Intentar hacer ping a cada servicio
-            resp = requests.get(f"{service_url}/health", timeout=5)
-            status[service_name] = "UP" if resp.status_code == 200 else "DOWN"
-        except:
-            status[service_name] = "DOWN"
+    """Verificar el estado de todos los servicios y de cada una de sus réplicas (estado cacheado)"""
+    services, checked_at = health_status(timeout=HEALTH_TIMEOUT)
+    status = {name: data["status"] for name, data in services.items()}
     
     overall_status = "UP" if all(s == "UP" for s in status.values()) else "DEGRADED"
     
     return jsonify({
         "status": overall_status,
         "services": status,
-        "gateway_port": 4000,
+        "replicas": {name: data["replicas"] for name, data in services.items()},
+        "checked_ago_s": round(time.monotonic() - checked_at, 3),
+        "gateway_port": GATEWAY_PORT,
         "timestamp": str(request.url)
     })
 
+@app.route('/gateway/stats', methods=['GET'])
+def gateway_stats():
+    """Estadísticas internas del gateway (pools, circuit breakers, caché, agrupación de lecturas y tokens)"""
+    return jsonify({
+        "pools": pool_stats(),
+        "upstreams": guard_stats(),
+        "cache": task_cache.snapshot(),
+        "singleflight": flights.snapshot(),
+        "token_memo": token_memo.snapshot(),
+        "batch": batches.snapshot(),
+        "rate_limit": limiter.snapshot(),
+        "compression": compressor.snapshot(),
+        "tracing": tracing.stats()
+    })
+
 @app.route('/', methods=['GET'])
 def root():
     """Documentación básica de la API Gateway"""
     return jsonify({
         "message": "API Gateway para Sistema de Gestión de Tareas con JWT",
         "version": "2.0.0",
-        "gateway_port": 4000,
+        "gateway_port": GATEWAY_PORT,
         "services": {
             "auth_service": f"{AUTH_SERVICE_URL} (Puerto 5001)",
             "user_service": f"{USER_SERVICE_URL} (Puerto 5002)", 
@@ -147,7 +551,9 @@ def root():
         "endpoints": {
             "authentication": {
                 "login": "POST /login",
-                "register": "POST /register"
+                "register": "POST /register",
+                "refresh": "POST /refresh",
+                "logout": "POST /logout"
             },
             "tasks": {
                 "list_all": "GET /tasks",
@@ -155,18 +561,25 @@ def root():
                 "get_one": "GET /task/{id}",
                 "update": "PUT /task/{id}",
                 "delete": "DELETE /task/{id}",
+                "bulk": "POST | PATCH | DELETE /tasks/bulk",
+                "search": "GET /tasks/search?q={texto}",
+                "overdue": "GET /tasks/overdue",
+                "upcoming": "GET /tasks/upcoming?within={30m|24h|7d}",
                 "by_status": "GET /tasks/status/{status}"
             },
             "system": {
                 "health": "GET /health",
-                "info": "GET /info (requiere autenticación)"
+                "info": "GET /info (requiere autenticación)",
+                "gateway_stats": "GET /gateway/stats",
+                "metrics": "GET /metrics",
+                "batch": "POST /batch"
             }
         },
         "authentication": {
             "type": "JWT Bearer Token",
             "header": "Authorization: Bearer <token>",
             "expiration": "5 minutos",
-            "note": "Token requerido para todos los endpoints excepto /login y /register"
+            "note": "Token requerido para todos los endpoints excepto /login, /register, /refresh y /logout"
         },
         "task_statuses": [
             "In Progress",
@@ -180,13 +593,13 @@ if __name__ == '__main__':
     print("=" * 50)
     print("INICIANDO API GATEWAY")
     print("=" * 50)
-    print("Gateway URL: http://localhost:4000")
-    print("Documentación: http://localhost:4000/")
-    print("Health Check: http://localhost:4000/health")
+    print(f"Gateway URL: http://localhost:{GATEWAY_PORT}")
+    print(f"Documentación: http://localhost:{GATEWAY_PORT}/")
+    print(f"Health Check: http://localhost:{GATEWAY_PORT}/health")
     print("=" * 50)
     print("SERVICIOS CONFIGURADOS:")
     print(f"   Auth Service:  {AUTH_SERVICE_URL}")
     print(f"   User Service:  {USER_SERVICE_URL}")
     print(f"   Task Service:  {TASK_SERVICE_URL}")
     print("=" * 50)
-    app.run(host='0.0.0.0', port=4000, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=GATEWAY_PORT, debug=True)
\ No newline at end of file
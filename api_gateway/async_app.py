@@ -0,0 +1,353 @@
+# api_gateway/async_app.py
+# Runtime asíncrono del API Gateway: mismas rutas de proxy que app.py sobre un event loop (aiohttp).
+# No incluye POST /batch ni el circuit breaker, la caché de respuestas y la agrupación de lecturas
+# de app.py: cada petición va directa a una réplica sana y /gateway/stats solo muestra réplicas y límites
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+
+# Módulos compartidos entre el gateway y los servicios (common/, en la raíz del proyecto)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp import web, ClientSession, ClientTimeout, TCPConnector, ClientConnectorError, ClientError
+
+import config
+from config import AUTH_SERVICE_URL, USER_SERVICE_URL, TASK_SERVICE_URL, GATEWAY_PORT
+from upstream import HOP_BY_HOP_HEADERS, REGENERATED_RESPONSE_HEADERS
+from balancer import LoadBalancer
+from tokens import IDENTITY_HEADER, TokenError, identity_header, token_subject, verify_token
+from ratelimit import create_limiter
+from common.compression import is_compressible
+from common import metrics
+from common.tracing import REQUEST_ID_HEADER, TRACEPARENT_HEADER, new_traceparent
+
+SERVICES = {
+    'auth_service': AUTH_SERVICE_URL,
+    'user_service': USER_SERVICE_URL,
+    'task_service': TASK_SERVICE_URL
+}
+
+# Tabla de rutas: (métodos, ruta del gateway, servicio, ruta en el servicio, requiere token, grupo de límite)
+# Debe mantenerse igual a las rutas de proxy definidas en app.py (todas salvo /batch)
+ROUTE_TABLE = [
+    (('GET', 'POST', 'PUT', 'DELETE'), '/auth/{path:.+}', AUTH_SERVICE_URL, '{path}', False, 'auth'),
+    (('GET', 'POST', 'PUT', 'DELETE'), '/user/{path:.+}', USER_SERVICE_URL, '{path}', False, 'user'),
+    (('POST',), '/login', TASK_SERVICE_URL, 'login', False, 'auth'),
+    (('POST',), '/register', TASK_SERVICE_URL, 'register', False, 'auth'),
+    (('POST',), '/refresh', TASK_SERVICE_URL, 'refresh', False, 'auth'),
+    (('POST',), '/logout', TASK_SERVICE_URL, 'logout', False, 'auth'),
+    (('GET',), '/tasks', TASK_SERVICE_URL, 'tasks', True, 'task'),
+    (('POST',), '/task', TASK_SERVICE_URL, 'task', True, 'task'),
+    (('GET', 'PUT', 'DELETE'), r'/task/{task_id:\d+}', TASK_SERVICE_URL, 'task/{task_id}', True, 'task'),
+    (('POST', 'PATCH', 'DELETE'), '/tasks/bulk', TASK_SERVICE_URL, 'tasks/bulk', True, 'task'),
+    (('GET',), '/tasks/search', TASK_SERVICE_URL, 'tasks/search', True, 'task'),
+    (('GET',), '/tasks/overdue', TASK_SERVICE_URL, 'tasks/overdue', True, 'task'),
+    (('GET',), '/tasks/upcoming', TASK_SERVICE_URL, 'tasks/upcoming', True, 'task'),
+    (('GET',), '/tasks/status/{status}', TASK_SERVICE_URL, 'tasks/status/{status}', True, 'task'),
+    (('GET',), '/info', TASK_SERVICE_URL, 'info', True, 'task'),
+]
+
+SESSION_KEY = web.AppKey('session', ClientSession)
+# Cabeceras RateLimit-* calculadas para la petición, que se añaden a la respuesta del servicio
+RATE_LIMIT_HEADERS_KEY = 'rate_limit_headers'
+
+# Réplicas de cada servicio, indexadas por la URL lógica usada en ROUTE_TABLE
+BALANCERS_KEY = web.AppKey('balancers', dict)
+
+# Límite de peticiones por cliente y grupo de rutas
+limiter = create_limiter()
+
+
+def _error(message, status):
+    return web.json_response({"error": message}, status=status)
+
+
+def _upstream_headers(request, identity=None):
+    """Cabeceras de la petición que se reenvían al servicio"""
+    headers = {
+        key: value for key, value in request.headers.items()
+        if key.lower() != 'host' and key.lower() not in HOP_BY_HOP_HEADERS
+        # La identidad solo la puede enviar el gateway, nunca el cliente; la traza tampoco
+        and key.lower() not in (IDENTITY_HEADER.lower(), TRACEPARENT_HEADER)
+    }
+    if identity:
+        headers[IDENTITY_HEADER] = identity
+    # El gateway decide si se traza la petición (los servicios siguen los flags de traceparent);
+    # este runtime no registra spans propios. El identificador de la petición se crea si falta
+    headers[TRACEPARENT_HEADER] = new_traceparent(random.random() < config.TRACE_SAMPLE_RATE)
+    if REQUEST_ID_HEADER not in request.headers:
+        headers[REQUEST_ID_HEADER] = uuid.uuid4().hex
+    return headers
+
+
+def _passthrough_headers(upstream):
+    """Cabeceras de la respuesta del servicio que se devuelven al cliente"""
+    return {
+        key: value for key, value in upstream.headers.items()
+        if key.lower() not in HOP_BY_HOP_HEADERS and key.lower() not in REGENERATED_RESPONSE_HEADERS
+    }
+
+
+async def proxy_request(request, service_url, path, identity=None):
+    """Reenviar la petición a una réplica del servicio y devolver la respuesta por bloques"""
+    balancer = request.app[BALANCERS_KEY][service_url]
+    replica = balancer.acquire()
+    success = False
+    url = f"{replica.url}/{path}"
+    if request.query_string:
+        url = f"{url}?{request.query_string}"
+
+    session = request.app[SESSION_KEY]
+    try:
+        async with session.request(
+            request.method,
+            url,
+            headers=_upstream_headers(request, identity),
+            data=request.content if request.body_exists else None,
+            timeout=ClientTimeout(total=config.UPSTREAM_TIMEOUT)
+        ) as upstream:
+            success = upstream.status < 500
+            response = web.StreamResponse(status=upstream.status, headers=_passthrough_headers(upstream))
+            response.headers.update(request.get(RATE_LIMIT_HEADERS_KEY, {}))
+            if config.COMPRESSION_ENABLED and is_compressible(upstream.content_type):
+                if 'accept-encoding' not in response.headers.get('Vary', '').lower():
+                    response.headers.add('Vary', 'Accept-Encoding')
+                length = upstream.content_length
+                if 'Content-Encoding' not in upstream.headers and (length is None or length >= config.COMPRESSION_MIN_SIZE):
+                    # aiohttp negocia la codificación con Accept-Encoding y comprime al escribir
+                    response.enable_compression()
+            await response.prepare(request)
+            try:
+                async for chunk in upstream.content.iter_chunked(config.STREAM_CHUNK_SIZE):
+                    await response.write(chunk)
+            except (ClientError, asyncio.TimeoutError):
+                # Las cabeceras ya se enviaron: solo queda cortar la conexión con el cliente
+                if request.transport is not None:
+                    request.transport.close()
+                success = False
+                return response
+            await response.write_eof()
+            return response
+    except ClientConnectorError:
+        return _error("Servicio no disponible", 503)
+    except asyncio.TimeoutError:
+        return _error("Timeout del servicio", 504)
+    except ClientError as e:
+        return _error(f"Error en la solicitud: {str(e)}", 500)
+    finally:
+        balancer.release(replica, success)
+
+
+def _proxy_handler(service_url, path_template, authenticated, group):
+    """Crear un handler que reenvía a service_url con la ruta indicada"""
+    async def handler(request):
+        if config.RATE_LIMIT_ENABLED:
+            subject = token_subject(request.headers.get('Authorization'))
+            client = f"sub:{subject}" if subject is not None else f"ip:{request.remote}"
+            decision = limiter.check(group, client)
+            if not decision.allowed:
+                return web.json_response({"error": "Demasiadas peticiones, intente más tarde"},
+                                         status=429, headers=decision.headers())
+            request[RATE_LIMIT_HEADERS_KEY] = decision.headers()
+
+        identity = None
+        if authenticated and config.EDGE_AUTH_ENABLED:
+            # Verificar el token aquí: los no válidos no llegan al servicio
+            try:
+                identity = identity_header(verify_token(request.headers.get('Authorization')))
+            except TokenError as e:
+                return _error(str(e), 401)
+        return await proxy_request(request, service_url, path_template.format(**request.match_info), identity)
+    return handler
+
+
+class HealthMonitor:
+    """Estado de las réplicas de cada servicio, consultadas en paralelo y cacheadas"""
+
+    def __init__(self, balancers, interval=config.HEALTH_INTERVAL, timeout=config.HEALTH_TIMEOUT):
+        # {nombre del servicio: LoadBalancer}
+        self.balancers = balancers
+        self.interval = interval
+        self.timeout = timeout
+        self.status = {}
+        self.checked_at = None
+        self._refreshing = None
+
+    async def _check(self, session, balancer, replica):
+        started = time.monotonic()
+        try:
+            async with session.get(f"{replica.url}/health", timeout=ClientTimeout(total=self.timeout)) as resp:
+                await resp.read()
+                healthy = resp.status == 200
+        except (ClientError, asyncio.TimeoutError):
+            healthy = False
+        balancer.set_healthy(replica, healthy)
+        return {
+            "url": replica.url,
+            "status": "UP" if healthy else "DOWN",
+            "latency_ms": round((time.monotonic() - started) * 1000, 1)
+        }
+
+    async def refresh(self, session):
+        """Consultar todos los servicios a la vez; las llamadas concurrentes comparten la consulta"""
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._refresh(session))
+        try:
+            await asyncio.shield(self._refreshing)
+        finally:
+            if self._refreshing is not None and self._refreshing.done():
+                self._refreshing = None
+
+    async def _refresh(self, session):
+        checks = [(name, self._check(session, balancer, replica))
+                  for name, balancer in self.balancers.items() for replica in balancer.replicas]
+        results = await asyncio.gather(*(check for _, check in checks))
+
+        status = {name: {"status": "DOWN", "replicas": []} for name in self.balancers}
+        for (name, _), result in zip(checks, results):
+            status[name]["replicas"].append(result)
+            if result["status"] == "UP":
+                status[name]["status"] = "UP"
+        self.status = status
+        self.checked_at = time.time()
+
+    def is_stale(self):
+        return self.checked_at is None or time.time() - self.checked_at > 2 * self.interval
+
+    async def run(self, session):
+        """Refrescar el estado periódicamente en segundo plano"""
+        while True:
+            await self.refresh(session)
+            await asyncio.sleep(self.interval)
+
+
+HEALTH_KEY = web.AppKey('health', HealthMonitor)
+
+
+async def health_check(request):
+    """Verificar el estado de todos los servicios (estado cacheado)"""
+    monitor = request.app[HEALTH_KEY]
+    if monitor.is_stale():
+        await monitor.refresh(request.app[SESSION_KEY])
+
+    services = {name: data["status"] for name, data in monitor.status.items()}
+    overall_status = "UP" if all(s == "UP" for s in services.values()) else "DEGRADED"
+    return web.json_response({
+        "status": overall_status,
+        "services": services,
+        "details": monitor.status,
+        "checked_at": monitor.checked_at,
+        "gateway_port": GATEWAY_PORT,
+        "timestamp": str(request.url)
+    })
+
+
+@web.middleware
+async def metrics_middleware(request, handler):
+    """Métricas HTTP por ruta, igual que metrics.install() en el runtime Flask"""
+    started = time.perf_counter()
+    metrics.IN_FLIGHT.inc()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        metrics.IN_FLIGHT.dec()
+        resource = request.match_info.route.resource
+        route = resource.canonical if resource is not None else 'unmatched'
+        labels = (request.method, route, str(status))
+        metrics.REQUESTS.inc(labels)
+        metrics.LATENCY.observe(time.perf_counter() - started, labels)
+        if status >= 500:
+            metrics.ERRORS.inc((request.method, route))
+
+
+async def gateway_stats(request):
+    """Estadísticas internas del runtime asíncrono (réplicas, límites y último health check)"""
+    monitor = request.app[HEALTH_KEY]
+    return web.json_response({
+        "runtime": "asyncio",
+        "replicas": {name: balancer.snapshot() for name, balancer in monitor.balancers.items()},
+        "rate_limit": limiter.snapshot(),
+        "health_checked_at": monitor.checked_at,
+        # Funciones de app.py que este runtime no implementa
+        "unsupported": ["POST /batch", "circuit_breaker", "cache", "singleflight"]
+    })
+
+
+async def metrics_handler(request):
+    return web.Response(body=metrics.registry.render().encode('utf-8'),
+                        headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+
+async def root(request):
+    """Documentación básica del gateway asíncrono"""
+    return web.json_response({
+        "message": "API Gateway para Sistema de Gestión de Tareas con JWT",
+        "version": "2.0.0",
+        "runtime": "asyncio",
+        "gateway_port": GATEWAY_PORT,
+        "services": SERVICES,
+        "routes": [f"{'|'.join(methods)} {path}" for methods, path, *_ in ROUTE_TABLE] + ["GET /health", "GET /gateway/stats", "GET /metrics"]
+    })
+
+
+async def _client_lifecycle(app):
+    """Crear la sesión HTTP compartida y la tarea de health check"""
+    connector = TCPConnector(
+        limit=config.ASYNC_LIMIT,
+        limit_per_host=config.ASYNC_LIMIT_PER_HOST,
+        keepalive_timeout=config.POOL_IDLE_TIMEOUT
+    )
+    # auto_decompress=False: los cuerpos se reenvían tal como los envía el servicio
+    session = ClientSession(connector=connector, auto_decompress=False, trust_env=False)
+    app[SESSION_KEY] = session
+    health_task = asyncio.ensure_future(app[HEALTH_KEY].run(session))
+    yield
+    health_task.cancel()
+    await session.close()
+
+
+def create_app():
+    app = web.Application(middlewares=[metrics_middleware])
+    balancers = {
+        AUTH_SERVICE_URL: LoadBalancer(config.AUTH_SERVICE_URLS),
+        USER_SERVICE_URL: LoadBalancer(config.USER_SERVICE_URLS),
+        TASK_SERVICE_URL: LoadBalancer(config.TASK_SERVICE_URLS)
+    }
+    app[BALANCERS_KEY] = balancers
+    app[HEALTH_KEY] = HealthMonitor({name: balancers[url] for name, url in SERVICES.items()})
+    app.cleanup_ctx.append(_client_lifecycle)
+
+    for methods, path, service_url, path_template, authenticated, group in ROUTE_TABLE:
+        handler = _proxy_handler(service_url, path_template, authenticated, group)
+        for method in methods:
+            app.router.add_route(method, path, handler)
+    app.router.add_get('/health', health_check)
+    app.router.add_get('/gateway/stats', gateway_stats)
+    app.router.add_get('/metrics', metrics_handler)
+    app.router.add_get('/', root)
+    return app
+
+
+if __name__ == '__main__':
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+
+    print("=" * 50)
+    print("INICIANDO API GATEWAY (ASYNCIO)")
+    print("=" * 50)
+    print(f"Gateway URL: http://localhost:{GATEWAY_PORT}")
+    print(f"Health Check: http://localhost:{GATEWAY_PORT}/health")
+    print("=" * 50)
+    web.run_app(create_app(), host='0.0.0.0', port=GATEWAY_PORT)
@@ -0,0 +1,107 @@
+# api_gateway/balancer.py
+import random
+import threading
+import time
+
+import config
+
+
+class Replica:
+    """Una instancia de un servicio y su estado de salud"""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        # Resultado del último health check activo
+        self.healthy = True
+
+    def available(self, now):
+        return self.healthy and now >= self.ejected_until
+
+    def snapshot(self, now):
+        return {
+            "url": self.url,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "healthy": self.healthy,
+            "ejected": now < self.ejected_until,
+            "ejections": self.ejections
+        }
+
+
+class LoadBalancer:
+    """Reparte las peticiones entre las réplicas de un servicio"""
+
+    def __init__(self, urls, strategy=config.LB_STRATEGY,
+                 eject_after=config.LB_EJECT_CONSECUTIVE_FAILURES,
+                 eject_seconds=config.LB_EJECT_SECONDS,
+                 max_eject_seconds=config.LB_MAX_EJECT_SECONDS):
+        self.replicas = [Replica(url) for url in urls]
+        self.strategy = strategy
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.panic_picks = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Elegir una réplica y contarla como ocupada hasta release()"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [r for r in self.replicas if r.available(now)]
+            if not candidates:
+                # Todas expulsadas o caídas: mejor intentar con todas que rechazar todo
+                candidates = self.replicas
+                self.panic_picks += 1
+
+            if len(candidates) == 1:
+                replica = candidates[0]
+            elif self.strategy == 'least_outstanding':
+                fewest = min(r.outstanding for r in candidates)
+                replica = random.choice([r for r in candidates if r.outstanding == fewest])
+            else:
+                # Power of two choices: dos réplicas al azar, la menos ocupada
+                first, second = random.sample(candidates, 2)
+                replica = first if first.outstanding <= second.outstanding else second
+
+            replica.outstanding += 1
+            replica.requests += 1
+            return replica
+
+    def release(self, replica, success):
+        """Liberar la réplica y registrar el resultado (expulsión pasiva)"""
+        with self._lock:
+            replica.outstanding -= 1
+            if success:
+                replica.consecutive_failures = 0
+                return
+            replica.failures += 1
+            replica.consecutive_failures += 1
+            if replica.consecutive_failures >= self.eject_after:
+                # Cada expulsión seguida dura el doble, hasta max_eject_seconds
+                duration = min(self.max_eject_seconds, self.eject_seconds * (2 ** replica.ejections))
+                replica.ejected_until = time.monotonic() + duration
+                replica.ejections += 1
+                replica.consecutive_failures = 0
+
+    def set_healthy(self, replica, healthy):
+        """Resultado del health check activo"""
+        with self._lock:
+            replica.healthy = healthy
+            if healthy and time.monotonic() >= replica.ejected_until:
+                replica.ejections = 0
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "panic_picks": self.panic_picks,
+                "replicas": [replica.snapshot(now) for replica in self.replicas]
+            }
@@ -0,0 +1,142 @@
+# api_gateway/batch.py
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.test import EnvironBuilder
+
+import config
+from common import tracing
+
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+# Cabeceras de la petición del lote que heredan las sub-peticiones
+INHERITED_HEADERS = ('Authorization', 'Accept-Language', 'User-Agent')
+# Cabeceras de cada sub-respuesta que se devuelven al cliente
+RETURNED_HEADERS = ('Content-Type', 'X-Cache', 'Retry-After')
+
+
+class BatchError(Exception):
+    """Lote mal formado; se rechaza completo con 400"""
+
+
+class BatchRunner:
+    """Ejecuta las sub-peticiones de un lote en paralelo sobre las rutas del gateway"""
+
+    def __init__(self, app, max_requests=config.BATCH_MAX_REQUESTS,
+                 max_parallel=config.BATCH_MAX_PARALLEL, workers=config.BATCH_WORKERS):
+        self.app = app
+        self.max_requests = max_requests
+        self.max_parallel = max_parallel
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch')
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.sub_requests = 0
+        self.failed = 0
+
+    def run(self, items, headers, remote_addr):
+        """Ejecutar el lote y devolver una respuesta por sub-petición, en el mismo orden"""
+        if not isinstance(items, list) or not items:
+            raise BatchError("Se requiere una lista 'requests' con al menos una petición")
+        if len(items) > self.max_requests:
+            raise BatchError(f"Máximo {self.max_requests} peticiones por lote")
+
+        inherited = {key: headers[key] for key in INHERITED_HEADERS if key in headers}
+        # Las sub-peticiones forman parte de la traza y del X-Request-ID del lote. La traza va en
+        # el environ y no como cabecera, que el gateway ignora y cada sub-petición puede fijar
+        propagated = tracing.outgoing_headers()
+        environ_base = {
+            'REMOTE_ADDR': remote_addr,
+            tracing.INTERNAL_TRACEPARENT: propagated.pop(tracing.TRACEPARENT_HEADER, None)
+        }
+        inherited.update(propagated)
+
+        # Limitar cuántas sub-peticiones de este lote ocupan hilos a la vez
+        slots = threading.BoundedSemaphore(self.max_parallel)
+        futures = []
+        for item in items:
+            slots.acquire()
+            future = self._executor.submit(self._run_one, item, inherited, environ_base)
+            future.add_done_callback(lambda _: slots.release())
+            futures.append(future)
+
+        with self._lock:
+            self.batches += 1
+            self.sub_requests += len(items)
+        return [self._collect(item, future) for item, future in zip(items, futures)]
+
+    def _collect(self, item, future):
+        """Resultado de una sub-petición; si falló, un 500 solo para ella y no para todo el lote"""
+        try:
+            return future.result()
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            return self._result(item, 500, {}, {"error": f"Error interno en la sub-petición: {e}"})
+
+    def _run_one(self, item, inherited, environ_base):
+        error = self._validate(item)
+        if error:
+            return self._result(item, 400, {}, {"error": error})
+
+        headers = dict(inherited)
+        headers.update(item.get('headers') or {})
+        # El cuerpo se devuelve dentro del JSON del lote: sin comprimir
+        headers['Accept-Encoding'] = 'identity'
+        builder = EnvironBuilder(
+            path=item['path'],
+            method=item.get('method', 'GET').upper(),
+            headers=headers,
+            json=item.get('body'),
+            environ_base=environ_base
+        )
+        try:
+            # La sub-petición recorre las mismas rutas (autenticación, caché, circuit breakers...)
+            with self.app.request_context(builder.get_environ()):
+                response = self.app.full_dispatch_request()
+                try:
+                    body = b''.join(response.iter_encoded())
+                finally:
+                    response.close()
+        finally:
+            builder.close()
+
+        payload = body.decode('utf-8', 'replace')
+        if response.mimetype == 'application/json':
+            try:
+                payload = json.loads(payload)
+            except ValueError:
+                pass
+        returned = {key: response.headers[key] for key in RETURNED_HEADERS if key in response.headers}
+        return self._result(item, response.status_code, returned, payload)
+
+    @staticmethod
+    def _validate(item):
+        if not isinstance(item, dict):
+            return "Cada petición debe ser un objeto"
+        path = item.get('path')
+        if not isinstance(path, str) or not path.startswith('/'):
+            return "'path' requerido y debe empezar por /"
+        if path.split('?')[0].rstrip('/') == '/batch':
+            return "No se permiten lotes anidados"
+        if str(item.get('method', 'GET')).upper() not in BATCH_METHODS:
+            return f"Método inválido. Debe ser uno de: {list(BATCH_METHODS)}"
+        if item.get('headers') is not None and not isinstance(item['headers'], dict):
+            return "'headers' debe ser un objeto"
+        return None
+
+    @staticmethod
+    def _result(item, status, headers, body):
+        result = {"status": status, "headers": headers, "body": body}
+        if isinstance(item, dict) and 'id' in item:
+            result["id"] = item['id']
+        return result
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "sub_requests": self.sub_requests,
+                "failed": self.failed,
+                "max_requests": self.max_requests,
+                "max_parallel": self.max_parallel
+            }
@@ -0,0 +1,135 @@
+# api_gateway/cache.py
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+# Memoria aproximada que ocupa una entrada además de su cuerpo (bytes)
+ENTRY_OVERHEAD = 512
+
+
+class CachedResponse:
+    """Respuesta de un servicio guardada en la caché"""
+
+    __slots__ = ('status', 'headers', 'body', 'expires_at', 'subject', 'size')
+
+    def __init__(self, status, headers, body, expires_at, subject):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.expires_at = expires_at
+        self.subject = subject
+        self.size = len(body) + ENTRY_OVERHEAD + sum(len(k) + len(v) for k, v in headers)
+
+
+class ResponseCache:
+    """Caché LRU con TTL y límite de memoria, particionada por usuario"""
+
+    def __init__(self, ttl=config.CACHE_TTL, max_entries=config.CACHE_MAX_ENTRIES,
+                 max_bytes=config.CACHE_MAX_BYTES, max_entry_bytes=config.CACHE_MAX_ENTRY_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys_by_subject = {}
+        # Se incrementa con cada escritura del usuario; una lectura iniciada antes no se guarda
+        self._generations = {}
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_discards = 0
+
+    def get(self, key):
+        """Obtener una respuesta vigente o None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def generation(self, subject):
+        """Generación actual de un usuario; se pasa a put() para descartar lecturas obsoletas"""
+        with self._lock:
+            return self._generations.get(subject, 0)
+
+    def put(self, key, subject, status, headers, body, generation):
+        """Guardar una respuesta si sigue siendo válida para el usuario"""
+        if len(body) > self.max_entry_bytes:
+            return False
+        entry = CachedResponse(status, headers, body, time.monotonic() + self.ttl, subject)
+        with self._lock:
+            if self._generations.get(subject, 0) != generation:
+                # El usuario escribió mientras se leía: la respuesta puede estar desactualizada
+                self.stale_discards += 1
+                return False
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._keys_by_subject.setdefault(subject, set()).add(key)
+            self._bytes += entry.size
+            self.stores += 1
+            self._evict()
+            return True
+
+    def invalidate(self, subject):
+        """Eliminar todas las respuestas de un usuario"""
+        with self._lock:
+            self._generations[subject] = self._generations.get(subject, 0) + 1
+            keys = self._keys_by_subject.pop(subject, ())
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._bytes -= entry.size
+            self.invalidations += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        keys = self._keys_by_subject.get(entry.subject)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_subject[entry.subject]
+
+    def _evict(self):
+        """Expulsar las entradas menos usadas hasta respetar los límites"""
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "stale_discards": self.stale_discards
+            }
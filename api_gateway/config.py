@@ -0,0 +1,176 @@
+# api_gateway/config.py
+import os
+
+
+def _env_int(name, default):
+    """Leer un entero desde variables de entorno"""
+    return int(os.getenv(name, default))
+
+
+def _env_float(name, default):
+    """Leer un decimal desde variables de entorno"""
+    return float(os.getenv(name, default))
+
+
+def _env_list(name, default):
+    """Leer una lista separada por comas desde variables de entorno"""
+    value = os.getenv(name)
+    if not value:
+        return list(default)
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+def _env_bool(name, default):
+    """Leer un booleano desde variables de entorno ('1', 'true', 'yes', 'on')"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# URLs de los microservicios
+AUTH_SERVICE_URL = os.getenv('AUTH_SERVICE_URL', 'http://localhost:5001')
+USER_SERVICE_URL = os.getenv('USER_SERVICE_URL', 'http://localhost:5002')
+TASK_SERVICE_URL = os.getenv('TASK_SERVICE_URL', 'http://localhost:5003')  # Task Service
+
+# Réplicas de cada servicio (URLs separadas por comas); por defecto solo la URL anterior
+AUTH_SERVICE_URLS = _env_list('AUTH_SERVICE_URLS', [AUTH_SERVICE_URL])
+USER_SERVICE_URLS = _env_list('USER_SERVICE_URLS', [USER_SERVICE_URL])
+TASK_SERVICE_URLS = _env_list('TASK_SERVICE_URLS', [TASK_SERVICE_URL])
+
+GATEWAY_PORT = _env_int('GATEWAY_PORT', 4000)
+
+# --- POOL DE CONEXIONES HACIA LOS SERVICIOS ---
+# Cantidad de hosts distintos que conserva cada pool (uno por réplica)
+POOL_CONNECTIONS = _env_int('GATEWAY_POOL_CONNECTIONS', 4)
+# Conexiones keep-alive máximas por host
+POOL_MAXSIZE = _env_int('GATEWAY_POOL_MAXSIZE', 32)
+# Si es True, las peticiones esperan una conexión libre en vez de abrir una extra
+POOL_BLOCK = _env_bool('GATEWAY_POOL_BLOCK', False)
+# Segundos que una conexión puede estar ociosa antes de descartarla
+POOL_IDLE_TIMEOUT = _env_float('GATEWAY_POOL_IDLE_TIMEOUT', 30)
+# Reintentos cuando una conexión reutilizada resulta estar cerrada
+POOL_RETRIES = _env_int('GATEWAY_POOL_RETRIES', 2)
+
+# Timeout por defecto hacia los servicios (segundos)
+UPSTREAM_TIMEOUT = _env_float('GATEWAY_UPSTREAM_TIMEOUT', 30)
+
+# --- MODO DE PROXY ---
+# 'stream': reenvía cuerpos y cabeceras por bloques, sin decodificar ni volver a serializar
+# 'buffered': modo anterior, parsea el JSON del servicio y lo vuelve a serializar
+PROXY_MODE = os.getenv('GATEWAY_PROXY_MODE', 'stream').strip().lower()
+# Tamaño de bloque al reenviar cuerpos (bytes)
+STREAM_CHUNK_SIZE = _env_int('GATEWAY_STREAM_CHUNK_SIZE', 64 * 1024)
+
+# --- RUNTIME ASÍNCRONO (async_app.py) ---
+# Conexiones simultáneas máximas hacia todos los servicios (0 = sin límite)
+ASYNC_LIMIT = _env_int('GATEWAY_ASYNC_LIMIT', 0)
+# Conexiones simultáneas máximas hacia un mismo host
+ASYNC_LIMIT_PER_HOST = _env_int('GATEWAY_ASYNC_LIMIT_PER_HOST', 1000)
+
+# --- HEALTH CHECK ---
+# Timeout del ping a cada servicio (segundos)
+HEALTH_TIMEOUT = _env_float('GATEWAY_HEALTH_TIMEOUT', 5)
+# Cada cuánto se refresca en segundo plano el estado cacheado (segundos)
+HEALTH_INTERVAL = _env_float('GATEWAY_HEALTH_INTERVAL', 5)
+
+# --- AUTENTICACIÓN ---
+# Debe coincidir con la SECRET_KEY del Task Service para poder validar los tokens
+SECRET_KEY = os.getenv('SECRET_KEY', 'clave_super_secreta_123')
+# Verificar el token en el gateway y enviar al Task Service la identidad firmada (X-Identity)
+EDGE_AUTH_ENABLED = _env_bool('GATEWAY_EDGE_AUTH', False)
+# Clave compartida con el Task Service para firmar X-Identity; por defecto la SECRET_KEY
+IDENTITY_SECRET = os.getenv('IDENTITY_SECRET', SECRET_KEY)
+# Validez máxima de la cabecera X-Identity (segundos)
+IDENTITY_TTL = _env_int('GATEWAY_IDENTITY_TTL', 30)
+# Tokens ya verificados que se recuerdan para no volver a decodificarlos
+TOKEN_MEMO_SIZE = _env_int('GATEWAY_TOKEN_MEMO_SIZE', 10000)
+
+# --- COMPRESIÓN DE RESPUESTAS (gzip / brotli según Accept-Encoding) ---
+COMPRESSION_ENABLED = _env_bool('GATEWAY_COMPRESSION_ENABLED', True)
+# Cuerpos más pequeños (bytes) se envían sin comprimir
+COMPRESSION_MIN_SIZE = _env_int('GATEWAY_COMPRESSION_MIN_SIZE', 1024)
+GZIP_LEVEL = _env_int('GATEWAY_GZIP_LEVEL', 6)
+# Brotli solo se usa si el paquete 'brotli' está instalado
+BROTLI_ENABLED = _env_bool('GATEWAY_BROTLI_ENABLED', True)
+BROTLI_LEVEL = _env_int('GATEWAY_BROTLI_LEVEL', 4)
+
+# --- TRAZAS DISTRIBUIDAS (X-Request-ID + traceparent, spans en formato Zipkin v2) ---
+# Proporción de peticiones que se trazan (0 = ninguna, 1 = todas); X-Request-ID se propaga siempre
+TRACE_SAMPLE_RATE = _env_float('TRACE_SAMPLE_RATE', 0.01)
+# Colector Zipkin (p. ej. http://localhost:9411/api/v2/spans); sin colector los spans van a TRACE_FILE
+TRACE_COLLECTOR_URL = os.getenv('TRACE_COLLECTOR_URL', '')
+TRACE_FILE = os.getenv('TRACE_FILE', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'logs', 'traces_api_gateway.jsonl'))
+
+# --- CACHÉ DE LECTURAS DE TAREAS ---
+CACHE_ENABLED = _env_bool('GATEWAY_CACHE_ENABLED', True)
+# Segundos que una respuesta cacheada se considera válida
+CACHE_TTL = _env_float('GATEWAY_CACHE_TTL', 10)
+# Entradas máximas y memoria máxima (bytes) de la caché
+CACHE_MAX_ENTRIES = _env_int('GATEWAY_CACHE_MAX_ENTRIES', 10000)
+CACHE_MAX_BYTES = _env_int('GATEWAY_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+# Respuestas más grandes que esto no se cachean (se reenvían en streaming)
+CACHE_MAX_ENTRY_BYTES = _env_int('GATEWAY_CACHE_MAX_ENTRY_BYTES', 1024 * 1024)
+
+# --- AGRUPACIÓN DE LECTURAS IDÉNTICAS (single-flight) ---
+SINGLEFLIGHT_ENABLED = _env_bool('GATEWAY_SINGLEFLIGHT_ENABLED', True)
+# Respuestas más grandes no se comparten: cada petición hace su propia llamada
+SINGLEFLIGHT_MAX_BYTES = _env_int('GATEWAY_SINGLEFLIGHT_MAX_BYTES', 4 * 1024 * 1024)
+
+# --- PETICIONES AGRUPADAS (POST /batch) ---
+# Sub-peticiones máximas por lote y cuántas de un mismo lote se ejecutan a la vez
+BATCH_MAX_REQUESTS = _env_int('GATEWAY_BATCH_MAX_REQUESTS', 20)
+BATCH_MAX_PARALLEL = _env_int('GATEWAY_BATCH_MAX_PARALLEL', 8)
+# Hilos compartidos por todos los lotes
+BATCH_WORKERS = _env_int('GATEWAY_BATCH_WORKERS', 32)
+
+# --- LÍMITE DE PETICIONES (por usuario del token o IP y grupo de rutas) ---
+RATE_LIMIT_ENABLED = _env_bool('GATEWAY_RATE_LIMIT_ENABLED', True)
+# '<peticiones>/<segundos>': tamaño del bucket y tiempo en rellenarlo por completo
+RATE_LIMIT_AUTH = os.getenv('GATEWAY_RATE_LIMIT_AUTH', '30/60')
+RATE_LIMIT_USER = os.getenv('GATEWAY_RATE_LIMIT_USER', '300/60')
+RATE_LIMIT_TASK = os.getenv('GATEWAY_RATE_LIMIT_TASK', '600/60')
+# 'memory': buckets de este proceso; 'shm': compartidos entre procesos del gateway en la misma máquina
+RATE_LIMIT_BACKEND = os.getenv('GATEWAY_RATE_LIMIT_BACKEND', 'memory').strip().lower()
+RATE_LIMIT_SHARDS = _env_int('GATEWAY_RATE_LIMIT_SHARDS', 64)
+# Clientes recordados como máximo en el backend 'memory'
+RATE_LIMIT_MAX_KEYS = _env_int('GATEWAY_RATE_LIMIT_MAX_KEYS', 100000)
+RATE_LIMIT_SHM_PATH = os.getenv('GATEWAY_RATE_LIMIT_SHM_PATH', '/dev/shm/api_gateway_ratelimit')
+RATE_LIMIT_SHM_SLOTS = _env_int('GATEWAY_RATE_LIMIT_SHM_SLOTS', 65536)
+
+# --- CIRCUIT BREAKER, TIMEOUTS ADAPTATIVOS Y LÍMITE DE CONCURRENCIA (por servicio) ---
+# Timeout de conexión (segundos)
+CONNECT_TIMEOUT = _env_float('GATEWAY_CONNECT_TIMEOUT', 3)
+# Resultados recientes que se evalúan y mínimo necesario para abrir el circuito
+BREAKER_WINDOW = _env_int('GATEWAY_BREAKER_WINDOW', 50)
+BREAKER_MIN_CALLS = _env_int('GATEWAY_BREAKER_MIN_CALLS', 10)
+# Proporción de errores (conexión, timeout o 5xx) que abre el circuito
+BREAKER_FAILURE_RATE = _env_float('GATEWAY_BREAKER_FAILURE_RATE', 0.5)
+# Una llamada es lenta si tarda al menos esto (segundos); proporción de lentas que abre el circuito
+BREAKER_SLOW_CALL_SECONDS = _env_float('GATEWAY_BREAKER_SLOW_CALL_SECONDS', 5)
+BREAKER_SLOW_CALL_RATE = _env_float('GATEWAY_BREAKER_SLOW_CALL_RATE', 0.8)
+# Segundos que el circuito permanece abierto antes de probar de nuevo
+BREAKER_OPEN_SECONDS = _env_float('GATEWAY_BREAKER_OPEN_SECONDS', 10)
+# Peticiones de prueba en estado semiabierto
+BREAKER_HALF_OPEN_CALLS = _env_int('GATEWAY_BREAKER_HALF_OPEN_CALLS', 3)
+# Peticiones simultáneas máximas por servicio; el exceso recibe 503 con Retry-After
+MAX_IN_FLIGHT = _env_int('GATEWAY_MAX_IN_FLIGHT', 64)
+# Latencias recientes usadas para los percentiles
+LATENCY_WINDOW = _env_int('GATEWAY_LATENCY_WINDOW', 200)
+# Timeout de lectura de cada ruta de lectura = p99 de la ruta * multiplicador, entre ADAPTIVE_TIMEOUT_MIN
+# y UPSTREAM_TIMEOUT. Las escrituras y los streams usan siempre UPSTREAM_TIMEOUT
+ADAPTIVE_TIMEOUT_MULTIPLIER = _env_float('GATEWAY_ADAPTIVE_TIMEOUT_MULTIPLIER', 3)
+ADAPTIVE_TIMEOUT_MIN = _env_float('GATEWAY_ADAPTIVE_TIMEOUT_MIN', 5)
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = _env_int('GATEWAY_ADAPTIVE_TIMEOUT_MIN_SAMPLES', 20)
+
+# --- BALANCEO ENTRE RÉPLICAS ---
+# 'p2c' (power of two choices) o 'least_outstanding'
+LB_STRATEGY = os.getenv('GATEWAY_LB_STRATEGY', 'p2c').strip().lower()
+# Fallos seguidos que expulsan una réplica, y duración base de la expulsión (se duplica si se repite)
+LB_EJECT_CONSECUTIVE_FAILURES = _env_int('GATEWAY_LB_EJECT_CONSECUTIVE_FAILURES', 5)
+LB_EJECT_SECONDS = _env_float('GATEWAY_LB_EJECT_SECONDS', 10)
+LB_MAX_EJECT_SECONDS = _env_float('GATEWAY_LB_MAX_EJECT_SECONDS', 300)
+# Health check activo de cada réplica (GET /health) cada HEALTH_INTERVAL segundos
+ACTIVE_HEALTH_ENABLED = _env_bool('GATEWAY_ACTIVE_HEALTH_ENABLED', True)
+ACTIVE_HEALTH_TIMEOUT = _env_float('GATEWAY_ACTIVE_HEALTH_TIMEOUT', 2)
@@ -0,0 +1,214 @@
+# api_gateway/ratelimit.py
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+import config
+
+
+def parse_limit(value):
+    """'<peticiones>/<segundos>' -> (capacidad, tokens por segundo, ventana)"""
+    requests_, seconds = value.split('/')
+    capacity, window = int(requests_), float(seconds)
+    return capacity, capacity / window, window
+
+
+class MemoryBuckets:
+    """
+    Token buckets en memoria del proceso, repartidos en shards con su propio lock
+    para que las peticiones de distintos clientes no compitan por el mismo.
+    """
+
+    def __init__(self, shards=config.RATE_LIMIT_SHARDS, max_keys=config.RATE_LIMIT_MAX_KEYS):
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+        self._max_keys_per_shard = max(1, max_keys // shards)
+
+    def take(self, key, capacity, rate, now):
+        """Consumir un token; devuelve (permitido, tokens restantes)"""
+        buckets, lock = self._shards[hash(key) % len(self._shards)]
+        with lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                if len(buckets) >= self._max_keys_per_shard:
+                    self._sweep(buckets, now)
+                bucket = buckets[key] = [float(capacity), now, capacity, rate]
+            else:
+                # Recarga perezosa: se suman los tokens acumulados desde el último acceso
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True, bucket[0]
+            return False, bucket[0]
+
+    @staticmethod
+    def _sweep(buckets, now):
+        """Olvidar los buckets que ya estarían llenos: equivalen a uno nuevo"""
+        full = [key for key, (tokens, last, capacity, rate) in buckets.items()
+                if tokens + (now - last) * rate >= capacity]
+        for key in full:
+            del buckets[key]
+        if not full and buckets:
+            # Todos activos: descartar el menos reciente para no crecer sin límite
+            del buckets[min(buckets, key=lambda k: buckets[k][1])]
+
+
+class SharedMemoryBuckets:
+    """
+    Token buckets en un fichero mapeado en memoria (p. ej. /dev/shm), compartidos por
+    todos los procesos del gateway de la máquina para aplicar un único límite global.
+
+    La tabla tiene un número fijo de huecos (hash de 8 bytes, tokens, último acceso)
+    agrupados en franjas; cada franja se protege con un lock de hilo y un fcntl.lockf
+    sobre su rango de bytes, que excluye a los demás procesos.
+    """
+
+    SLOT = struct.Struct('<Qdd')
+    PROBES = 8
+
+    def __init__(self, path=config.RATE_LIMIT_SHM_PATH, slots=config.RATE_LIMIT_SHM_SLOTS,
+                 stripes=config.RATE_LIMIT_SHARDS):
+        self.stripe_slots = max(self.PROBES, slots // stripes)
+        self.stripes = max(1, slots // self.stripe_slots)
+        self.slots = self.stripes * self.stripe_slots
+        size = self.slots * self.SLOT.size
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            # ftruncate rellena con ceros: todos los huecos empiezan vacíos
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._locks = [threading.Lock() for _ in range(self.stripes)]
+
+    @staticmethod
+    def _hash(key):
+        # hash() de Python cambia entre procesos; blake2b es estable. 0 marca un hueco vacío
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+    def take(self, key, capacity, rate, now):
+        """Consumir un token; devuelve (permitido, tokens restantes)"""
+        key_hash = self._hash(key)
+        stripe = key_hash % self.stripes
+        first = stripe * self.stripe_slots
+        home = (key_hash // self.stripes) % self.stripe_slots
+        start, length = first * self.SLOT.size, self.stripe_slots * self.SLOT.size
+
+        with self._locks[stripe]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+            try:
+                offset, tokens, last = self._find(key_hash, first, home, now, capacity, rate)
+                if tokens is None:
+                    tokens = float(capacity)
+                else:
+                    tokens = min(capacity, tokens + (now - last) * rate)
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+                self.SLOT.pack_into(self._map, offset, key_hash, tokens, now)
+                return allowed, tokens
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+
+    def _find(self, key_hash, first, home, now, capacity, rate):
+        """Hueco de la clave (offset, tokens, último acceso) o uno libre/reutilizable"""
+        free = None
+        oldest = None
+        for probe in range(self.PROBES):
+            offset = (first + (home + probe) % self.stripe_slots) * self.SLOT.size
+            slot_hash, tokens, last = self.SLOT.unpack_from(self._map, offset)
+            if slot_hash == key_hash:
+                return offset, tokens, last
+            if slot_hash == 0 or tokens + (now - last) * rate >= capacity:
+                # Vacío, o un bucket que ya estaría lleno: equivale a uno nuevo
+                if free is None:
+                    free = offset
+            elif oldest is None or last < oldest[1]:
+                oldest = (offset, last)
+        # Clave nueva: hueco libre o, si no hay, el de acceso más antiguo
+        return (free if free is not None else oldest[0]), None, None
+
+
+class RateDecision:
+    """Resultado de comprobar el límite de una petición"""
+
+    __slots__ = ('allowed', 'limit', 'remaining', 'reset', 'retry_after', 'policy')
+
+    def __init__(self, allowed, limit, remaining, reset, retry_after, policy):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = reset
+        self.retry_after = retry_after
+        self.policy = policy
+
+    def headers(self):
+        """Cabeceras RateLimit-* (borrador IETF) y Retry-After si se rechaza"""
+        headers = {
+            'RateLimit-Limit': str(self.limit),
+            'RateLimit-Remaining': str(self.remaining),
+            'RateLimit-Reset': str(self.reset),
+            'RateLimit-Policy': self.policy
+        }
+        if not self.allowed:
+            headers['Retry-After'] = str(self.retry_after)
+        return headers
+
+
+class RateLimiter:
+    """Límite de peticiones por cliente (usuario del token o IP) y grupo de rutas"""
+
+    def __init__(self, limits, backend, shards=config.RATE_LIMIT_SHARDS):
+        # {grupo: (capacidad, tokens por segundo, ventana)}
+        self.limits = limits
+        self.backend = backend
+        # Contadores de permitidas/rechazadas repartidos por hilo, igual que los buckets
+        self._counters = [({group: [0, 0] for group in limits}, threading.Lock()) for _ in range(shards)]
+
+    def check(self, group, client):
+        """Consumir una petición del cliente en el grupo"""
+        capacity, rate, window = self.limits[group]
+        allowed, tokens = self.backend.take(f"{group}|{client}", capacity, rate, time.time())
+
+        counts, lock = self._counters[threading.get_native_id() % len(self._counters)]
+        with lock:
+            counts[group][0 if allowed else 1] += 1
+        return RateDecision(
+            allowed=allowed,
+            limit=capacity,
+            remaining=int(tokens),
+            # Segundos hasta que el bucket vuelve a estar lleno
+            reset=int(math.ceil((capacity - tokens) / rate)),
+            retry_after=max(1, int(math.ceil((1 - tokens) / rate))),
+            policy=f"{capacity};w={int(window)}"
+        )
+
+    def snapshot(self):
+        groups = {
+            group: {"limit": capacity, "window_seconds": window, "allowed": 0, "limited": 0}
+            for group, (capacity, _, window) in self.limits.items()
+        }
+        for counts, lock in self._counters:
+            with lock:
+                for group, (allowed, limited) in counts.items():
+                    groups[group]["allowed"] += allowed
+                    groups[group]["limited"] += limited
+        return {"backend": type(self.backend).__name__, "groups": groups}
+
+
+def create_limiter():
+    """Limitador configurado según GATEWAY_RATE_LIMIT_*"""
+    limits = {
+        'auth': parse_limit(config.RATE_LIMIT_AUTH),
+        'user': parse_limit(config.RATE_LIMIT_USER),
+        'task': parse_limit(config.RATE_LIMIT_TASK)
+    }
+    if config.RATE_LIMIT_BACKEND == 'shm':
+        backend = SharedMemoryBuckets()
+    else:
+        backend = MemoryBuckets()
+    return RateLimiter(limits, backend)
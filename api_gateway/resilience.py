@@ -0,0 +1,263 @@
+# api_gateway/resilience.py
+import math
+import threading
+import time
+from collections import deque
+
+import config
+
+
+class LatencyWindow:
+    """Últimas latencias observadas de un servicio, para calcular percentiles"""
+
+    def __init__(self, size=config.LATENCY_WINDOW):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentiles(self, *quantiles):
+        """Percentiles (0-1) de la ventana, o None si aún no hay muestras"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return [None for _ in quantiles]
+        last = len(samples) - 1
+        return [samples[min(last, int(math.ceil(q * len(samples))) - 1)] for q in quantiles]
+
+
+class CircuitBreaker:
+    """Circuit breaker con estados cerrado, abierto y semiabierto"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self,
+                 window=config.BREAKER_WINDOW,
+                 min_calls=config.BREAKER_MIN_CALLS,
+                 failure_rate=config.BREAKER_FAILURE_RATE,
+                 slow_call_seconds=config.BREAKER_SLOW_CALL_SECONDS,
+                 slow_call_rate=config.BREAKER_SLOW_CALL_RATE,
+                 open_seconds=config.BREAKER_OPEN_SECONDS,
+                 half_open_calls=config.BREAKER_HALF_OPEN_CALLS):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)
+        self._failures = 0
+        self._slow = 0
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_calls = 0
+        self._trial_successes = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def allow(self):
+        """¿Se puede enviar una petición al servicio?"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self._trial_calls >= self.half_open_calls:
+                    self.rejected += 1
+                    return False
+                self._trial_calls += 1
+            return True
+
+    def record(self, success, latency):
+        """Registrar el resultado de una petición permitida por allow()"""
+        slow = latency is not None and latency >= self.slow_call_seconds
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                if not success or slow:
+                    self._set_state(self.OPEN)
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.half_open_calls:
+                        self._set_state(self.CLOSED)
+                return
+            if self.state == self.OPEN:
+                # Respuesta tardía de una petición enviada antes de abrir el circuito
+                return
+
+            if len(self._outcomes) == self._outcomes.maxlen:
+                old_success, old_slow = self._outcomes[0]
+                self._failures -= not old_success
+                self._slow -= old_slow
+            self._outcomes.append((success, slow))
+            self._failures += not success
+            self._slow += slow
+
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and (self._failures / calls >= self.failure_rate
+                                            or self._slow / calls >= self.slow_call_rate):
+                self._set_state(self.OPEN)
+
+    def _set_state(self, state):
+        self.state = state
+        self._trial_calls = 0
+        self._trial_successes = 0
+        if state == self.OPEN:
+            self._opened_at = time.monotonic()
+            self.times_opened += 1
+        elif state == self.CLOSED:
+            self._outcomes.clear()
+            self._failures = 0
+            self._slow = 0
+
+    def retry_after(self):
+        """Segundos hasta que el circuito vuelva a dejar pasar peticiones"""
+        with self._lock:
+            if self.state != self.OPEN:
+                return 1
+            remaining = self.open_seconds - (time.monotonic() - self._opened_at)
+            return max(1, int(math.ceil(remaining)))
+
+    def snapshot(self):
+        with self._lock:
+            calls = len(self._outcomes)
+            return {
+                "state": self.state,
+                "window_calls": calls,
+                "failure_rate": round(self._failures / calls, 4) if calls else 0.0,
+                "slow_call_rate": round(self._slow / calls, 4) if calls else 0.0,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected
+            }
+
+
+class Bulkhead:
+    """Límite de peticiones simultáneas hacia un servicio; el exceso se rechaza sin esperar"""
+
+    def __init__(self, max_in_flight=config.MAX_IN_FLIGHT):
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.rejected = 0
+
+    def try_acquire(self):
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                self.rejected += 1
+                return False
+            self.in_flight += 1
+            if self.in_flight > self.peak_in_flight:
+                self.peak_in_flight = self.in_flight
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "max_in_flight": self.max_in_flight,
+                "rejected": self.rejected
+            }
+
+
+class AdaptiveTimeout:
+    """Timeout de lectura de una ruta derivado del p99 de sus propias latencias"""
+
+    def __init__(self):
+        self.latencies = LatencyWindow()
+        self._read_timeout = config.UPSTREAM_TIMEOUT
+        self._expires = 0.0
+
+    def read_timeout(self):
+        now = time.monotonic()
+        if now >= self._expires:
+            # Recalcular como mucho una vez por segundo para no ordenar la ventana en cada petición
+            read_timeout = config.UPSTREAM_TIMEOUT
+            if len(self.latencies) >= config.ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+                p99, = self.latencies.percentiles(0.99)
+                read_timeout = min(config.UPSTREAM_TIMEOUT,
+                                   max(config.ADAPTIVE_TIMEOUT_MIN, p99 * config.ADAPTIVE_TIMEOUT_MULTIPLIER))
+            self._read_timeout = read_timeout
+            self._expires = now + 1
+        return self._read_timeout
+
+
+class UpstreamGuard:
+    """Circuit breaker, límite de concurrencia y timeouts adaptativos (por ruta) de un servicio"""
+
+    def __init__(self, name):
+        self.name = name
+        self.breaker = CircuitBreaker()
+        self.bulkhead = Bulkhead()
+        self.latencies = LatencyWindow()
+        # {ruta: AdaptiveTimeout}; cada ruta tiene su propia ventana para que las rutas
+        # lentas (p. ej. bcrypt) no reciban el timeout de las rápidas
+        self._routes = {}
+        self._routes_lock = threading.Lock()
+
+    def admit(self):
+        """Reservar un hueco para una petición; devuelve (mensaje, retry_after) si se rechaza"""
+        if not self.bulkhead.try_acquire():
+            return "Servicio saturado, intente más tarde", 1
+        if not self.breaker.allow():
+            self.bulkhead.release()
+            return "Servicio no disponible temporalmente", self.breaker.retry_after()
+        return None
+
+    def _route(self, route):
+        adaptive = self._routes.get(route)
+        if adaptive is None:
+            with self._routes_lock:
+                adaptive = self._routes.setdefault(route, AdaptiveTimeout())
+        return adaptive
+
+    def record(self, success, latency, route=None):
+        """Registrar el resultado de una petición admitida"""
+        if latency is not None:
+            self.latencies.add(latency)
+            if route is not None:
+                self._route(route).latencies.add(latency)
+        self.breaker.record(success, latency)
+
+    def release(self):
+        self.bulkhead.release()
+
+    def timeout(self, route=None):
+        """
+        (connect, read) en segundos. Con route, el de lectura se deriva del p99 de esa ruta;
+        sin ella (escrituras, streams) es el fijo UPSTREAM_TIMEOUT.
+        """
+        if route is None:
+            return config.CONNECT_TIMEOUT, config.UPSTREAM_TIMEOUT
+        return config.CONNECT_TIMEOUT, self._route(route).read_timeout()
+
+    def snapshot(self):
+        p50, p95, p99 = self.latencies.percentiles(0.5, 0.95, 0.99)
+        to_ms = lambda value: round(value * 1000, 1) if value is not None else None
+        with self._routes_lock:
+            routes = list(self._routes.items())
+        return {
+            "breaker": self.breaker.snapshot(),
+            "concurrency": self.bulkhead.snapshot(),
+            "latency_ms": {"p50": to_ms(p50), "p95": to_ms(p95), "p99": to_ms(p99), "samples": len(self.latencies)},
+            "timeout_seconds": {
+                "connect": config.CONNECT_TIMEOUT,
+                "read": config.UPSTREAM_TIMEOUT,
+                "read_by_route": {route: round(adaptive.read_timeout(), 3) for route, adaptive in routes}
+            }
+        }
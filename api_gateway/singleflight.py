@@ -0,0 +1,74 @@
+# api_gateway/singleflight.py
+import threading
+
+
+class _Call:
+    """Llamada en curso compartida por todas las peticiones con la misma clave"""
+
+    __slots__ = ('done', 'value', 'shared')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.shared = False
+
+
+class SingleFlight:
+    """Agrupa peticiones concurrentes idénticas en una sola llamada"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.not_shared = 0
+        self.wait_timeouts = 0
+
+    def do(self, key, fn, timeout=None):
+        """
+        Ejecutar fn una sola vez por clave mientras haya una llamada en curso.
+
+        fn devuelve (valor, compartible). Devuelve (valor, es_lider); las peticiones
+        que esperaron reciben None si el valor no era compartible, si la llamada
+        falló o si se agotó el timeout, y deben hacer su propia llamada.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                with self._lock:
+                    self.wait_timeouts += 1
+                return None, False
+            if not call.shared:
+                with self._lock:
+                    self.not_shared += 1
+                return None, False
+            return call.value, False
+
+        try:
+            value, shared = fn()
+            call.value = value if shared else None
+            call.shared = shared
+            return value, True
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "not_shared": self.not_shared,
+                "wait_timeouts": self.wait_timeouts
+            }
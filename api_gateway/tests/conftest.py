@@ -0,0 +1,14 @@
+# api_gateway/tests/conftest.py
+# Las pruebas del gateway importan sus módulos como lo hace app.py (config, cache...), así que
+# se ejecutan aparte de las de cada servicio: cd api_gateway && python -m pytest tests
+import os
+import sys
+
+GATEWAY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(GATEWAY_DIR))
+sys.path.insert(0, GATEWAY_DIR)
+
+# Sin trazas en fichero ni comprobaciones de salud en segundo plano durante las pruebas
+os.environ.setdefault('TRACE_SAMPLE_RATE', '0')
+os.environ.setdefault('TRACE_FILE', '')
+os.environ.setdefault('GATEWAY_ACTIVE_HEALTH_ENABLED', 'false')
@@ -0,0 +1,80 @@
+# api_gateway/tests/test_batch.py
+import pytest
+
+import app as gateway
+
+
+@pytest.fixture
+def client():
+    return gateway.app.test_client()
+
+
+def test_batch_runs_each_request_in_order(client):
+    response = client.post('/batch', json={"requests": [
+        {"id": "raiz", "path": "/"},
+        {"id": "stats", "path": "/gateway/stats"},
+        {"id": "no-existe", "path": "/no-existe"}
+    ]})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["count"] == 3
+    assert [r["id"] for r in data["responses"]] == ["raiz", "stats", "no-existe"]
+    assert [r["status"] for r in data["responses"]] == [200, 200, 404]
+    root = data["responses"][0]
+    assert root["headers"]["Content-Type"] == "application/json"
+    assert root["body"]["endpoints"]["system"]["batch"] == "POST /batch"
+
+
+def test_invalid_items_fail_alone(client):
+    response = client.post('/batch', json={"requests": [
+        {"id": 1, "path": "sin-barra"},
+        {"id": 2, "path": "/batch", "method": "POST"},
+        {"id": 3, "path": "/", "method": "TRACE"},
+        {"id": 4, "path": "/", "headers": ["no", "es", "objeto"]},
+        "no es un objeto",
+        {"id": 6, "path": "/"}
+    ]})
+    assert response.status_code == 200
+    responses = response.get_json()["responses"]
+    assert [r["status"] for r in responses] == [400, 400, 400, 400, 400, 200]
+    assert "id" not in responses[4]
+    assert responses[1]["body"]["error"] == "No se permiten lotes anidados"
+
+
+def test_sub_request_error_does_not_fail_batch(client, monkeypatch):
+    run_one = gateway.batches._run_one
+
+    def failing(item, inherited, environ_base):
+        if item.get('path') == '/falla':
+            raise RuntimeError('sub-petición rota')
+        return run_one(item, inherited, environ_base)
+
+    monkeypatch.setattr(gateway.batches, '_run_one', failing)
+    failed = gateway.batches.snapshot()["failed"]
+    response = client.post('/batch', json={"requests": [
+        {"id": "a", "path": "/falla"},
+        {"id": "b", "path": "/"}
+    ]})
+    assert response.status_code == 200
+    first, second = response.get_json()["responses"]
+    assert (first["id"], first["status"]) == ("a", 500)
+    assert "sub-petición rota" in first["body"]["error"]
+    assert (second["id"], second["status"]) == ("b", 200)
+    assert gateway.batches.snapshot()["failed"] == failed + 1
+
+
+@pytest.mark.parametrize('body, error', [
+    ([], "Se requiere un cuerpo JSON con la lista 'requests'"),
+    ({"requests": []}, "Se requiere una lista 'requests' con al menos una petición"),
+    ({"requests": "/"}, "Se requiere una lista 'requests' con al menos una petición")
+])
+def test_malformed_batch_is_rejected(client, body, error):
+    response = client.post('/batch', json=body)
+    assert response.status_code == 400
+    assert response.get_json()["error"] == error
+
+
+def test_batch_size_limit(client):
+    items = [{"path": "/"}] * (gateway.batches.max_requests + 1)
+    response = client.post('/batch', json={"requests": items})
+    assert response.status_code == 400
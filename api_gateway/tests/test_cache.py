@@ -0,0 +1,83 @@
+# api_gateway/tests/test_cache.py
+import time
+
+from cache import ResponseCache
+
+HEADERS = [('Content-Type', 'application/json')]
+
+
+def make_cache(**kwargs):
+    options = dict(ttl=30, max_entries=100, max_bytes=1 << 20, max_entry_bytes=1 << 16)
+    options.update(kwargs)
+    return ResponseCache(**options)
+
+
+def test_put_and_get():
+    cache = make_cache()
+    generation = cache.generation('user:1')
+    assert cache.put('k', 'user:1', 200, HEADERS, b'{}', generation)
+    entry = cache.get('k')
+    assert (entry.status, entry.body) == (200, b'{}')
+    assert cache.get('otra') is None
+    snapshot = cache.snapshot()
+    assert (snapshot['hits'], snapshot['misses'], snapshot['stores']) == (1, 1, 1)
+
+
+def test_entry_expires_after_ttl(monkeypatch):
+    cache = make_cache(ttl=10)
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache.put('k', 'user:1', 200, HEADERS, b'{}', cache.generation('user:1'))
+    now[0] += 9.9
+    assert cache.get('k') is not None
+    now[0] += 0.1
+    assert cache.get('k') is None
+    snapshot = cache.snapshot()
+    assert snapshot['expirations'] == 1
+    assert (snapshot['entries'], snapshot['bytes']) == (0, 0)
+
+
+def test_invalidate_removes_only_that_user():
+    cache = make_cache()
+    cache.put('a1', 'user:1', 200, HEADERS, b'a', cache.generation('user:1'))
+    cache.put('a2', 'user:1', 200, HEADERS, b'b', cache.generation('user:1'))
+    cache.put('b1', 'user:2', 200, HEADERS, b'c', cache.generation('user:2'))
+    cache.invalidate('user:1')
+    assert cache.get('a1') is None and cache.get('a2') is None
+    assert cache.get('b1') is not None
+    assert cache.snapshot()['entries'] == 1
+
+
+def test_read_started_before_write_is_not_stored():
+    cache = make_cache()
+    generation = cache.generation('user:1')
+    # Una escritura del usuario termina mientras la lectura espera al servicio
+    cache.invalidate('user:1')
+    assert not cache.put('k', 'user:1', 200, HEADERS, b'viejo', generation)
+    assert cache.get('k') is None
+    assert cache.snapshot()['stale_discards'] == 1
+    # La siguiente lectura ya parte de la generación nueva
+    assert cache.put('k', 'user:1', 200, HEADERS, b'nuevo', cache.generation('user:1'))
+
+
+def test_lru_eviction_by_entries():
+    cache = make_cache(max_entries=2)
+    for key in ('a', 'b'):
+        cache.put(key, 'user:1', 200, HEADERS, b'x', cache.generation('user:1'))
+    # 'a' pasa a ser la más reciente: se expulsa 'b'
+    cache.get('a')
+    cache.put('c', 'user:1', 200, HEADERS, b'x', cache.generation('user:1'))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.snapshot()['evictions'] == 1
+
+
+def test_size_limits():
+    cache = make_cache(max_entry_bytes=10)
+    assert not cache.put('big', 'user:1', 200, HEADERS, b'x' * 11, cache.generation('user:1'))
+    cache = make_cache(max_bytes=1200)
+    cache.put('a', 'user:1', 200, HEADERS, b'x' * 100, cache.generation('user:1'))
+    cache.put('b', 'user:1', 200, HEADERS, b'x' * 100, cache.generation('user:1'))
+    snapshot = cache.snapshot()
+    assert snapshot['entries'] == 1 and snapshot['bytes'] <= 1200
+    assert cache.get('b') is not None
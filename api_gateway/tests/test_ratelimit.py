@@ -0,0 +1,75 @@
+# api_gateway/tests/test_ratelimit.py
+import pytest
+
+from ratelimit import MemoryBuckets, RateLimiter, SharedMemoryBuckets, parse_limit
+
+
+def test_parse_limit():
+    assert parse_limit('60/60') == (60, 1.0, 60.0)
+    assert parse_limit('10/2') == (10, 5.0, 2.0)
+
+
+def test_bucket_empties_and_refills():
+    buckets = MemoryBuckets(shards=4, max_keys=100)
+    # Capacidad 3, un token por segundo
+    assert [buckets.take('a', 3, 1.0, 100.0)[0] for _ in range(4)] == [True, True, True, False]
+    # Medio segundo después aún no hay un token entero
+    assert buckets.take('a', 3, 1.0, 100.5) == (False, 0.5)
+    allowed, tokens = buckets.take('a', 3, 1.0, 101.0)
+    assert allowed and tokens == 0
+    # La recarga no pasa de la capacidad
+    allowed, tokens = buckets.take('a', 3, 1.0, 1000.0)
+    assert allowed and tokens == 2
+
+
+def test_buckets_are_per_key():
+    buckets = MemoryBuckets(shards=4, max_keys=100)
+    assert buckets.take('a', 1, 1.0, 0.0)[0]
+    assert not buckets.take('a', 1, 1.0, 0.0)[0]
+    assert buckets.take('b', 1, 1.0, 0.0)[0]
+
+
+def test_sweep_keeps_active_buckets():
+    buckets = MemoryBuckets(shards=1, max_keys=2)
+    buckets.take('a', 2, 1.0, 0.0)
+    buckets.take('b', 2, 1.0, 10.0)
+    # 'a' ya estaría llena: se olvida para dejar sitio y 'b' conserva su estado
+    buckets.take('c', 2, 1.0, 10.0)
+    shard = buckets._shards[0][0]
+    assert set(shard) == {'b', 'c'}
+    assert buckets.take('b', 2, 1.0, 10.0) == (True, 0.0)
+
+
+def test_shared_memory_buckets(tmp_path):
+    buckets = SharedMemoryBuckets(path=str(tmp_path / 'buckets'), slots=64, stripes=4)
+    assert [buckets.take('a', 2, 1.0, 50.0)[0] for _ in range(3)] == [True, True, False]
+    assert buckets.take('b', 2, 1.0, 50.0)[0]
+    assert buckets.take('a', 2, 1.0, 51.0)[0]
+
+
+def test_limiter_headers_and_counts():
+    limiter = RateLimiter({'task': parse_limit('2/10')}, MemoryBuckets(shards=2, max_keys=100), shards=2)
+    first = limiter.check('task', 'user:1')
+    assert first.allowed
+    assert first.headers() == {
+        'RateLimit-Limit': '2',
+        'RateLimit-Remaining': '1',
+        'RateLimit-Reset': '5',
+        'RateLimit-Policy': '2;w=10'
+    }
+    limiter.check('task', 'user:1')
+    rejected = limiter.check('task', 'user:1')
+    assert not rejected.allowed
+    assert rejected.headers()['Retry-After'] == str(rejected.retry_after)
+    assert 1 <= rejected.retry_after <= 5
+    assert limiter.check('task', 'user:2').allowed
+
+    groups = limiter.snapshot()['groups']
+    assert groups['task']['allowed'] == 3
+    assert groups['task']['limited'] == 1
+
+
+def test_unknown_group():
+    limiter = RateLimiter({'task': parse_limit('2/10')}, MemoryBuckets(shards=1, max_keys=10), shards=1)
+    with pytest.raises(KeyError):
+        limiter.check('auth', 'user:1')
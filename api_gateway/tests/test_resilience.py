@@ -0,0 +1,152 @@
+# api_gateway/tests/test_resilience.py
+import time
+
+import pytest
+
+import config
+from resilience import AdaptiveTimeout, Bulkhead, CircuitBreaker, UpstreamGuard
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    return now
+
+
+def make_breaker(**kwargs):
+    options = dict(window=10, min_calls=4, failure_rate=0.5, slow_call_seconds=1.0,
+                   slow_call_rate=0.5, open_seconds=30, half_open_calls=2)
+    options.update(kwargs)
+    return CircuitBreaker(**options)
+
+
+def test_stays_closed_below_min_calls():
+    breaker = make_breaker()
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_opens_on_failure_rate(clock):
+    breaker = make_breaker()
+    for success in (True, False, True, False):
+        breaker.allow()
+        breaker.record(success, 0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() == 30
+    clock[0] += 20
+    assert breaker.retry_after() == 10
+    snapshot = breaker.snapshot()
+    assert (snapshot['times_opened'], snapshot['rejected']) == (1, 1)
+
+
+def test_opens_on_slow_calls():
+    breaker = make_breaker()
+    for latency in (0.1, 0.1, 2.0, 1.0):
+        breaker.allow()
+        breaker.record(True, latency)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_window_forgets_old_failures():
+    breaker = make_breaker(window=4, min_calls=4)
+    for success in (False, True, True, True):
+        breaker.record(success, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    # La ventana sigue llena de éxitos: el fallo más antiguo sale al entrar otro
+    for success in (False, True):
+        breaker.record(success, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.snapshot()['failure_rate'] == 0.25
+
+
+def open_breaker(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+    clock[0] += 30
+    return breaker
+
+
+def test_half_open_closes_after_successful_trials(clock):
+    breaker = open_breaker(clock)
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    # Solo half_open_calls peticiones de prueba a la vez
+    assert not breaker.allow()
+    breaker.record(True, 0.1)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record(True, 0.1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.snapshot()['window_calls'] == 0
+    assert breaker.allow()
+
+
+def test_half_open_reopens_on_failure_or_slow_call(clock):
+    breaker = open_breaker(clock)
+    assert breaker.allow()
+    breaker.record(False, 0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record(True, 5.0)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.snapshot()['times_opened'] == 3
+
+
+def test_late_response_while_open_is_ignored(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False, 0.1)
+    breaker.record(True, 0.1)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.snapshot()['window_calls'] == 4
+
+
+def test_bulkhead():
+    bulkhead = Bulkhead(max_in_flight=2)
+    assert bulkhead.try_acquire() and bulkhead.try_acquire()
+    assert not bulkhead.try_acquire()
+    bulkhead.release()
+    assert bulkhead.try_acquire()
+    snapshot = bulkhead.snapshot()
+    assert (snapshot['peak_in_flight'], snapshot['rejected']) == (2, 1)
+
+
+def test_adaptive_timeout(clock, monkeypatch):
+    monkeypatch.setattr(config, 'UPSTREAM_TIMEOUT', 30)
+    monkeypatch.setattr(config, 'ADAPTIVE_TIMEOUT_MIN', 5)
+    monkeypatch.setattr(config, 'ADAPTIVE_TIMEOUT_MIN_SAMPLES', 10)
+    monkeypatch.setattr(config, 'ADAPTIVE_TIMEOUT_MULTIPLIER', 3)
+    adaptive = AdaptiveTimeout()
+    # Sin muestras suficientes se usa el timeout fijo
+    assert adaptive.read_timeout() == 30
+    for _ in range(10):
+        adaptive.latencies.add(4.0)
+    # Se recalcula como mucho una vez por segundo
+    assert adaptive.read_timeout() == 30
+    clock[0] += 1
+    assert adaptive.read_timeout() == 12
+    # Las latencias lentas salen de la ventana
+    for _ in range(config.LATENCY_WINDOW):
+        adaptive.latencies.add(0.01)
+    clock[0] += 1
+    assert adaptive.read_timeout() == 5
+
+
+def test_guard_timeout_per_route(clock, monkeypatch):
+    monkeypatch.setattr(config, 'ADAPTIVE_TIMEOUT_MIN_SAMPLES', 1)
+    guard = UpstreamGuard('task')
+    guard.record(True, 0.01, route='GET /tasks')
+    guard.record(True, 20.0, route='POST /login')
+    assert guard.timeout() == (config.CONNECT_TIMEOUT, config.UPSTREAM_TIMEOUT)
+    # Cada ruta usa su propia ventana de latencias
+    assert guard.timeout('GET /tasks')[1] == config.ADAPTIVE_TIMEOUT_MIN
+    assert guard.timeout('POST /login')[1] == config.UPSTREAM_TIMEOUT
@@ -0,0 +1,97 @@
+# api_gateway/tests/test_singleflight.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def run_concurrently(flights, fn, waiters, timeout=5):
+    """Un líder bloqueado en fn y waiters peticiones más con la misma clave"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def leader_fn():
+        started.set()
+        release.wait(5)
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=waiters + 1) as executor:
+        leader = executor.submit(flights.do, 'k', leader_fn)
+        started.wait(5)
+        followers = [executor.submit(flights.do, 'k', fn, timeout) for _ in range(waiters)]
+        # Los seguidores ya están esperando a la llamada del líder
+        wait_until(lambda: flights.snapshot()['coalesced'] == waiters)
+        release.set()
+        return leader.result(), [f.result() for f in followers]
+
+
+def test_followers_share_leader_value():
+    flights = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return 'valor', True
+
+    leader, followers = run_concurrently(flights, fn, waiters=3)
+    assert leader == ('valor', True)
+    assert followers == [('valor', False)] * 3
+    assert len(calls) == 1
+    snapshot = flights.snapshot()
+    assert (snapshot['leaders'], snapshot['coalesced'], snapshot['in_flight']) == (1, 3, 0)
+
+
+def test_value_not_shared():
+    flights = SingleFlight()
+    leader, followers = run_concurrently(flights, lambda: ('privado', False), waiters=2)
+    assert leader == ('privado', True)
+    # Los seguidores no reciben la respuesta y hacen su propia llamada
+    assert followers == [(None, False)] * 2
+    assert flights.snapshot()['not_shared'] == 2
+
+
+def test_leader_error_releases_waiters():
+    flights = SingleFlight()
+
+    def failing():
+        raise RuntimeError('caído')
+
+    with pytest.raises(RuntimeError):
+        flights.do('k', failing)
+    # La clave queda libre: la siguiente llamada vuelve a ser líder
+    assert flights.do('k', lambda: (1, True)) == (1, True)
+    assert flights.snapshot()['in_flight'] == 0
+
+
+def test_wait_timeout():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return 'tarde', True
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        leader = executor.submit(flights.do, 'k', slow)
+        wait_until(lambda: flights.snapshot()['in_flight'] == 1)
+        assert flights.do('k', slow, timeout=0.01) == (None, False)
+        release.set()
+        assert leader.result() == ('tarde', True)
+    assert flights.snapshot()['wait_timeouts'] == 1
+
+
+def test_different_keys_do_not_wait():
+    flights = SingleFlight()
+    assert flights.do('a', lambda: ('a', True)) == ('a', True)
+    assert flights.do('b', lambda: ('b', True)) == ('b', True)
+    assert flights.snapshot()['leaders'] == 2
@@ -0,0 +1,121 @@
+# api_gateway/tokens.py
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+
+from config import SECRET_KEY, IDENTITY_SECRET, IDENTITY_TTL, TOKEN_MEMO_SIZE
+
+# Cabecera con la identidad verificada que el gateway envía al Task Service
+IDENTITY_HEADER = 'X-Identity'
+
+
+class TokenError(Exception):
+    """Token ausente o no válido; el mensaje es el que se devuelve al cliente"""
+
+
+class _TokenMemo:
+    """Claims de tokens ya verificados (LRU), válidos hasta la expiración del token"""
+
+    def __init__(self, max_entries=TOKEN_MEMO_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token):
+        with self._lock:
+            claims = self._entries.get(token)
+            if claims is None or claims['exp'] <= time.time():
+                self._entries.pop(token, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return claims
+
+    def put(self, token, claims):
+        with self._lock:
+            self._entries[token] = claims
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def snapshot(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+token_memo = _TokenMemo()
+
+
+def bearer_token(auth_header):
+    """Extraer el token de una cabecera 'Bearer <token>'"""
+    if not auth_header:
+        return None
+    parts = auth_header.split(' ')
+    if len(parts) < 2 or not parts[1]:
+        return None
+    return parts[1]
+
+
+def verify_token(auth_header):
+    """
+    Claims de un token válido. Lanza TokenError con los mismos mensajes
+    que devuelve el Task Service.
+    """
+    if not auth_header:
+        raise TokenError("Token requerido")
+    token = bearer_token(auth_header)
+    if not token:
+        raise TokenError("Formato de token inválido. Use: Bearer <token>")
+
+    claims = token_memo.get(token)
+    if claims is not None:
+        return claims
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=['HS256'], options={'require': ['exp', 'sub']})
+    except jwt.ExpiredSignatureError:
+        raise TokenError("Token expirado. Por favor, inicie sesión nuevamente")
+    except jwt.InvalidTokenError:
+        raise TokenError("Token inválido")
+    token_memo.put(token, claims)
+    return claims
+
+
+def token_subject(auth_header):
+    """Usuario (claim 'sub') de un token válido, o None si falta o no es válido"""
+    try:
+        return verify_token(auth_header)['sub']
+    except TokenError:
+        return None
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def identity_header(claims):
+    """
+    Cabecera X-Identity firmada con HMAC-SHA256: '<identidad en base64>.<firma>'.
+    None si el token no trae id y rol (tokens emitidos antes de añadirlos).
+    """
+    if 'uid' not in claims or 'role' not in claims:
+        return None
+    identity = {
+        "sub": claims['sub'],
+        "uid": claims['uid'],
+        "role": claims['role'],
+        # Versión de permisos: el Task Service rechaza los tokens de una versión anterior
+        "pv": claims.get('pv', 0),
+        "exp": min(int(claims['exp']), int(time.time()) + IDENTITY_TTL)
+    }
+    payload = _b64encode(json.dumps(identity, separators=(',', ':')).encode('utf-8'))
+    signature = hmac.new(IDENTITY_SECRET.encode('utf-8'), payload.encode('ascii'), hashlib.sha256).digest()
+    return f"{payload}.{_b64encode(signature)}"
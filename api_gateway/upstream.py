@@ -0,0 +1,313 @@
+# api_gateway/upstream.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
+
+import config
+from balancer import LoadBalancer
+from resilience import UpstreamGuard
+
+# Cabeceras hop-by-hop (RFC 7230): describen una sola conexión y no se reenvían
+HOP_BY_HOP_HEADERS = frozenset([
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailer', 'transfer-encoding', 'upgrade'
+])
+
+# Cabeceras de la respuesta del servicio que el propio gateway vuelve a generar
+REGENERATED_RESPONSE_HEADERS = frozenset(['server', 'date'])
+
+# Métodos que se pueden repetir si la conexión se cae después de enviar la petición
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+
+class PoolStats:
+    """Contadores de uso de un pool de conexiones"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.reused = 0
+        self.misses = 0
+        self.evicted_idle = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+
+    def checkout(self, reused):
+        with self._lock:
+            self.requests += 1
+            if reused:
+                self.reused += 1
+            else:
+                self.misses += 1
+            self.in_use += 1
+            if self.in_use > self.peak_in_use:
+                self.peak_in_use = self.in_use
+
+    def checkin(self):
+        with self._lock:
+            if self.in_use > 0:
+                self.in_use -= 1
+
+    def evicted(self):
+        with self._lock:
+            self.evicted_idle += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "reused": self.reused,
+                "misses": self.misses,
+                "evicted_idle": self.evicted_idle,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "reuse_ratio": round(self.reused / self.requests, 4) if self.requests else 0.0
+            }
+
+
+class _TrackingPoolMixin:
+    """Pool de urllib3 que descarta conexiones ociosas y cuenta reutilizaciones"""
+
+    stats = None
+    idle_timeout = None
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        last_used = getattr(conn, '_gateway_last_used', None)
+        if (conn.sock is not None and last_used is not None
+                and time.monotonic() - last_used > self.idle_timeout):
+            # Cerrar antes de que el servicio lo haga por su cuenta
+            conn.close()
+            self.stats.evicted()
+        self.stats.checkout(reused=conn.sock is not None)
+        return conn
+
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn._gateway_last_used = time.monotonic()
+        self.stats.checkin()
+        super()._put_conn(conn)
+
+
+# Indica, en el hilo que hace la petición, si su cuerpo se puede volver a enviar
+_request_state = threading.local()
+
+
+def _replayable_body(data):
+    """Un cuerpo en memoria se puede reenviar; un stream ya consumido no"""
+    return data is None or isinstance(data, (bytes, str, dict, list, tuple))
+
+
+class _StaleConnectionRetry(Retry):
+    """
+    Reintenta conexiones caídas pero nunca un timeout de lectura.
+
+    Los errores de conexión se reintentan siempre (la petición no llegó a enviarse); los de
+    lectura, como una conexión reutilizada que el servicio ya había cerrado, solo en métodos
+    idempotentes y con un cuerpo que se pueda reenviar entero.
+    """
+
+    def increment(self, method=None, url=None, response=None, error=None,
+                  _pool=None, _stacktrace=None):
+        if isinstance(error, ReadTimeoutError):
+            # El servicio recibió la petición y no respondió: reintentar solo duplica la espera
+            raise error
+        if (error is not None and self._is_read_error(error)
+                and not getattr(_request_state, 'replayable', True)):
+            # Parte del stream del cuerpo ya se envió: un reintento mandaría un cuerpo truncado
+            raise error
+        return super().increment(method=method, url=url, response=response, error=error,
+                                 _pool=_pool, _stacktrace=_stacktrace)
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter que instala los pools con seguimiento de uso"""
+
+    def __init__(self, stats, idle_timeout, **kwargs):
+        self._stats = stats
+        self._idle_timeout = idle_timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        attrs = {'stats': self._stats, 'idle_timeout': self._idle_timeout}
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type('TrackingHTTPConnectionPool', (_TrackingPoolMixin, HTTPConnectionPool), attrs),
+            'https': type('TrackingHTTPSConnectionPool', (_TrackingPoolMixin, HTTPSConnectionPool), attrs)
+        }
+
+
+class UpstreamPool:
+    """Pool persistente de conexiones keep-alive hacia las réplicas de un servicio"""
+
+    def __init__(self, name, replica_urls,
+                 pool_connections=config.POOL_CONNECTIONS,
+                 pool_maxsize=config.POOL_MAXSIZE,
+                 pool_block=config.POOL_BLOCK,
+                 idle_timeout=config.POOL_IDLE_TIMEOUT,
+                 retries=config.POOL_RETRIES):
+        self.name = name
+        self.pool_maxsize = pool_maxsize
+        self.stats = PoolStats()
+        self.guard = UpstreamGuard(name)
+        self.balancer = LoadBalancer(replica_urls)
+
+        retry = _StaleConnectionRetry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            allowed_methods=IDEMPOTENT_METHODS,
+            redirect=0,
+            status=0,
+            raise_on_status=False,
+            raise_on_redirect=False
+        )
+        adapter = _PooledAdapter(
+            self.stats,
+            idle_timeout,
+            # Un pool de conexiones por réplica
+            pool_connections=max(pool_connections, len(replica_urls)),
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=retry
+        )
+
+        self.session = requests.Session()
+        # El gateway no debe guardar cookies de un usuario para enviarlas en peticiones de otro
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        # Evitar buscar proxies en el entorno en cada petición
+        self.session.trust_env = False
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def request(self, method, path, timeout=config.UPSTREAM_TIMEOUT, stream=False, **kwargs):
+        """
+        Enviar una petición a una réplica del servicio reutilizando conexiones del pool.
+
+        Con stream=True la réplica sigue contando como ocupada hasta llamar a release(resp).
+        """
+        replica = self.balancer.acquire()
+        url = f"{replica.url}/{path.lstrip('/')}"
+        _request_state.replayable = _replayable_body(kwargs.get('data'))
+        try:
+            resp = self.session.request(method=method, url=url, timeout=timeout, stream=stream, **kwargs)
+        except requests.RequestException:
+            self.balancer.release(replica, False)
+            raise
+        finally:
+            _request_state.replayable = True
+
+        success = resp.status_code < 500
+        if stream:
+            resp.replica = replica
+            resp.replica_success = success
+        else:
+            self.balancer.release(replica, success)
+        return resp
+
+    def release(self, resp):
+        """Liberar la réplica de una respuesta pedida con stream=True"""
+        replica = getattr(resp, 'replica', None)
+        if replica is not None:
+            resp.replica = None
+            self.balancer.release(replica, resp.replica_success)
+
+    def check_replica(self, replica, timeout=config.ACTIVE_HEALTH_TIMEOUT):
+        """Consultar GET /health de una réplica y actualizar su estado en el balanceador"""
+        try:
+            resp = self.session.get(f"{replica.url}/health", timeout=timeout)
+            healthy = resp.status_code == 200
+        except requests.RequestException:
+            healthy = False
+        self.balancer.set_healthy(replica, healthy)
+        return healthy
+
+    def snapshot(self):
+        data = self.stats.snapshot()
+        data.update({"max_per_host": self.pool_maxsize})
+        data.update(self.balancer.snapshot())
+        return data
+
+    def close(self):
+        self.session.close()
+
+
+_check_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='replica-health')
+
+# Un pool por servicio, compartido por todos los hilos del gateway
+UPSTREAM_POOLS = {
+    config.AUTH_SERVICE_URL: UpstreamPool('auth_service', config.AUTH_SERVICE_URLS),
+    config.USER_SERVICE_URL: UpstreamPool('user_service', config.USER_SERVICE_URLS),
+    config.TASK_SERVICE_URL: UpstreamPool('task_service', config.TASK_SERVICE_URLS)
+}
+
+_health_thread = None
+_health_thread_lock = threading.Lock()
+# Último resultado del health check activo: (estado por servicio, time.monotonic() de la consulta)
+_last_health = None
+
+
+def _active_health_loop():
+    global _last_health
+    while True:
+        _last_health = (check_services(), time.monotonic())
+        time.sleep(config.HEALTH_INTERVAL)
+
+
+def start_health_checks():
+    """Arrancar (una sola vez) el health check activo de todas las réplicas"""
+    global _health_thread
+    if _health_thread is not None or not config.ACTIVE_HEALTH_ENABLED:
+        return
+    with _health_thread_lock:
+        if _health_thread is None:
+            _health_thread = threading.Thread(target=_active_health_loop, name='active-health', daemon=True)
+            _health_thread.start()
+
+
+def get_pool(service_url):
+    """Obtener el pool asociado a la URL de un servicio"""
+    start_health_checks()
+    return UPSTREAM_POOLS[service_url]
+
+
+def check_services(timeout=config.ACTIVE_HEALTH_TIMEOUT):
+    """Consultar todas las réplicas en paralelo; un servicio está UP si alguna réplica responde"""
+    checks = [(pool, replica) for pool in UPSTREAM_POOLS.values() for replica in pool.balancer.replicas]
+    results = _check_executor.map(lambda check: check[0].check_replica(check[1], timeout), checks)
+
+    status = {pool.name: {"status": "DOWN", "replicas": {}} for pool in UPSTREAM_POOLS.values()}
+    for (pool, replica), healthy in zip(checks, results):
+        status[pool.name]["replicas"][replica.url] = "UP" if healthy else "DOWN"
+        if healthy:
+            status[pool.name]["status"] = "UP"
+    return status
+
+
+def health_status(timeout=config.ACTIVE_HEALTH_TIMEOUT):
+    """
+    Estado de los servicios según el último health check activo; solo se consultan las réplicas
+    en la petición si no hay resultado reciente (health check activo desactivado o detenido).
+    """
+    start_health_checks()
+    last = _last_health
+    if last is not None and time.monotonic() - last[1] <= 2 * config.HEALTH_INTERVAL:
+        return last
+    return check_services(timeout), time.monotonic()
+
+
+def pool_stats():
+    """Estadísticas de todos los pools, por nombre de servicio"""
+    return {pool.name: pool.snapshot() for pool in UPSTREAM_POOLS.values()}
+
+
+def guard_stats():
+    """Estado de circuit breakers, concurrencia y latencias, por nombre de servicio"""
+    return {pool.name: pool.guard.snapshot() for pool in UPSTREAM_POOLS.values()}
@@ -1,7 +1,14 @@
+import os
+import sys
+# Módulos compartidos entre el gateway y los servicios (common/, en la raíz del proyecto)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from flask import Flask, jsonify, request
 import requests
+from common import metrics
 
 app = Flask(__name__)
+# Métricas HTTP y ruta GET /metrics
+metrics.install(app)
 
 # Lista en memoria para almacenar usuarios
 users = [
@@ -46,6 +53,11 @@ def login():
     # Si las credenciales son correctas, devolvemos un mensaje de exito y un token simulado
     return jsonify({"mensaje": "Login exitoso", "token": f"token_{user['id']}"})
 
-# Iniciamos el servidor en el puerto 5001 en modo debug
+# Ruta para comprobar que el servicio está vivo (la usa el API Gateway)
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({"status": "UP"})
+
+# Iniciamos el servidor en el puerto 5001 (o PORT) en modo debug
 if __name__ == '__main__':
-    app.run(port=5001, debug=True)
\ No newline at end of file
+    app.run(port=int(os.getenv('PORT', 5001)), debug=True)
\ No newline at end of file
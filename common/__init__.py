@@ -0,0 +1 @@
+# Módulos compartidos por el API Gateway y los servicios
@@ -0,0 +1,170 @@
+# common/compression.py
+# Compresión de respuestas según Accept-Encoding (la usan el gateway y el Task Service)
+import threading
+import time
+import zlib
+
+from werkzeug.http import parse_accept_header
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'application/xml')
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+                               or mimetype.endswith('+json'))
+
+
+class _GzipStream:
+    def __init__(self, level):
+        # wbits=31: formato gzip (cabecera y CRC) en vez de zlib
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def process(self, data):
+        return self._compressor.compress(data)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def process(self, data):
+        return self._compressor.process(data)
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class Compressor:
+    """Comprime las respuestas con gzip o brotli si el cliente lo acepta y el cuerpo lo merece"""
+
+    def __init__(self, min_size=1024, gzip_level=6, brotli_level=4, brotli_enabled=True):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_level = brotli_level
+        self.brotli_enabled = brotli_enabled and brotli is not None
+
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.skipped = {"too_small": 0, "already_encoded": 0, "not_accepted": 0}
+
+    def _negotiate(self, accept_encoding):
+        """'br', 'gzip' o None: la de mayor calidad en Accept-Encoding (brotli si empatan)"""
+        accept = parse_accept_header(accept_encoding)
+        br = accept.quality('br') if self.brotli_enabled else 0
+        gzip = accept.quality('gzip')
+        if br > 0 and br >= gzip:
+            return 'br'
+        if gzip > 0:
+            return 'gzip'
+        return None
+
+    def _stream(self, encoding):
+        if encoding == 'br':
+            return _BrotliStream(self.brotli_level)
+        return _GzipStream(self.gzip_level)
+
+    def compress(self, response, accept_encoding, method='GET'):
+        """Comprimir la respuesta (werkzeug/Flask) si procede; devuelve la misma respuesta"""
+        if (method == 'HEAD' or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or not is_compressible(response.mimetype)):
+            return response
+        # La respuesta depende de Accept-Encoding aunque finalmente no se comprima
+        response.vary.add('Accept-Encoding')
+        if 'Content-Encoding' in response.headers:
+            self._skip("already_encoded")
+            return response
+        length = response.content_length
+        if length is not None and length < self.min_size:
+            self._skip("too_small")
+            return response
+        encoding = self._negotiate(accept_encoding or '')
+        if encoding is None:
+            self._skip("not_accepted")
+            return response
+
+        if response.is_streamed or response.direct_passthrough:
+            self._compress_streamed(response, encoding)
+        else:
+            self._compress_buffered(response, encoding)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+    def _compress_buffered(self, response, encoding):
+        """Cuerpo ya en memoria: se comprime de una vez"""
+        data = response.get_data()
+        started = time.thread_time()
+        stream = self._stream(encoding)
+        compressed = stream.process(data) + stream.finish()
+        self._record(encoding, len(data), len(compressed), time.thread_time() - started)
+        response.set_data(compressed)
+
+    def _compress_streamed(self, response, encoding):
+        """Cuerpo por bloques: se comprime bloque a bloque mientras se envía, sin acumularlo"""
+        original = response.response
+        stream = self._stream(encoding)
+
+        def generate():
+            size_in = size_out = 0
+            cpu = 0.0
+            for chunk in original:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                started = time.thread_time()
+                out = stream.process(chunk)
+                cpu += time.thread_time() - started
+                size_in += len(chunk)
+                if out:
+                    size_out += len(out)
+                    yield out
+            started = time.thread_time()
+            out = stream.finish()
+            cpu += time.thread_time() - started
+            size_out += len(out)
+            self._record(encoding, size_in, size_out, cpu)
+            yield out
+
+        callbacks = [original.close] if hasattr(original, 'close') else []
+        response.response = ClosingIterator(generate(), callbacks)
+        response.headers.pop('Content-Length', None)
+
+    def _record(self, encoding, size_in, size_out, cpu):
+        with self._lock:
+            stats = self._stats.setdefault(encoding, {"responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0})
+            stats["responses"] += 1
+            stats["bytes_in"] += size_in
+            stats["bytes_out"] += size_out
+            stats["cpu_seconds"] += cpu
+
+    def _skip(self, reason):
+        with self._lock:
+            self.skipped[reason] += 1
+
+    def snapshot(self):
+        with self._lock:
+            encodings = {
+                encoding: dict(
+                    stats,
+                    cpu_seconds=round(stats["cpu_seconds"], 6),
+                    # Tamaño comprimido / original: cuanto menor, mejor
+                    ratio=round(stats["bytes_out"] / stats["bytes_in"], 4) if stats["bytes_in"] else None,
+                    cpu_ms_per_mb=round(stats["cpu_seconds"] * 1000 / (stats["bytes_in"] / 1048576), 3)
+                    if stats["bytes_in"] else None
+                )
+                for encoding, stats in self._stats.items()
+            }
+            return {
+                "min_size": self.min_size,
+                "gzip_level": self.gzip_level,
+                "brotli_level": self.brotli_level if self.brotli_enabled else None,
+                "encodings": encodings,
+                "skipped": dict(self.skipped)
+            }
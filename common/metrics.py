@@ -0,0 +1,195 @@
+# common/metrics.py
+# Métricas en formato de texto de Prometheus (las usan el gateway y todos los servicios)
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, request
+
+# Límites superiores (segundos) de los buckets de latencia
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Shards con lock propio entre los que se reparten los hilos
+DEFAULT_SHARDS = 16
+
+
+class Registry:
+    """
+    Contadores, gauges e histogramas repartidos en un número fijo de shards con lock propio:
+    cada hilo escribe en el shard de su identificador, así que los hilos concurrentes rara vez
+    comparten lock. Al consultar /metrics se suman todos los shards.
+    """
+
+    def __init__(self, shards=DEFAULT_SHARDS):
+        self._metrics = []
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+
+    def _shard(self):
+        # get_native_id() es el TID del sistema, consecutivo entre hilos; get_ident() es una
+        # dirección alineada y caería casi siempre en el mismo shard
+        return self._shards[threading.get_native_id() % len(self._shards)]
+
+    def collect(self):
+        """Valores de todos los shards sumados: {(nombre, etiquetas): valor}"""
+        total = {}
+        for values, lock in self._shards:
+            with lock:
+                _merge(total, values)
+        return total
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(self, name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self._register(Gauge(self, name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, help_text, labels, buckets))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Exposición en formato de texto de Prometheus (versión 0.0.4)"""
+        values = self.collect()
+        by_name = {}
+        for (name, labels), value in values.items():
+            by_name.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for labels, value in sorted(by_name.get(metric.name, []), key=lambda item: item[0]):
+                lines.extend(metric.format(labels, value))
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(target, source):
+    for key, value in source.items():
+        if isinstance(value, list):
+            current = target.get(key)
+            if current is None:
+                target[key] = list(value)
+            else:
+                for i, item in enumerate(value):
+                    current[i] += item
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, registry, name, help_text, labels):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+
+    def inc(self, label_values=(), amount=1):
+        values, lock = self.registry._shard()
+        key = (self.name, label_values)
+        with lock:
+            values[key] = values.get(key, 0) + amount
+
+    def format(self, label_values, value):
+        return [f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}"]
+
+
+class Gauge(Counter):
+    """Gauge que sube y baja (p. ej. peticiones en curso): se suman los aportes de cada shard"""
+
+    kind = 'gauge'
+
+    def dec(self, label_values=(), amount=1):
+        self.inc(label_values, -amount)
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help_text, labels, buckets):
+        self.registry = registry
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, label_values=()):
+        values, lock = self.registry._shard()
+        key = (self.name, label_values)
+        bucket = bisect_left(self.buckets, value)
+        with lock:
+            # [un contador por bucket, +Inf, suma]
+            counts = values.get(key)
+            if counts is None:
+                counts = values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bucket] += 1
+            counts[-1] += value
+
+    def format(self, label_values, counts):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, label_values, [('le', le)])} {cumulative}")
+        labels = _format_labels(self.labels, label_values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(counts[-1])}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+registry = Registry()
+
+REQUESTS = registry.counter('http_requests_total', 'Peticiones atendidas', ('method', 'route', 'status'))
+ERRORS = registry.counter('http_request_errors_total', 'Peticiones que terminaron con error 5xx', ('method', 'route'))
+IN_FLIGHT = registry.gauge('http_requests_in_flight', 'Peticiones en curso')
+LATENCY = registry.histogram('http_request_duration_seconds', 'Tiempo hasta generar la respuesta',
+                             ('method', 'route', 'status'))
+
+
+def install(app):
+    """Registrar las métricas HTTP de la aplicación Flask y la ruta GET /metrics"""
+
+    @app.before_request
+    def _metrics_start():
+        g.metrics_started = time.perf_counter()
+        IN_FLIGHT.inc()
+
+    @app.after_request
+    def _metrics_record(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            status = str(response.status_code)
+            REQUESTS.inc((request.method, route, status))
+            LATENCY.observe(time.perf_counter() - started, (request.method, route, status))
+            if response.status_code >= 500:
+                ERRORS.inc((request.method, route))
+            IN_FLIGHT.dec()
+        return response
+
+    @app.teardown_request
+    def _metrics_teardown(exc):
+        # Si after_request no llegó a ejecutarse, la petición sigue contada como en curso
+        if g.pop('metrics_started', None) is not None:
+            IN_FLIGHT.dec()
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
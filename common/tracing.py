@@ -0,0 +1,269 @@
+# common/tracing.py
+# Trazas distribuidas: X-Request-ID, propagación W3C traceparent y spans en formato Zipkin v2
+# (las usan el gateway y el Task Service; task_service/tracing.py añade MySQL y JSON)
+import contextvars
+import json
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+TRACEPARENT_HEADER = 'traceparent'
+# Clave del environ WSGI con la traza de las peticiones que el gateway se hace a sí mismo (/batch).
+# Un cliente no puede fijarla: sus cabeceras llegan al environ como HTTP_*
+INTERNAL_TRACEPARENT = 'tracing.traceparent'
+
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,128}$')
+
+# Span activo en el hilo/petición actual
+_current = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """Operación medida dentro de una traza"""
+
+    __slots__ = ('trace_id', 'id', 'parent_id', 'name', 'kind', 'start', 'tags', 'tracer')
+
+    def __init__(self, tracer, trace_id, parent_id, name, kind, tags):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.id = '%016x' % random.getrandbits(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.tags = {key: str(value) for key, value in tags.items()}
+        self.start = time.time()
+
+    def tag(self, key, value):
+        self.tags[key] = str(value)
+
+    def finish(self):
+        end = time.time()
+        data = {
+            "traceId": self.trace_id,
+            "id": self.id,
+            "name": self.name,
+            "timestamp": int(self.start * 1_000_000),
+            "duration": max(1, int((end - self.start) * 1_000_000)),
+            "localEndpoint": {"serviceName": self.tracer.service_name},
+            "tags": self.tags
+        }
+        if self.parent_id:
+            data["parentId"] = self.parent_id
+        if self.kind:
+            data["kind"] = self.kind
+        self.tracer.exporter.export(data)
+
+
+class SpanExporter:
+    """
+    Envía los spans en segundo plano, por lotes: a un colector Zipkin (POST /api/v2/spans)
+    o, si no hay colector, a un fichero con un lote JSON por línea.
+    """
+
+    def __init__(self, file_path=None, collector_url=None, max_queue=10000, batch_size=100, interval=1.0):
+        self.file_path = file_path
+        self.collector_url = collector_url
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.exported = 0
+        self.dropped = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            # Nunca bloquear una petición por las trazas
+            self.dropped += 1
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='span-exporter', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+                self.exported += len(batch)
+            except (OSError, ValueError) as e:
+                self.dropped += len(batch)
+                print(f"Error exportando trazas: {e}")
+
+    def _write(self, batch):
+        body = json.dumps(batch, separators=(',', ':'))
+        if self.collector_url:
+            req = urllib.request.Request(self.collector_url, data=body.encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+            urllib.request.urlopen(req, timeout=5).close()
+        elif self.file_path:
+            # Sin buffer: cada lote se escribe con un único write en modo append, así las
+            # réplicas de un servicio pueden compartir el fichero sin mezclar líneas
+            with open(self.file_path, 'ab', buffering=0) as f:
+                f.write(body.encode('utf-8') + b'\n')
+
+
+class _NoopSpan:
+    """Span de una petición no muestreada: no mide ni exporta nada"""
+
+    id = None
+
+    def tag(self, key, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def new_traceparent(sampled):
+    """traceparent de una traza nueva, con la decisión de muestreo en los flags"""
+    return f"00-{uuid.uuid4().hex}-{'%016x' % random.getrandbits(64)}-{'01' if sampled else '00'}"
+
+
+class Tracer:
+    def __init__(self, service_name, sample_rate, exporter, edge=False):
+        self.service_name = service_name
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self.edge = edge
+
+    def start_server_span(self, name, traceparent):
+        """Span de la petición entrante: continúa la traza del traceparent o empieza una nueva"""
+        match = _TRACEPARENT.match(traceparent or '')
+        if match:
+            trace_id, parent_id, flags = match.groups()
+            if not int(flags, 16) & 1:
+                return None
+        else:
+            if random.random() >= self.sample_rate:
+                return None
+            trace_id, parent_id = uuid.uuid4().hex, None
+        return Span(self, trace_id, parent_id, name, 'SERVER', {})
+
+
+_tracer = None
+
+
+def install(app, service_name, sample_rate, file_path=None, collector_url=None, edge=False):
+    """
+    Medir cada petición de la aplicación Flask y propagar X-Request-ID.
+
+    Con edge=True (el gateway, que recibe las peticiones de los clientes) se ignora el traceparent
+    entrante: si no, cualquier cliente podría forzar que se trazasen todas sus peticiones. La
+    decisión se toma aquí con sample_rate y los servicios la siguen.
+    """
+    global _tracer
+    _tracer = Tracer(service_name, sample_rate, SpanExporter(file_path, collector_url), edge)
+
+    @app.before_request
+    def _trace_start():
+        request_id = request.headers.get(REQUEST_ID_HEADER, '')
+        g.request_id = request_id if _REQUEST_ID.match(request_id) else uuid.uuid4().hex
+        if edge:
+            traceparent = request.environ.get(INTERNAL_TRACEPARENT)
+        else:
+            traceparent = request.headers.get(TRACEPARENT_HEADER)
+        span = _tracer.start_server_span(f"{request.method} {request.path}", traceparent)
+        if span is None:
+            # Tampoco se traza aguas abajo: se propaga la decisión para que nadie vuelva a sortearla
+            g.traceparent = traceparent if _TRACEPARENT.match(traceparent or '') else new_traceparent(False)
+        else:
+            span.tag('http.method', request.method)
+            span.tag('http.path', request.path)
+            span.tag('request_id', g.request_id)
+            g.trace_span = span
+            g.trace_token = _current.set(span)
+
+    @app.after_request
+    def _trace_response(response):
+        response.headers[REQUEST_ID_HEADER] = g.get('request_id', '')
+        span = g.get('trace_span')
+        if span is not None:
+            span.tag('http.status_code', response.status_code)
+            if request.url_rule is not None:
+                span.tag('http.route', request.url_rule.rule)
+        return response
+
+    @app.teardown_request
+    def _trace_end(exc):
+        span = g.pop('trace_span', None)
+        if span is not None:
+            if exc is not None:
+                span.tag('error', exc)
+            span.finish()
+            _current.reset(g.pop('trace_token'))
+
+    return _tracer
+
+
+def is_sampled():
+    """¿La petición actual se está trazando?"""
+    return _current.get() is not None
+
+
+@contextmanager
+def span(name, kind=None, **tags):
+    """Medir un bloque como hijo del span actual (no hace nada si la petición no se muestrea)"""
+    parent = _current.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    child = Span(parent.tracer, parent.trace_id, parent.id, name, kind, tags)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.tag('error', e)
+        raise
+    finally:
+        _current.reset(token)
+        child.finish()
+
+
+def outgoing_headers(current=None):
+    """Cabeceras para propagar la petición y la traza a otro servicio"""
+    headers = {}
+    request_id = g.get('request_id') if has_app_context() else None
+    if request_id:
+        headers[REQUEST_ID_HEADER] = request_id
+    current = current or _current.get()
+    if current is not None and current.id is not None:
+        headers[TRACEPARENT_HEADER] = f"00-{current.trace_id}-{current.id}-01"
+    elif has_app_context() and g.get('traceparent'):
+        headers[TRACEPARENT_HEADER] = g.traceparent
+    return headers
+
+
+def stats():
+    if _tracer is None:
+        return {}
+    return {
+        "sample_rate": _tracer.sample_rate,
+        "edge": _tracer.edge,
+        "exported_spans": _tracer.exporter.exported,
+        "dropped_spans": _tracer.exporter.dropped
+    }
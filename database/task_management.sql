@@ -34,10 +34,28 @@ CREATE TABLE IF NOT EXISTS users (
     password VARCHAR(255) NOT NULL,
     email VARCHAR(100) UNIQUE,
     role_id INT,
+    perm_version INT NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (role_id) REFERENCES roles(id)
 );
 
+-- Versión de permisos: sube al cambiar el rol y deja sin validez los tokens ya emitidos.
+-- Para revocar los tokens de un usuario: UPDATE users SET perm_version = perm_version + 1 WHERE id = ?
+-- (ADD COLUMN IF NOT EXISTS es solo de MariaDB: en MySQL se comprueba information_schema)
+SET @add_perm_version = IF(
+    (SELECT COUNT(*) FROM information_schema.COLUMNS
+     WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'users' AND COLUMN_NAME = 'perm_version') = 0,
+    'ALTER TABLE users ADD COLUMN perm_version INT NOT NULL DEFAULT 0',
+    'SELECT 1'
+);
+PREPARE add_perm_version FROM @add_perm_version;
+EXECUTE add_perm_version;
+DEALLOCATE PREPARE add_perm_version;
+DROP TRIGGER IF EXISTS trg_users_perm_version;
+CREATE TRIGGER trg_users_perm_version
+BEFORE UPDATE ON users FOR EACH ROW
+SET NEW.perm_version = IF(NEW.role_id <=> OLD.role_id, NEW.perm_version, OLD.perm_version + 1);
+
 -- ==================================================
 -- TABLA DE RELACIÓN ROLES-PERMISOS
 -- ==================================================
@@ -49,6 +67,29 @@ CREATE TABLE IF NOT EXISTS roles_permisos (
     FOREIGN KEY (permiso_id) REFERENCES permisos(id) ON DELETE CASCADE
 );
 
+-- Versión de la matriz de permisos: el Task Service la carga en memoria y la recarga
+-- cuando ve cambiar esta versión (o con POST /admin/permissions/reload)
+CREATE TABLE IF NOT EXISTS rbac_version (
+    id TINYINT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+INSERT IGNORE INTO rbac_version (id, version) VALUES (1, 0);
+DROP TRIGGER IF EXISTS trg_roles_permisos_insert_rbac;
+CREATE TRIGGER trg_roles_permisos_insert_rbac AFTER INSERT ON roles_permisos
+FOR EACH ROW UPDATE rbac_version SET version = version + 1 WHERE id = 1;
+DROP TRIGGER IF EXISTS trg_roles_permisos_update_rbac;
+CREATE TRIGGER trg_roles_permisos_update_rbac AFTER UPDATE ON roles_permisos
+FOR EACH ROW UPDATE rbac_version SET version = version + 1 WHERE id = 1;
+DROP TRIGGER IF EXISTS trg_roles_permisos_delete_rbac;
+CREATE TRIGGER trg_roles_permisos_delete_rbac AFTER DELETE ON roles_permisos
+FOR EACH ROW UPDATE rbac_version SET version = version + 1 WHERE id = 1;
+DROP TRIGGER IF EXISTS trg_permisos_update_rbac;
+CREATE TRIGGER trg_permisos_update_rbac AFTER UPDATE ON permisos
+FOR EACH ROW UPDATE rbac_version SET version = version + 1 WHERE id = 1;
+DROP TRIGGER IF EXISTS trg_permisos_delete_rbac;
+CREATE TRIGGER trg_permisos_delete_rbac AFTER DELETE ON permisos
+FOR EACH ROW UPDATE rbac_version SET version = version + 1 WHERE id = 1;
+
 -- ==================================================
 -- TABLA DE TASKS (PRINCIPAL)
 -- ==================================================
@@ -63,6 +104,48 @@ CREATE TABLE IF NOT EXISTS tasks (
     created_by INT NOT NULL,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (created_by) REFERENCES users(id)
+) DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;  -- sin distinguir acentos en la búsqueda
+
+-- ==================================================
+-- CONTADORES DE ESTADÍSTICAS (/info)
+-- ==================================================
+-- Varias filas (shard) por contador; el valor es la suma. Los mantiene el
+-- servicio de tareas y se concilian periódicamente con las tablas reales.
+CREATE TABLE IF NOT EXISTS stat_counters (
+    name VARCHAR(100) NOT NULL,
+    shard TINYINT UNSIGNED NOT NULL,
+    value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, shard)
+);
+
+-- ==================================================
+-- EVENTOS DE DEADLINE
+-- ==================================================
+-- Hasta dónde ha emitido eventos el scheduler de task_service/deadlines.py: al
+-- arrancar emite los de las tareas que vencieron mientras ninguna réplica emitía.
+CREATE TABLE IF NOT EXISTS deadline_watermark (
+    id TINYINT PRIMARY KEY,
+    fired_until DATETIME NOT NULL
+);
+
+-- ==================================================
+-- REFRESH TOKENS
+-- ==================================================
+-- Solo se guarda el HMAC del secreto. Los tokens de una misma sesión comparten
+-- family_id: reutilizar uno ya rotado revoca toda la familia.
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    id BINARY(16) PRIMARY KEY,
+    family_id BINARY(16) NOT NULL,
+    user_id INT NOT NULL,
+    secret_hash BINARY(32) NOT NULL,
+    perm_version INT NOT NULL,
+    expires_at DATETIME NOT NULL,
+    session_expires_at DATETIME NOT NULL,
+    used_at DATETIME NULL,
+    revoked BOOLEAN NOT NULL DEFAULT FALSE,
+    INDEX idx_refresh_tokens_family (family_id),
+    INDEX idx_refresh_tokens_user_expires (user_id, session_expires_at),
+    FOREIGN KEY (user_id) REFERENCES users(id)
 );
 
 -- ==================================================
@@ -98,23 +181,37 @@ SELECT
 FROM permisos p 
 WHERE p.nombre IN ('read_user', 'create_task', 'read_task', 'update_task', 'delete_task');
 
--- Asignar permisos de manager
+-- Asignar permisos de manager: los mismos que user (solo admin ve y gestiona las tareas de todos);
+-- read_all_tasks y manage_tasks se le conceden en roles_permisos si hace falta
 INSERT IGNORE INTO roles_permisos (role_id, permiso_id)
 SELECT 
     (SELECT id FROM roles WHERE nombre = 'manager') as role_id,
     p.id as permiso_id
 FROM permisos p 
-WHERE p.nombre IN ('read_user', 'create_task', 'read_task', 'update_task', 'delete_task', 'read_all_tasks', 'manage_tasks');
+WHERE p.nombre IN ('read_user', 'create_task', 'read_task', 'update_task', 'delete_task');
 
 -- ==================================================
 -- CREAR ÍNDICES PARA OPTIMIZACIÓN
 -- ==================================================
-CREATE INDEX idx_tasks_status ON tasks(status);
-CREATE INDEX idx_tasks_created_by ON tasks(created_by);
-CREATE INDEX idx_tasks_deadline ON tasks(deadline);
-CREATE INDEX idx_tasks_is_alive ON tasks(is_alive);
-CREATE INDEX idx_users_username ON users(username);
-CREATE INDEX idx_users_email ON users(email);
+-- users.username y users.email ya tienen índice por su UNIQUE; status, created_by,
+-- is_alive y deadline están cubiertos por los índices compuestos de abajo
+
+-- Índices de la paginación por cursor: filtros de igualdad y después created_at (InnoDB añade id).
+-- Cubren cada consulta de listado de task_service/app.py (ver task_service/benchmark.py)
+CREATE INDEX idx_tasks_alive_created ON tasks(is_alive, created_at);
+CREATE INDEX idx_tasks_owner_alive_created ON tasks(created_by, is_alive, created_at);
+CREATE INDEX idx_tasks_alive_status_created ON tasks(is_alive, status, created_at);
+CREATE INDEX idx_tasks_owner_alive_status_created ON tasks(created_by, is_alive, status, created_at);
+
+-- Tareas vencidas y próximas (/tasks/overdue, /tasks/upcoming) y ventanas del scheduler
+-- de deadlines (task_service/deadlines.py): recorridos de rango por deadline
+CREATE INDEX idx_tasks_alive_deadline ON tasks(is_alive, deadline);
+CREATE INDEX idx_tasks_owner_alive_deadline ON tasks(created_by, is_alive, deadline);
+-- Tareas cambiadas en cualquier réplica, que el scheduler relee periódicamente
+CREATE INDEX idx_tasks_updated ON tasks(updated_at);
+
+-- Búsqueda de texto (/tasks/search): InnoDB mantiene el índice al escribir en tasks
+CREATE FULLTEXT INDEX ft_tasks_name_description ON tasks(name, description);
 
 -- ==================================================
 -- VERIFICAR ESTRUCTURA DE TABLAS
@@ -4,6 +4,13 @@
 PROJECT_DIR="$(pwd)"
 VENV_DIR="$PROJECT_DIR/venv"
 LOG_DIR="$PROJECT_DIR/logs"
+# Runtime del gateway: "flask" (app.py) o "async" (async_app.py)
+GATEWAY_RUNTIME="${GATEWAY_RUNTIME:-flask}"
+# Réplicas de cada servicio; la réplica N escucha en el puerto base + N * REPLICA_PORT_STEP
+AUTH_REPLICAS="${AUTH_REPLICAS:-1}"
+USER_REPLICAS="${USER_REPLICAS:-1}"
+TASK_REPLICAS="${TASK_REPLICAS:-1}"
+REPLICA_PORT_STEP="${REPLICA_PORT_STEP:-100}"
 
 mkdir -p "$LOG_DIR"
 
@@ -27,17 +34,26 @@ check_port(){
     return 0
 }
 
+replica_ports(){
+    local base_port=$1
+    local replicas=$2
+    for ((i = 0; i < replicas; i++)); do
+        echo $((base_port + i * REPLICA_PORT_STEP))
+    done
+}
+
 echo "Verificando puertos disponibles..."
 check_port 4000 "API Gateway" || exit 1
-check_port 5001 "Auth Service" || exit 1
-check_port 5002 "User Service" || exit 1
-check_port 5003 "Task Service" || exit 1
+for port in $(replica_ports 5001 "$AUTH_REPLICAS"); do check_port $port "Auth Service" || exit 1; done
+for port in $(replica_ports 5002 "$USER_REPLICAS"); do check_port $port "User Service" || exit 1; done
+for port in $(replica_ports 5003 "$TASK_REPLICAS"); do check_port $port "Task Service" || exit 1; done
 
 start_service(){
     local service_dir=$1
     local service_name=$2
     local port=$3
     local display_name=$4
+    local script=${5:-app.py}
     
     echo "Iniciando $display_name en puerto $port..."
     
@@ -46,14 +62,14 @@ start_service(){
         return 1
     fi
     
-    if [ ! -f "$PROJECT_DIR/$service_dir/app.py" ]; then
-        echo "Error: No se encuentra app.py en $service_dir"
+    if [ ! -f "$PROJECT_DIR/$service_dir/$script" ]; then
+        echo "Error: No se encuentra $script en $service_dir"
         return 1
     fi
     
     cd "$PROJECT_DIR/$service_dir" || exit 1
     
-    python app.py > "$LOG_DIR/$service_name.log" 2>&1 &
+    PORT=$port python "$script" > "$LOG_DIR/$service_name.log" 2>&1 &
     local pid=$!
     echo "$pid" > "$LOG_DIR/$service_name.pid"
     
@@ -70,6 +86,26 @@ start_service(){
     return 0
 }
 
+# Inicia las réplicas de un servicio y deja en service_urls sus URLs separadas por comas
+start_replicas(){
+    local service_dir=$1
+    local base_port=$2
+    local replicas=$3
+    local display_name=$4
+    service_urls=""
+    
+    for port in $(replica_ports $base_port $replicas); do
+        # Con una sola réplica se mantienen los nombres de log y PID de siempre
+        local service_name=$service_dir
+        if [ "$replicas" -gt 1 ]; then
+            service_name="${service_dir}_$port"
+        fi
+        start_service "$service_dir" "$service_name" $port "$display_name" || return 1
+        service_urls="${service_urls:+$service_urls,}http://localhost:$port"
+    done
+    return 0
+}
+
 # Edita start_services.sh y cambia la verificación de MySQL por:
 echo "Verificando MySQL..."
 if mysql -u task_admin - -e "SELECT 1" > /dev/null 2>&1; then
@@ -83,17 +119,24 @@ fi
 
 echo "INICIANDO MICROSERVICIOS"
 
-start_service "auth_service" "auth_service" 5001 "Auth Service" || exit 1
-start_service "user_service" "user_service" 5002 "User Service" || exit 1
-start_service "task_service" "task_service" 5003 "Task Service" || exit 1
-start_service "api_gateway" "api_gateway" 4000 "API Gateway" || exit 1
+start_replicas "auth_service" 5001 "$AUTH_REPLICAS" "Auth Service" || exit 1
+export AUTH_SERVICE_URLS="$service_urls"
+start_replicas "user_service" 5002 "$USER_REPLICAS" "User Service" || exit 1
+export USER_SERVICE_URLS="$service_urls"
+start_replicas "task_service" 5003 "$TASK_REPLICAS" "Task Service" || exit 1
+export TASK_SERVICE_URLS="$service_urls"
+if [ "$GATEWAY_RUNTIME" = "async" ]; then
+    start_service "api_gateway" "api_gateway" 4000 "API Gateway (asyncio)" "async_app.py" || exit 1
+else
+    start_service "api_gateway" "api_gateway" 4000 "API Gateway" || exit 1
+fi
 
 echo "TODOS LOS SERVICIOS INICIADOS"
 echo "URLs de los servicios:"
 echo "API Gateway:  http://localhost:4000"
-echo "Auth Service: http://localhost:5001"
-echo "User Service: http://localhost:5002"
-echo "Task Service: http://localhost:5003"
+echo "Auth Service: $AUTH_SERVICE_URLS"
+echo "User Service: $USER_SERVICE_URLS"
+echo "Task Service: $TASK_SERVICE_URLS"
 echo ""
 echo "Endpoints principales:"
 echo "Documentación: http://localhost:4000/"
@@ -6,9 +6,15 @@ LOG_DIR="$(pwd)/logs"
 stop_service() {
     local service_name=$1
     local display_name=$2
-    local pid_file="$LOG_DIR/$service_name.pid"
+    # service.pid para una réplica, service_<puerto>.pid cuando hay varias
+    local pid_files=$(ls "$LOG_DIR/$service_name.pid" "$LOG_DIR/${service_name}"_*.pid 2>/dev/null)
     
-    if [ -f "$pid_file" ]; then 
+    if [ -z "$pid_files" ]; then
+        echo "Error: No se encontró archivo PID para $display_name"
+        return
+    fi
+    
+    for pid_file in $pid_files; do
         local pid=$(cat "$pid_file")
         if ps -p $pid > /dev/null 2>&1; then
             echo "Deteniendo $display_name (PID: $pid)..."
@@ -27,9 +33,7 @@ stop_service() {
             echo "Error: No se encontró proceso activo para $display_name"
             rm "$pid_file"
         fi
-    else
-        echo "Error: No se encontró archivo PID para $display_name"
-    fi
+    done
 }
 
 check_ports() {
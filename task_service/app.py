@@ -1,34 +1,96 @@
 # task_service/app.py
-from flask import Flask, request, jsonify
+import os
+import sys
+# Módulos compartidos entre el gateway y los servicios (common/, en la raíz del proyecto)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import Flask, Response, request, jsonify, g, has_request_context
 import mysql.connector
 from datetime import datetime, timedelta
-from auth import generate_token, token_required, hash_password, check_password
+from auth import generate_token, token_required, hash_password, check_password, perm_versions
+from auth import HasherBusy, hasher, needs_rehash
+from auth import REFRESH_TOKEN_TTL_DAYS, REFRESH_SESSION_MAX_DAYS, new_refresh_token, parse_refresh_token, refresh_token_hash
+from common.compression import Compressor
+from database import pool, add_column, create_index, create_trigger, drop_index
+from permissions import permissions, requires_permission
+import counters
+import deadlines
+from common import metrics
+import tracing
 import jwt
-import os
+import json
+import base64
+import hmac
+import secrets
+import re
 import bcrypt
 from mysql.connector import Error
 
 app = Flask(__name__)
+# Métricas HTTP y ruta GET /metrics
+metrics.install(app)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'clave_super_secreta_123')
+# Clave compartida con el API Gateway para verificar la cabecera X-Identity
+app.config['IDENTITY_SECRET'] = os.getenv('IDENTITY_SECRET', app.config['SECRET_KEY'])
+# Clave del HMAC con el que se guardan los refresh tokens
+app.config['REFRESH_SECRET'] = os.getenv('REFRESH_SECRET', app.config['SECRET_KEY'])
 
-# --- CONFIGURACIÓN DE BASE DE DATOS MYSQL ---
-DB_CONFIG = {
-    'host': 'localhost',
-    'database': 'task_management',
-    'user': 'task_admin',
-    'password': '',
-    'port': 3306,
-    'auth_plugin': 'mysql_native_password'
-}
+# --- TRAZAS DISTRIBUIDAS (X-Request-ID + traceparent, spans en formato Zipkin v2) ---
+# La decisión de muestreo llega del gateway en traceparent; TRACE_SAMPLE_RATE solo aplica
+# a las peticiones que no traen traza
+tracing.install(
+    app, 'task_service',
+    sample_rate=float(os.getenv('TRACE_SAMPLE_RATE', 0.01)),
+    file_path=os.getenv('TRACE_FILE', os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), '..', 'logs', 'traces_task_service.jsonl')),
+    collector_url=os.getenv('TRACE_COLLECTOR_URL', '')
+)
+app.json = tracing.TracedJSONProvider(app)
+
+def _env_bool(name, default):
+    """Leer un booleano desde variables de entorno ('1', 'true', 'yes', 'on')"""
+    return os.getenv(name, str(default)).strip().lower() in ('1', 'true', 'yes', 'on')
+
+# --- COMPRESIÓN DE RESPUESTAS (gzip / brotli según Accept-Encoding) ---
+COMPRESSION_ENABLED = _env_bool('COMPRESSION_ENABLED', True)
+compressor = Compressor(
+    min_size=int(os.getenv('COMPRESSION_MIN_SIZE', 1024)),
+    gzip_level=int(os.getenv('GZIP_LEVEL', 6)),
+    brotli_level=int(os.getenv('BROTLI_LEVEL', 4)),
+    brotli_enabled=_env_bool('BROTLI_ENABLED', True)
+)
 
+# --- CONEXIONES A MYSQL ---
+# Configuración y pool compartidos con database.py (ver DatabaseConfig para las variables DB_POOL_*)
 def get_db_connection():
-    """Obtener conexión a la base de datos MySQL"""
+    """Obtener una conexión del pool; dentro de una petición se reutiliza la misma hasta que termina"""
+    in_request = has_request_context()
+    if in_request and 'db_connection' in g:
+        return g.db_connection
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
+        with tracing.span('db.connect', kind='CLIENT', **{'db.system': 'mysql'}):
+            connection = tracing.trace_connection(pool.acquire(request_scoped=in_request))
     except Error as e:
         print(f"Error conectando a MySQL: {e}")
         return None
+    if in_request:
+        # close() no la devuelve: se devuelve al pool al terminar la petición
+        g.db_connection = connection
+    return connection
+
+# Conciliación periódica de las estadísticas de /info con las tablas reales
+reconciler = counters.Reconciler(get_db_connection)
+# Eventos de deadline alcanzado (ver deadlines.py); los handlers de escritura le avisan tras el commit.
+# El bloqueo que elige la réplica que los emite va en una conexión propia: las del pool se reutilizan
+deadline_scheduler = deadlines.DeadlineScheduler(
+    get_db_connection, connect=lambda: mysql.connector.connect(**pool.config)
+)
+
+@app.teardown_request
+def release_db_connection(exc):
+    """Devolver al pool la conexión de la petición (lo no confirmado se deshace)"""
+    connection = g.pop('db_connection', None)
+    if connection is not None:
+        connection.release()
 
 # --- INICIALIZACIÓN DE BASE DE DATOS ---
 def init_db():
@@ -66,11 +128,19 @@ def init_db():
                 password VARCHAR(255) NOT NULL,
                 email VARCHAR(100) UNIQUE,
                 role_id INT,
+                perm_version INT NOT NULL DEFAULT 0,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (role_id) REFERENCES roles(id)
             )
         """)
         
+        # Versión de permisos: sube al cambiar el rol y deja sin validez los tokens ya emitidos
+        add_column(cursor, 'users', 'perm_version', 'INT NOT NULL DEFAULT 0')
+        create_trigger(cursor, 'trg_users_perm_version', """
+            BEFORE UPDATE ON users FOR EACH ROW
+            SET NEW.perm_version = IF(NEW.role_id <=> OLD.role_id, NEW.perm_version, OLD.perm_version + 1)
+        """)
+        
         # Crear tabla de relación roles-permisos
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS roles_permisos (
@@ -82,6 +152,21 @@ def init_db():
             )
         """)
         
+        # Versión de la matriz de permisos: la suben los triggers y el servicio recarga la matriz al verla cambiar
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS rbac_version (
+                id TINYINT PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("INSERT IGNORE INTO rbac_version (id, version) VALUES (1, 0)")
+        for table, event in (('roles_permisos', 'INSERT'), ('roles_permisos', 'UPDATE'), ('roles_permisos', 'DELETE'),
+                             ('permisos', 'UPDATE'), ('permisos', 'DELETE')):
+            create_trigger(cursor, f'trg_{table}_{event.lower()}_rbac', f"""
+                AFTER {event} ON {table} FOR EACH ROW
+                UPDATE rbac_version SET version = version + 1 WHERE id = 1
+            """)
+        
         # Crear tabla de TASKS
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS tasks (
@@ -95,6 +180,61 @@ def init_db():
                 created_by INT NOT NULL,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                 FOREIGN KEY (created_by) REFERENCES users(id)
+            ) DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+        
+        # Índices de la paginación por cursor: filtros de igualdad y después created_at (InnoDB añade id)
+        create_index(cursor, 'tasks', 'idx_tasks_alive_created', 'is_alive, created_at')
+        create_index(cursor, 'tasks', 'idx_tasks_owner_alive_created', 'created_by, is_alive, created_at')
+        create_index(cursor, 'tasks', 'idx_tasks_alive_status_created', 'is_alive, status, created_at')
+        create_index(cursor, 'tasks', 'idx_tasks_owner_alive_status_created', 'created_by, is_alive, status, created_at')
+        # Tareas vencidas y próximas (/tasks/overdue, /tasks/upcoming) y ventanas del scheduler de deadlines.py
+        create_index(cursor, 'tasks', 'idx_tasks_alive_deadline', 'is_alive, deadline')
+        create_index(cursor, 'tasks', 'idx_tasks_owner_alive_deadline', 'created_by, is_alive, deadline')
+        # Tareas cambiadas en cualquier réplica, que el scheduler de deadlines.py relee periódicamente
+        create_index(cursor, 'tasks', 'idx_tasks_updated', 'updated_at')
+        # Búsqueda de texto (/tasks/search); InnoDB lo mantiene al crear, editar y eliminar tareas
+        create_index(cursor, 'tasks', 'ft_tasks_name_description', 'name, description', 'FULLTEXT')
+        # Índices de una columna que ya cubren los compuestos (o el UNIQUE de users): solo encarecían las escrituras
+        for index in ('idx_tasks_status', 'idx_tasks_created_by', 'idx_tasks_is_alive', 'idx_tasks_deadline'):
+            drop_index(cursor, 'tasks', index)
+        for index in ('idx_users_username', 'idx_users_email'):
+            drop_index(cursor, 'users', index)
+        
+        # Contadores de /info (ver counters.py): varias filas (shard) por contador
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stat_counters (
+                name VARCHAR(100) NOT NULL,
+                shard TINYINT UNSIGNED NOT NULL,
+                value BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (name, shard)
+            )
+        """)
+        
+        # Hasta dónde se han emitido los eventos de deadline (deadlines.py): al arrancar, el scheduler
+        # emite los de las tareas que vencieron desde entonces mientras ninguna réplica los emitía
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS deadline_watermark (
+                id TINYINT PRIMARY KEY,
+                fired_until DATETIME NOT NULL
+            )
+        """)
+        
+        # Refresh tokens: solo el HMAC del secreto; los de una misma sesión comparten family_id
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS refresh_tokens (
+                id BINARY(16) PRIMARY KEY,
+                family_id BINARY(16) NOT NULL,
+                user_id INT NOT NULL,
+                secret_hash BINARY(32) NOT NULL,
+                perm_version INT NOT NULL,
+                expires_at DATETIME NOT NULL,
+                session_expires_at DATETIME NOT NULL,
+                used_at DATETIME NULL,
+                revoked BOOLEAN NOT NULL DEFAULT FALSE,
+                INDEX idx_refresh_tokens_family (family_id),
+                INDEX idx_refresh_tokens_user_expires (user_id, session_expires_at),
+                FOREIGN KEY (user_id) REFERENCES users(id)
             )
         """)
         
@@ -114,6 +254,18 @@ def init_db():
             ('read_all_tasks'), ('manage_tasks')
         """)
         
+        # Permisos de cada rol, solo la primera vez: después se gestionan en roles_permisos.
+        # Mismo comportamiento que cuando se comprobaba role_id == 1: solo admin ve y gestiona
+        # las tareas de todos; manager, como user, solo las suyas
+        cursor.execute("""
+            INSERT INTO roles_permisos (role_id, permiso_id)
+            SELECT r.id, p.id FROM roles r CROSS JOIN permisos p
+            WHERE (r.nombre = 'admin'
+                   OR (r.nombre IN ('user', 'manager')
+                       AND p.nombre IN ('read_user', 'create_task', 'read_task', 'update_task', 'delete_task')))
+              AND NOT EXISTS (SELECT 1 FROM roles_permisos)
+        """)
+        
         admin_password = hash_password('admin123')
         cursor.execute("""
             INSERT IGNORE INTO users (username, password, email, role_id) 
@@ -152,6 +304,91 @@ def get_user_by_username(username):
         cursor.close()
         connection.close()
 
+def get_perm_version(user_id):
+    """Versión de permisos actual del usuario, o None si ya no existe (la usa token_required)"""
+    connection = get_db_connection()
+    if not connection:
+        raise Error(msg="Sin conexión a la base de datos")
+    
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SELECT perm_version FROM users WHERE id = %s', (user_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    finally:
+        cursor.close()
+        connection.close()
+
+# Los tokens llevan la versión de permisos; la actual se consulta como mucho cada PERM_VERSION_TTL segundos
+perm_versions.loader = get_perm_version
+perm_versions.ttl = float(os.getenv('PERM_VERSION_TTL', 30))
+
+def get_rbac_version():
+    """Versión actual de la matriz de permisos (la comprueba permissions cada RBAC_POLL_INTERVAL)"""
+    connection = get_db_connection()
+    if not connection:
+        raise Error(msg="Sin conexión a la base de datos")
+    
+    cursor = connection.cursor()
+    try:
+        cursor.execute('SELECT version FROM rbac_version WHERE id = 1')
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    finally:
+        cursor.close()
+        connection.close()
+
+def load_permission_matrix():
+    """(versión, {permiso: id}, [(role_id, permiso_id), ...]) para PermissionMatrix.reload"""
+    connection = get_db_connection()
+    if not connection:
+        raise Error(msg="Sin conexión a la base de datos")
+    
+    cursor = connection.cursor()
+    try:
+        # La versión se lee antes que la matriz: si cambia entre medias, la versión guardada
+        # queda atrás y el siguiente poll vuelve a cargar
+        cursor.execute('SELECT version FROM rbac_version WHERE id = 1')
+        row = cursor.fetchone()
+        cursor.execute('SELECT id, nombre FROM permisos')
+        permission_ids = {name: permission_id for permission_id, name in cursor.fetchall()}
+        cursor.execute('SELECT role_id, permiso_id FROM roles_permisos')
+        grants = cursor.fetchall()
+        return (row[0] if row else 0), permission_ids, grants
+    finally:
+        cursor.close()
+        connection.close()
+
+# La matriz rol -> permisos se carga al arrancar y se recarga cuando cambia rbac_version
+permissions.loader = load_permission_matrix
+permissions.version_loader = get_rbac_version
+
+def hasher_busy():
+    """Respuesta cuando el pool de bcrypt está saturado: el cliente puede reintentar enseguida"""
+    return jsonify({"error": "Servicio ocupado, inténtelo de nuevo en unos segundos"}), 503, {'Retry-After': '1'}
+
+def rehash_password(user_id, old_hash, password):
+    """Guardar la contraseña con el coste BCRYPT_ROUNDS actual (tras un login correcto)"""
+    try:
+        new_hash = hash_password(password)
+    except HasherBusy:
+        # Se volverá a intentar en el siguiente login
+        return
+    
+    connection = get_db_connection()
+    if not connection:
+        return
+    
+    cursor = connection.cursor()
+    try:
+        # Solo si la contraseña no ha cambiado mientras tanto
+        cursor.execute('UPDATE users SET password = %s WHERE id = %s AND password = %s', (new_hash, user_id, old_hash))
+        connection.commit()
+    except Error as e:
+        print(f"Error actualizando el hash de la contraseña: {e}")
+    finally:
+        cursor.close()
+        connection.close()
 
 @app.route('/login', methods=['POST'])
 def login():
@@ -161,10 +398,34 @@ def login():
     
     user = get_user_by_username(data.get('username'))
     
-    if user and check_password(user['password'], data.get('password')):
-        token = generate_token(user['username'])
-        return jsonify({
+    try:
+        valid = user is not None and check_password(user['password'], data.get('password'))
+    except HasherBusy:
+        return hasher_busy()
+    
+    if valid:
+        connection = get_db_connection()
+        if not connection:
+            return jsonify({"error": "Error de conexión a la base de datos"}), 500
+        
+        cursor = connection.cursor()
+        try:
+            # Las sesiones caducadas del usuario ya no sirven ni para detectar reutilización
+            cursor.execute('DELETE FROM refresh_tokens WHERE user_id = %s AND session_expires_at < %s',
+                           (user['id'], datetime.now()))
+            refresh_token = issue_refresh_token(cursor, user['id'], user['perm_version'])
+            connection.commit()
+        except Error as e:
+            connection.rollback()
+            return jsonify({"error": f"Error iniciando sesión: {str(e)}"}), 500
+        finally:
+            cursor.close()
+            connection.close()
+        
+        token = generate_token(user['username'], user['id'], user['role_id'], user['perm_version'])
+        response = jsonify({
             "token": token, 
+            "refresh_token": refresh_token,
             "message": "Login exitoso",
             "user": {
                 "id": user['id'],
@@ -172,8 +433,120 @@ def login():
                 "role_id": user['role_id']
             }
         })
+        if needs_rehash(user['password']):
+            # Se rehace después de enviar la respuesta: el login no espera por el nuevo hash
+            response.call_on_close(lambda: rehash_password(user['id'], user['password'], data['password']))
+        return response
     return jsonify({"error": "Credenciales inválidas"}), 401
 
+# --- REFRESH TOKENS (renovar el token sin repetir el login ni bcrypt) ---
+def issue_refresh_token(cursor, user_id, perm_version, family_id=None, session_expires_at=None):
+    """
+    Guardar un refresh token nuevo y devolverlo. Sin family_id empieza una sesión (login);
+    con family_id es la rotación de un token de esa sesión, que no pasa de session_expires_at.
+    """
+    now = datetime.now()
+    if family_id is None:
+        family_id = secrets.token_bytes(16)
+        session_expires_at = now + timedelta(days=REFRESH_SESSION_MAX_DAYS)
+    token_id, secret_hash, token = new_refresh_token()
+    cursor.execute("""
+        INSERT INTO refresh_tokens (id, family_id, user_id, secret_hash, perm_version, expires_at, session_expires_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, (token_id, family_id, user_id, secret_hash, perm_version,
+          min(now + timedelta(days=REFRESH_TOKEN_TTL_DAYS), session_expires_at), session_expires_at))
+    return token
+
+def find_refresh_token(cursor, token, lock=False):
+    """Fila del refresh token del cliente si existe y su secreto es correcto, o None"""
+    parsed = parse_refresh_token(token)
+    if parsed is None:
+        return None
+    token_id, secret = parsed
+    cursor.execute(f"""
+        SELECT r.id, r.family_id, r.user_id, r.secret_hash, r.perm_version, r.expires_at,
+               r.session_expires_at, r.used_at, r.revoked,
+               u.username, u.role_id, u.perm_version as current_perm_version
+        FROM refresh_tokens r
+        JOIN users u ON r.user_id = u.id
+        WHERE r.id = %s {'FOR UPDATE' if lock else ''}
+    """, (token_id,))
+    row = cursor.fetchone()
+    if row is None or not hmac.compare_digest(bytes(row['secret_hash']), refresh_token_hash(secret)):
+        return None
+    return row
+
+@app.route('/refresh', methods=['POST'])
+def refresh():
+    """Token nuevo a cambio del refresh token, que se rota: una lectura por clave primaria y un HMAC"""
+    data = request.get_json(silent=True) or {}
+    if not data.get('refresh_token'):
+        return jsonify({"error": "refresh_token requerido"}), 400
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({"error": "Error de conexión a la base de datos"}), 500
+    
+    cursor = connection.cursor(dictionary=True)
+    try:
+        row = find_refresh_token(cursor, data['refresh_token'], lock=True)
+        if row is None:
+            return jsonify({"error": "Refresh token inválido"}), 401
+        if row['revoked']:
+            return jsonify({"error": "Sesión cerrada. Por favor, inicie sesión nuevamente"}), 401
+        if row['used_at'] is not None:
+            # Un token ya rotado se vuelve a usar: alguien más lo tiene, se cierra toda la sesión
+            cursor.execute('UPDATE refresh_tokens SET revoked = TRUE WHERE family_id = %s', (row['family_id'],))
+            connection.commit()
+            return jsonify({"error": "Refresh token reutilizado. La sesión se ha cerrado por seguridad"}), 401
+        # Subir perm_version (cambio de rol o revocación) también invalida los refresh tokens
+        if row['expires_at'] <= datetime.now() or row['current_perm_version'] > row['perm_version']:
+            return jsonify({"error": "Sesión expirada. Por favor, inicie sesión nuevamente"}), 401
+        
+        cursor.execute('UPDATE refresh_tokens SET used_at = %s WHERE id = %s', (datetime.now(), row['id']))
+        refresh_token = issue_refresh_token(cursor, row['user_id'], row['current_perm_version'],
+                                            row['family_id'], row['session_expires_at'])
+        connection.commit()
+        
+        token = generate_token(row['username'], row['user_id'], row['role_id'], row['current_perm_version'])
+        return jsonify({
+            "token": token,
+            "refresh_token": refresh_token,
+            "message": "Token renovado"
+        })
+    except Error as e:
+        connection.rollback()
+        return jsonify({"error": f"Error renovando el token: {str(e)}"}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+@app.route('/logout', methods=['POST'])
+def logout():
+    """Cerrar la sesión: revoca el refresh token y los demás de su sesión (el token actual caduca solo)"""
+    data = request.get_json(silent=True) or {}
+    if not data.get('refresh_token'):
+        return jsonify({"error": "refresh_token requerido"}), 400
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({"error": "Error de conexión a la base de datos"}), 500
+    
+    cursor = connection.cursor(dictionary=True)
+    try:
+        row = find_refresh_token(cursor, data['refresh_token'])
+        if row is None:
+            return jsonify({"error": "Refresh token inválido"}), 401
+        cursor.execute('UPDATE refresh_tokens SET revoked = TRUE WHERE family_id = %s', (row['family_id'],))
+        connection.commit()
+        return jsonify({"message": "Sesión cerrada"})
+    except Error as e:
+        connection.rollback()
+        return jsonify({"error": f"Error cerrando la sesión: {str(e)}"}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
 @app.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -183,7 +556,10 @@ def register():
     if len(data['password']) < 6:
         return jsonify({"error": "La contraseña debe tener al menos 6 caracteres"}), 400
     
-    hashed_pw = hash_password(data['password'])
+    try:
+        hashed_pw = hash_password(data['password'])
+    except HasherBusy:
+        return hasher_busy()
     
     connection = get_db_connection()
     if not connection:
@@ -195,6 +571,7 @@ def register():
             'INSERT INTO users (username, password, email, role_id) VALUES (%s, %s, %s, %s)',
             (data['username'], hashed_pw, data.get('email'), 2)  # 2 = role 'user' por defecto
         )
+        counters.add(cursor, {'users': 1})
         connection.commit()
         return jsonify({"message": "Usuario creado exitosamente"}), 201
     except mysql.connector.IntegrityError:
@@ -206,63 +583,233 @@ def register():
         connection.close()
 
 
-@app.route('/tasks', methods=['GET'])
-@token_required
-def listar_tasks(current_user):
-    """Obtener todas las tareas"""
+# --- PAGINACIÓN DE LISTADOS (por cursor sobre created_at, id) ---
+# Tareas por página si el cliente envía 'cursor' sin 'limit', y máximo permitido
+TASKS_PAGE_SIZE = int(os.getenv('TASKS_PAGE_SIZE', 50))
+TASKS_MAX_PAGE_SIZE = int(os.getenv('TASKS_MAX_PAGE_SIZE', 200))
+# Filas que se leen de MySQL en cada bloque con ?stream=true
+TASKS_STREAM_FETCH_SIZE = int(os.getenv('TASKS_STREAM_FETCH_SIZE', 500))
+
+VALID_STATUSES = ['In Progress', 'Revision', 'Completed', 'Paused']
+# Status en formato de URL -> formato de DB
+STATUS_MAP = {
+    'in_progress': 'In Progress',
+    'revision': 'Revision', 
+    'completed': 'Completed',
+    'paused': 'Paused'
+}
+
+def encode_cursor(task):
+    """Cursor opaco que apunta justo después de la tarea"""
+    raw = json.dumps([task['created_at'].strftime('%Y-%m-%d %H:%M:%S'), task['id']])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(value):
+    """(created_at, id) del cursor; ValueError si no es válido"""
+    try:
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(value + '=' * (-len(value) % 4)))
+        return datetime.strptime(created_at, '%Y-%m-%d %H:%M:%S'), int(task_id)
+    except (TypeError, ValueError):
+        raise ValueError("Cursor inválido")
+
+def _parse_deadline(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        raise ValueError(f"Formato de {name} inválido. Use: YYYY-MM-DD HH:MM:SS")
+
+def _page_limit():
+    """limit de la query, como máximo TASKS_MAX_PAGE_SIZE; ValueError si no es válido"""
+    try:
+        limit = int(request.args.get('limit', TASKS_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit debe ser un número entero")
+    if limit < 1:
+        raise ValueError("limit debe ser mayor que 0")
+    return min(limit, TASKS_MAX_PAGE_SIZE)
+
+def _page_params():
+    """limit, posición del cursor y filtros de deadline de la query; ValueError si no son válidos"""
+    limit = _page_limit()
+    cursor = request.args.get('cursor')
+    after = decode_cursor(cursor) if cursor else None
+    return limit, after, _parse_deadline('deadline_from'), _parse_deadline('deadline_to')
+
+def _visible_tasks(user):
+    """Condiciones y parámetros de las tareas vivas que el usuario puede ver"""
+    conditions = ['t.is_alive = TRUE']
+    params = []
+    # Con read_all_tasks (admin, manager) se ven todas las tareas; si no, solo las propias
+    if not permissions.allowed(user.role_id, 'read_all_tasks'):
+        conditions.append('t.created_by = %s')
+        params.append(user.id)
+    return conditions, params
+
+def tasks_query(user, status=None, deadline_from=None, deadline_to=None, after=None):
+    """
+    SQL (sin LIMIT) y parámetros del listado de tareas vivas visibles para el usuario.
+    
+    Cada combinación de filtros tiene su índice idx_tasks_*_created: igualdades primero y
+    después created_at, así que el ORDER BY se resuelve recorriendo el índice, sin filesort
+    (lo comprueba benchmark.py).
+    """
+    conditions, params = _visible_tasks(user)
+    if status:
+        conditions.append('t.status = %s')
+        params.append(status)
+    if deadline_from:
+        conditions.append('t.deadline >= %s')
+        params.append(deadline_from)
+    if deadline_to:
+        conditions.append('t.deadline <= %s')
+        params.append(deadline_to)
+    if after:
+        conditions.append('(t.created_at < %s OR (t.created_at = %s AND t.id < %s))')
+        params.extend([after[0], after[0], after[1]])
+    query = f"""
+            SELECT t.*, u.username as created_by_username 
+            FROM tasks t 
+            JOIN users u ON t.created_by = u.id 
+            WHERE {' AND '.join(conditions)} 
+            ORDER BY t.created_at DESC, t.id DESC 
+    """
+    return query, params
+
+def tasks_page(user, status=None):
+    """
+    Página de tareas vivas visibles para el usuario, de la más reciente a la más antigua.
+
+    Se pagina por cursor: cada página continúa desde el (created_at, id) de la última tarea
+    de la anterior, así que con los índices idx_tasks_*_created cada página es un recorrido
+    de rango del índice, sin importar lo profunda que sea. Sin 'limit' ni 'cursor' se mantiene
+    el contrato original del endpoint: todas las tareas en una sola respuesta.
+    """
+    try:
+        limit, after, deadline_from, deadline_to = _page_params()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    query, params = tasks_query(user, status, deadline_from, deadline_to, after)
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return stream_tasks(query, params, status)
+    paginated = 'limit' in request.args or 'cursor' in request.args
+    
     connection = get_db_connection()
     if not connection:
         return jsonify({"error": "Error de conexión a la base de datos"}), 500
     
     cursor = connection.cursor(dictionary=True)
     try:
-        # Obtener usuario actual para verificar permisos
-        user = get_user_by_username(current_user)
-        if not user:
-            return jsonify({"error": "Usuario no encontrado"}), 404
-        
-        # Si es admin o manager, puede ver todas las tareas
-        # Si es user normal, solo ve sus propias tareas
-        if user['role_id'] == 1:  # admin
-            cursor.execute("""
-                SELECT t.*, u.username as created_by_username 
-                FROM tasks t 
-                JOIN users u ON t.created_by = u.id 
-                WHERE t.is_alive = TRUE 
-                ORDER BY t.created_at DESC
-            """)
-        else:
-            cursor.execute("""
-                SELECT t.*, u.username as created_by_username 
-                FROM tasks t 
-                JOIN users u ON t.created_by = u.id 
-                WHERE t.created_by = %s AND t.is_alive = TRUE 
-                ORDER BY t.created_at DESC
-            """, (user['id'],))
+        if not paginated:
+            cursor.execute(query, params)
+            tasks = cursor.fetchall()
+            response = {"tasks": tasks, "count": len(tasks)}
+            if status:
+                response["status"] = status
+            return jsonify(response)
+        
+        # Una fila de más para saber si hay página siguiente
+        cursor.execute(query + "LIMIT %s", params + [limit + 1])
         
         tasks = cursor.fetchall()
-        return jsonify({
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = encode_cursor(tasks[-1])
+        response = {
             "tasks": tasks,
-            "count": len(tasks)
-        })
+            "count": len(tasks),
+            "limit": limit,
+            "next": next_cursor
+        }
+        if status:
+            response["status"] = status
+        return jsonify(response)
     except Error as e:
         return jsonify({"error": f"Error obteniendo tareas: {str(e)}"}), 500
     finally:
         cursor.close()
         connection.close()
 
+def stream_tasks(query, params, status=None):
+    """
+    Todas las tareas de la consulta (sin límite de página) en una respuesta por bloques:
+    las filas se leen de un cursor sin buffer de TASKS_STREAM_FETCH_SIZE en
+    TASKS_STREAM_FETCH_SIZE y se serializan según llegan, así que ni la memoria ni el
+    tiempo hasta el primer byte crecen con el número de tareas.
+    """
+    # Conexión propia, no la de la petición: el cuerpo se envía después de que la petición termine
+    try:
+        connection = tracing.trace_connection(pool.acquire())
+    except Error as e:
+        print(f"Error conectando a MySQL: {e}")
+        return jsonify({"error": "Error de conexión a la base de datos"}), 500
+    
+    cursor = connection.cursor(dictionary=True, buffered=False)
+    try:
+        cursor.execute(query, params)
+    except Error as e:
+        cursor.close()
+        connection.close()
+        return jsonify({"error": f"Error obteniendo tareas: {str(e)}"}), 500
+    
+    dumps = app.json.dumps
+    
+    def generate():
+        count = 0
+        try:
+            yield '{"tasks":['
+            while True:
+                rows = cursor.fetchmany(TASKS_STREAM_FETCH_SIZE)
+                if not rows:
+                    break
+                chunk = ','.join(dumps(row) for row in rows)
+                yield chunk if count == 0 else ',' + chunk
+                count += len(rows)
+            tail = f'],"count":{count}'
+            if status:
+                tail += f',"status":{dumps(status)}'
+            yield tail + '}'
+        except Error as e:
+            # Las cabeceras ya se enviaron: el cuerpo queda incompleto (JSON inválido)
+            print(f"Error enviando tareas: {e}")
+        finally:
+            # Si el cliente corta la descarga quedan filas sin leer y el cursor sin buffer no se
+            # deja cerrar ("Unread result found"); la conexión se devuelve igualmente y el pool
+            # lee y descarta esas filas antes de reutilizarla
+            try:
+                cursor.close()
+            except Error:
+                pass
+            finally:
+                connection.close()
+    
+    return Response(generate(), mimetype='application/json')
+
+@app.route('/tasks', methods=['GET'])
+@token_required
+@requires_permission('read_task')
+def listar_tasks(user):
+    """Obtener todas las tareas, por páginas (?limit, ?cursor) o por bloques (?stream=true); filtros ?status, ?deadline_from, ?deadline_to"""
+    status = request.args.get('status')
+    if status:
+        if status.lower() not in STATUS_MAP and status not in VALID_STATUSES:
+            return jsonify({"error": f"Status inválido. Debe ser uno de: {VALID_STATUSES}"}), 400
+        status = STATUS_MAP.get(status.lower(), status)
+    return tasks_page(user, status)
+
 @app.route('/task', methods=['POST'])
 @token_required
-def crear_task(current_user):
+@requires_permission('create_task')
+def crear_task(user):
     """Crear una nueva tarea"""
     data = request.get_json()
     if not data or not data.get('name'):
         return jsonify({"error": "Nombre de la tarea requerido"}), 400
     
-    user = get_user_by_username(current_user)
-    if not user:
-        return jsonify({"error": "Usuario no encontrado"}), 404
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({"error": "Error de conexión a la base de datos"}), 500
@@ -285,11 +832,13 @@ def crear_task(current_user):
             data.get('description', ''),
             deadline,
             data.get('status', 'In Progress'),
-            user['id']
+            user.id
         ))
+        task_id = cursor.lastrowid
+        counters.add(cursor, counters.task_deltas([(user.id, data.get('status', 'In Progress'), 1)]))
         
         connection.commit()
-        task_id = cursor.lastrowid
+        deadline_scheduler.update(task_id, deadline, data.get('status', 'In Progress'))
         return jsonify({
             "message": "Tarea creada exitosamente",
             "task": {
@@ -298,7 +847,7 @@ def crear_task(current_user):
                 "description": data.get('description', ''),
                 "deadline": deadline.isoformat() if deadline else None,
                 "status": data.get('status', 'In Progress'),
-                "created_by": user['id']
+                "created_by": user.id
             }
         }), 201
     except Error as e:
@@ -309,11 +858,9 @@ def crear_task(current_user):
 
 @app.route('/task/<int:task_id>', methods=['GET'])
 @token_required
-def obtener_task(current_user, task_id):
+@requires_permission('read_task')
+def obtener_task(user, task_id):
     """Obtener una tarea específica"""
-    user = get_user_by_username(current_user)
-    if not user:
-        return jsonify({"error": "Usuario no encontrado"}), 404
     
     connection = get_db_connection()
     if not connection:
@@ -332,8 +879,8 @@ def obtener_task(current_user, task_id):
         if not task:
             return jsonify({"error": "Tarea no encontrada"}), 404
         
-        # Verificar permisos: admin puede ver todo, users solo sus tareas
-        if user['role_id'] != 1 and task['created_by'] != user['id']:
+        # Verificar permisos: con read_all_tasks se ve todo, sin él solo las tareas propias
+        if task['created_by'] != user.id and not permissions.allowed(user.role_id, 'read_all_tasks'):
             return jsonify({"error": "No tienes permisos para ver esta tarea"}), 403
         
         return jsonify({"task": task})
@@ -345,16 +892,13 @@ def obtener_task(current_user, task_id):
 
 @app.route('/task/<int:task_id>', methods=['PUT'])
 @token_required
-def actualizar_task(current_user, task_id):
+@requires_permission('update_task')
+def actualizar_task(user, task_id):
     """Actualizar una tarea existente"""
     data = request.get_json()
     if not data:
         return jsonify({"error": "Datos requeridos"}), 400
     
-    user = get_user_by_username(current_user)
-    if not user:
-        return jsonify({"error": "Usuario no encontrado"}), 404
-    
     connection = get_db_connection()
     if not connection:
         return jsonify({"error": "Error de conexión a la base de datos"}), 500
@@ -362,14 +906,14 @@ def actualizar_task(current_user, task_id):
     cursor = connection.cursor(dictionary=True)
     try:
         # Verificar que la tarea existe y permisos
-        cursor.execute('SELECT * FROM tasks WHERE id = %s AND is_alive = TRUE', (task_id,))
+        cursor.execute('SELECT * FROM tasks WHERE id = %s AND is_alive = TRUE FOR UPDATE', (task_id,))
         task = cursor.fetchone()
         
         if not task:
             return jsonify({"error": "Tarea no encontrada"}), 404
         
-        # Verificar permisos: admin puede editar todo, users solo sus tareas
-        if user['role_id'] != 1 and task['created_by'] != user['id']:
+        # Verificar permisos: con manage_tasks se edita todo, sin él solo las tareas propias
+        if task['created_by'] != user.id and not permissions.allowed(user.role_id, 'manage_tasks'):
             return jsonify({"error": "No tienes permisos para editar esta tarea"}), 403
         
         # Preparar campos para actualizar
@@ -384,6 +928,7 @@ def actualizar_task(current_user, task_id):
             update_fields.append('description = %s')
             values.append(data['description'])
         
+        deadline = task['deadline']
         if 'deadline' in data:
             if data['deadline']:
                 try:
@@ -393,6 +938,7 @@ def actualizar_task(current_user, task_id):
                 except ValueError:
                     return jsonify({"error": "Formato de deadline inválido. Use: YYYY-MM-DD HH:MM:SS"}), 400
             else:
+                deadline = None
                 update_fields.append('deadline = NULL')
         
         if 'status' in data:
@@ -409,11 +955,19 @@ def actualizar_task(current_user, task_id):
         query = f"UPDATE tasks SET {', '.join(update_fields)} WHERE id = %s"
         
         cursor.execute(query, values)
+        updated = cursor.rowcount
+        if data.get('status', task['status']) != task['status']:
+            counters.add(cursor, counters.task_deltas([
+                (task['created_by'], task['status'], -1), (task['created_by'], data['status'], 1)
+            ]))
         connection.commit()
         
-        if cursor.rowcount == 0:
+        if updated == 0:
             return jsonify({"error": "No se pudo actualizar la tarea"}), 400
         
+        if 'deadline' in data or 'status' in data:
+            deadline_scheduler.update(task_id, deadline, data.get('status', task['status']))
+        
         return jsonify({"message": "Tarea actualizada exitosamente"})
     except Error as e:
         return jsonify({"error": f"Error actualizando tarea: {str(e)}"}), 500
@@ -423,11 +977,9 @@ def actualizar_task(current_user, task_id):
 
 @app.route('/task/<int:task_id>', methods=['DELETE'])
 @token_required
-def eliminar_task(current_user, task_id):
+@requires_permission('delete_task')
+def eliminar_task(user, task_id):
     """Eliminar una tarea (soft delete)"""
-    user = get_user_by_username(current_user)
-    if not user:
-        return jsonify({"error": "Usuario no encontrado"}), 404
     
     connection = get_db_connection()
     if not connection:
@@ -436,19 +988,21 @@ def eliminar_task(current_user, task_id):
     cursor = connection.cursor(dictionary=True)
     try:
         # Verificar que la tarea existe y permisos
-        cursor.execute('SELECT * FROM tasks WHERE id = %s AND is_alive = TRUE', (task_id,))
+        cursor.execute('SELECT * FROM tasks WHERE id = %s AND is_alive = TRUE FOR UPDATE', (task_id,))
         task = cursor.fetchone()
         
         if not task:
             return jsonify({"error": "Tarea no encontrada"}), 404
         
-        # Verificar permisos: admin puede eliminar todo, users solo sus tareas
-        if user['role_id'] != 1 and task['created_by'] != user['id']:
+        # Verificar permisos: con manage_tasks se elimina todo, sin él solo las tareas propias
+        if task['created_by'] != user.id and not permissions.allowed(user.role_id, 'manage_tasks'):
             return jsonify({"error": "No tienes permisos para eliminar esta tarea"}), 403
         
         # Soft delete
         cursor.execute('UPDATE tasks SET is_alive = FALSE WHERE id = %s', (task_id,))
+        counters.add(cursor, counters.task_deltas([(task['created_by'], task['status'], -1)]))
         connection.commit()
+        deadline_scheduler.cancel(task_id)
         
         return jsonify({"message": "Tarea eliminada exitosamente"})
     except Error as e:
@@ -458,26 +1012,355 @@ def eliminar_task(current_user, task_id):
         connection.close()
 
 
+# --- OPERACIONES EN LOTE ---
+# Tareas máximas por petición y filas por sentencia SQL
+TASKS_BULK_MAX_ITEMS = int(os.getenv('TASKS_BULK_MAX_ITEMS', 5000))
+TASKS_BULK_CHUNK = 500
+
+# Campos que se pueden asignar en un lote, en el orden del INSERT
+BULK_FIELDS = ('name', 'description', 'deadline', 'status')
+
+def _chunks(items, size=TASKS_BULK_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _bulk_items(key):
+    """Lista del cuerpo JSON; ValueError si falta, está vacía o es demasiado larga"""
+    data = request.get_json(silent=True)
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValueError(f"Se requiere una lista '{key}' con al menos un elemento")
+    if len(items) > TASKS_BULK_MAX_ITEMS:
+        raise ValueError(f"Máximo {TASKS_BULK_MAX_ITEMS} elementos por petición")
+    return items
+
+def _task_fields(item, partial):
+    """Campos validados de una tarea del lote (dict) o el mensaje de error (str)"""
+    if not isinstance(item, dict):
+        return "Cada tarea debe ser un objeto JSON"
+    fields = {}
+    if 'name' in item or not partial:
+        if not isinstance(item.get('name'), str) or not item['name']:
+            return "Nombre de la tarea requerido"
+        fields['name'] = item['name']
+    if 'description' in item:
+        if not isinstance(item['description'], str):
+            return "La descripción debe ser un texto"
+        fields['description'] = item['description']
+    elif not partial:
+        fields['description'] = ''
+    if 'deadline' in item:
+        fields['deadline'] = None
+        if item['deadline']:
+            try:
+                fields['deadline'] = datetime.strptime(item['deadline'], '%Y-%m-%d %H:%M:%S')
+            except (TypeError, ValueError):
+                return "Formato de deadline inválido. Use: YYYY-MM-DD HH:MM:SS"
+    elif not partial:
+        fields['deadline'] = None
+    if 'status' in item:
+        if item['status'] not in VALID_STATUSES:
+            return f"Status inválido. Debe ser uno de: {VALID_STATUSES}"
+        fields['status'] = item['status']
+    elif not partial:
+        fields['status'] = 'In Progress'
+    if partial and not fields:
+        return "No hay campos para actualizar"
+    return fields
+
+def _task_ids(task_ids):
+    """Errores (índice, mensaje) de los ids que no son enteros o están repetidos"""
+    errors = []
+    seen = set()
+    for index, task_id in enumerate(task_ids):
+        if not isinstance(task_id, int) or isinstance(task_id, bool):
+            errors.append((index, "El id de la tarea debe ser un número entero"))
+        elif task_id in seen:
+            errors.append((index, "Tarea repetida en el lote"))
+        seen.add(task_id)
+    return errors
+
+def _invalid_items(errors):
+    """400 con el error de cada elemento inválido: no se aplica ninguno"""
+    return jsonify({
+        "error": "Hay elementos inválidos; no se aplicó ningún cambio",
+        "results": [{"index": index, "status": 400, "error": error} for index, error in sorted(errors)]
+    }), 400
+
+def _lock_tasks(cursor, user, task_ids, action):
+    """
+    Bloquear (FOR UPDATE) las tareas vivas del lote y comprobar los permisos de cada una
+    como en actualizar_task/eliminar_task.
+    
+    Devuelve ({id: None si se puede, o (código, error)}, {id: (created_by, status, deadline)}).
+    """
+    tasks = {}
+    for chunk in _chunks(task_ids):
+        placeholders = ', '.join(['%s'] * len(chunk))
+        cursor.execute(
+            f'SELECT id, created_by, status, deadline FROM tasks WHERE id IN ({placeholders}) AND is_alive = TRUE FOR UPDATE',
+            chunk
+        )
+        tasks.update((row[0], row[1:]) for row in cursor.fetchall())
+    
+    manage_all = permissions.allowed(user.role_id, 'manage_tasks')
+    checks = {}
+    for task_id in task_ids:
+        if task_id not in tasks:
+            checks[task_id] = (404, "Tarea no encontrada")
+        elif not manage_all and tasks[task_id][0] != user.id:
+            checks[task_id] = (403, f"No tienes permisos para {action} esta tarea")
+        else:
+            checks[task_id] = None
+    return checks, tasks
+
+def _item_results(items, checks):
+    """Resultado de cada (índice, id) del lote según la comprobación de permisos"""
+    results = []
+    for index, task_id in items:
+        check = checks[task_id]
+        if check is None:
+            results.append({"index": index, "id": task_id, "status": 200})
+        else:
+            results.append({"index": index, "id": task_id, "status": check[0], "error": check[1]})
+    return results
+
+@app.route('/tasks/bulk', methods=['POST'])
+@token_required
+@requires_permission('create_task')
+def crear_tasks_bulk(user):
+    """Crear varias tareas en una transacción: {"tasks": [{name, description, deadline, status}, ...]}"""
+    try:
+        items = _bulk_items('tasks')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # Validar todo antes de tocar la base de datos
+    rows = []
+    errors = []
+    for index, item in enumerate(items):
+        fields = _task_fields(item, partial=False)
+        if isinstance(fields, str):
+            errors.append((index, fields))
+        else:
+            rows.append(tuple(fields[name] for name in BULK_FIELDS) + (user.id,))
+    if errors:
+        return _invalid_items(errors)
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({"error": "Error de conexión a la base de datos"}), 500
+    
+    cursor = connection.cursor()
+    try:
+        ids = []
+        for chunk in _chunks(rows):
+            # executemany envía el INSERT como una sola sentencia de varias filas;
+            # los ids de una misma sentencia son consecutivos a partir de lastrowid
+            cursor.executemany("""
+                INSERT INTO tasks (name, description, deadline, status, created_by)
+                VALUES (%s, %s, %s, %s, %s)
+            """, chunk)
+            ids.extend(range(cursor.lastrowid, cursor.lastrowid + len(chunk)))
+        counters.add(cursor, counters.task_deltas((user.id, row[3], 1) for row in rows))
+        connection.commit()
+        for task_id, row in zip(ids, rows):
+            deadline_scheduler.update(task_id, row[2], row[3])
+    
+        return jsonify({
+            "message": "Tareas creadas exitosamente",
+            "results": [{"index": index, "id": task_id, "status": 201} for index, task_id in enumerate(ids)],
+            "count": len(ids)
+        }), 201
+    except Error as e:
+        connection.rollback()
+        return jsonify({"error": f"Error creando tareas: {str(e)}"}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+@app.route('/tasks/bulk', methods=['PATCH'])
+@token_required
+@requires_permission('update_task')
+def actualizar_tasks_bulk(user):
+    """Actualizar varias tareas en una transacción: {"tasks": [{id, name, description, deadline, status}, ...]}"""
+    try:
+        items = _bulk_items('tasks')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # Validar todo antes de tocar la base de datos
+    errors = _task_ids([item.get('id') if isinstance(item, dict) else None for item in items])
+    invalid = {index for index, _ in errors}
+    updates = []
+    for index, item in enumerate(items):
+        if index in invalid:
+            continue
+        fields = _task_fields({key: value for key, value in item.items() if key != 'id'}, partial=True)
+        if isinstance(fields, str):
+            errors.append((index, fields))
+        else:
+            updates.append((index, item['id'], fields))
+    if errors:
+        return _invalid_items(errors)
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({"error": "Error de conexión a la base de datos"}), 500
+    
+    cursor = connection.cursor()
+    try:
+        checks, tasks = _lock_tasks(cursor, user, [task_id for _, task_id, _ in updates], 'editar')
+        allowed = [(task_id, fields) for _, task_id, fields in updates if checks[task_id] is None]
+    
+        for chunk in _chunks(allowed):
+            # Una sentencia por bloque: cada campo toma el valor de su tarea con CASE
+            assignments = []
+            values = []
+            for name in BULK_FIELDS:
+                cases = [(task_id, fields[name]) for task_id, fields in chunk if name in fields]
+                if cases:
+                    assignments.append(f"{name} = CASE id {' '.join(['WHEN %s THEN %s'] * len(cases))} ELSE {name} END")
+                    for case in cases:
+                        values.extend(case)
+            values.extend(task_id for task_id, _ in chunk)
+            cursor.execute(
+                f"UPDATE tasks SET {', '.join(assignments)} WHERE id IN ({', '.join(['%s'] * len(chunk))})",
+                values
+            )
+        changes = []
+        for task_id, fields in allowed:
+            created_by, status, _ = tasks[task_id]
+            if fields.get('status', status) != status:
+                changes += [(created_by, status, -1), (created_by, fields['status'], 1)]
+        counters.add(cursor, counters.task_deltas(changes))
+        connection.commit()
+        for task_id, fields in allowed:
+            if 'deadline' in fields or 'status' in fields:
+                _, status, deadline = tasks[task_id]
+                deadline_scheduler.update(task_id, fields.get('deadline', deadline), fields.get('status', status))
+    
+        return jsonify({
+            "message": "Lote de tareas procesado",
+            "results": _item_results([(index, task_id) for index, task_id, _ in updates], checks),
+            "updated": len(allowed),
+            "failed": len(updates) - len(allowed)
+        })
+    except Error as e:
+        connection.rollback()
+        return jsonify({"error": f"Error actualizando tareas: {str(e)}"}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+@app.route('/tasks/bulk', methods=['DELETE'])
+@token_required
+@requires_permission('delete_task')
+def eliminar_tasks_bulk(user):
+    """Eliminar (soft delete) varias tareas en una transacción: {"ids": [1, 2, ...]}"""
+    try:
+        task_ids = _bulk_items('ids')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    errors = _task_ids(task_ids)
+    if errors:
+        return _invalid_items(errors)
+    
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({"error": "Error de conexión a la base de datos"}), 500
+    
+    cursor = connection.cursor()
+    try:
+        checks, tasks = _lock_tasks(cursor, user, task_ids, 'eliminar')
+        allowed = [task_id for task_id in task_ids if checks[task_id] is None]
+        for chunk in _chunks(allowed):
+            cursor.execute(
+                f"UPDATE tasks SET is_alive = FALSE WHERE id IN ({', '.join(['%s'] * len(chunk))})",
+                chunk
+            )
+        counters.add(cursor, counters.task_deltas((*tasks[task_id][:2], -1) for task_id in allowed))
+        connection.commit()
+        for task_id in allowed:
+            deadline_scheduler.cancel(task_id)
+    
+        return jsonify({
+            "message": "Lote de tareas procesado",
+            "results": _item_results(list(enumerate(task_ids)), checks),
+            "deleted": len(allowed),
+            "failed": len(task_ids) - len(allowed)
+        })
+    except Error as e:
+        connection.rollback()
+        return jsonify({"error": f"Error eliminando tareas: {str(e)}"}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
 @app.route('/tasks/status/<status>', methods=['GET'])
 @token_required
-def tasks_por_status(current_user, status):
-    """Obtener tareas por status"""
-    valid_statuses = ['In Progress', 'Revision', 'Completed', 'Paused']
-    if status not in [s.replace(' ', '_').lower() for s in valid_statuses]:
-        return jsonify({"error": f"Status inválido. Debe ser uno de: {valid_statuses}"}), 400
+@requires_permission('read_task')
+def tasks_por_status(user, status):
+    """Obtener tareas por status, por páginas igual que /tasks"""
+    if status not in [s.replace(' ', '_').lower() for s in VALID_STATUSES]:
+        return jsonify({"error": f"Status inválido. Debe ser uno de: {VALID_STATUSES}"}), 400
     
     # Convertir el status de URL a formato de DB
-    status_map = {
-        'in_progress': 'In Progress',
-        'revision': 'Revision', 
-        'completed': 'Completed',
-        'paused': 'Paused'
-    }
-    db_status = status_map.get(status.lower(), status)
-    
-    user = get_user_by_username(current_user)
-    if not user:
-        return jsonify({"error": "Usuario no encontrado"}), 404
+    return tasks_page(user, STATUS_MAP.get(status.lower(), status))
+
+# --- VENCIMIENTOS (índices idx_tasks_alive_deadline / idx_tasks_owner_alive_deadline) ---
+# Ventana por defecto de /tasks/upcoming y la mayor que se admite
+TASKS_UPCOMING_WITHIN = os.getenv('TASKS_UPCOMING_WITHIN', '24h')
+TASKS_UPCOMING_MAX_DAYS = int(os.getenv('TASKS_UPCOMING_MAX_DAYS', 90))
+
+_WITHIN = re.compile(r'^(\d+)([mhd])$')
+_WITHIN_UNITS = {'m': 'minutes', 'h': 'hours', 'd': 'days'}
+
+def parse_within(value):
+    """'30m', '24h', '7d' -> timedelta; ValueError si no es válido o supera TASKS_UPCOMING_MAX_DAYS"""
+    match = _WITHIN.match(value.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError("within inválido. Use un número seguido de m, h o d (por ejemplo 30m, 24h, 7d)")
+    within = timedelta(**{_WITHIN_UNITS[match.group(2)]: int(match.group(1))})
+    if within > timedelta(days=TASKS_UPCOMING_MAX_DAYS):
+        raise ValueError(f"within no puede superar {TASKS_UPCOMING_MAX_DAYS}d")
+    return within
+
+def deadline_query(user, start, end, limit):
+    """
+    SQL y parámetros de las tareas vivas y sin completar visibles para el usuario con
+    deadline en [start, end) (sin start: todas las anteriores a end), de la que vence antes
+    a la que vence después.
+    
+    is_alive (y created_by) son igualdades y deadline el rango y el orden de
+    idx_tasks_alive_deadline / idx_tasks_owner_alive_deadline: un recorrido de rango del
+    índice sin filesort; el status se descarta sobre las filas del rango.
+    """
+    conditions, params = _visible_tasks(user)
+    conditions.append(f"t.status NOT IN ({', '.join(['%s'] * len(deadlines.CLOSED_STATUSES))})")
+    params.extend(deadlines.CLOSED_STATUSES)
+    if start:
+        conditions.append('t.deadline >= %s')
+        params.append(start)
+    conditions.append('t.deadline < %s')
+    params.append(end)
+    query = f"""
+            SELECT t.*, u.username as created_by_username 
+            FROM tasks t 
+            JOIN users u ON t.created_by = u.id 
+            WHERE {' AND '.join(conditions)} 
+            ORDER BY t.deadline, t.id 
+            LIMIT %s
+    """
+    return query, params + [limit]
+
+def deadline_tasks(user, start, end, **extra):
+    """Respuesta de /tasks/overdue y /tasks/upcoming"""
+    try:
+        limit = _page_limit()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
     connection = get_db_connection()
     if not connection:
@@ -485,28 +1368,14 @@ def tasks_por_status(current_user, status):
     
     cursor = connection.cursor(dictionary=True)
     try:
-        if user['role_id'] == 1:  # admin
-            cursor.execute("""
-                SELECT t.*, u.username as created_by_username 
-                FROM tasks t 
-                JOIN users u ON t.created_by = u.id 
-                WHERE t.status = %s AND t.is_alive = TRUE 
-                ORDER BY t.created_at DESC
-            """, (db_status,))
-        else:
-            cursor.execute("""
-                SELECT t.*, u.username as created_by_username 
-                FROM tasks t 
-                JOIN users u ON t.created_by = u.id 
-                WHERE t.status = %s AND t.created_by = %s AND t.is_alive = TRUE 
-                ORDER BY t.created_at DESC
-            """, (db_status, user['id']))
-        
+        cursor.execute(*deadline_query(user, start, end, limit))
         tasks = cursor.fetchall()
         return jsonify({
             "tasks": tasks,
-            "status": db_status,
-            "count": len(tasks)
+            "count": len(tasks),
+            "limit": limit,
+            "now": (start or end).strftime('%Y-%m-%d %H:%M:%S'),
+            **extra
         })
     except Error as e:
         return jsonify({"error": f"Error obteniendo tareas: {str(e)}"}), 500
@@ -514,46 +1383,144 @@ def tasks_por_status(current_user, status):
         cursor.close()
         connection.close()
 
-@app.route('/info', methods=['GET'])
+@app.route('/tasks/overdue', methods=['GET'])
+@token_required
+@requires_permission('read_task')
+def tasks_vencidas(user):
+    """Tareas sin completar cuyo deadline ya pasó, de la más atrasada a la más reciente (?limit)"""
+    return deadline_tasks(user, None, datetime.now().replace(microsecond=0))
+
+@app.route('/tasks/upcoming', methods=['GET'])
+@token_required
+@requires_permission('read_task')
+def tasks_proximas(user):
+    """Tareas sin completar que vencen en los próximos ?within (30m, 24h, 7d...), por deadline (?limit)"""
+    within = request.args.get('within', TASKS_UPCOMING_WITHIN)
+    try:
+        delta = parse_within(within)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    now = datetime.now().replace(microsecond=0)
+    return deadline_tasks(user, now, now + delta, within=within)
+
+# --- BÚSQUEDA DE TEXTO (índice FULLTEXT ft_tasks_name_description) ---
+# Palabras más cortas no están en el índice (innodb_ft_min_token_size / ft_min_word_len)
+TASKS_SEARCH_MIN_WORD = int(os.getenv('TASKS_SEARCH_MIN_WORD', 3))
+
+_SEARCH_WORD = re.compile(r'\w+')
+
+def search_terms(text):
+    """
+    Texto del cliente -> consulta de MATCH ... AGAINST en modo booleano: cada palabra es
+    obligatoria y vale como prefijo ('proyect' encuentra 'proyecto'). Los operadores que
+    escriba el cliente se descartan; los acentos los resuelve la collation de la tabla.
+    """
+    words = [word for word in _SEARCH_WORD.findall(text.lower()) if len(word) >= TASKS_SEARCH_MIN_WORD]
+    return ' '.join(f'+{word}*' for word in dict.fromkeys(words))
+
+def search_query(user, terms, limit):
+    """SQL y parámetros de la búsqueda, con el mismo filtro de propietario que el listado"""
+    conditions, params = _visible_tasks(user)
+    query = f"""
+            SELECT t.*, u.username as created_by_username,
+                   MATCH(t.name, t.description) AGAINST (%s IN BOOLEAN MODE) as score
+            FROM tasks t 
+            JOIN users u ON t.created_by = u.id 
+            WHERE MATCH(t.name, t.description) AGAINST (%s IN BOOLEAN MODE) AND {' AND '.join(conditions)} 
+            ORDER BY score DESC, t.created_at DESC, t.id DESC 
+            LIMIT %s
+    """
+    return query, [terms, terms] + params + [limit]
+
+@app.route('/tasks/search', methods=['GET'])
 @token_required
-def info_sistema(current_user):
-    """Información general del sistema"""
+@requires_permission('read_task')
+def buscar_tasks(user):
+    """Buscar tareas por nombre y descripción (?q, ?limit), de la más a la menos relevante"""
+    text = request.args.get('q', '')
+    terms = search_terms(text)
+    if not terms:
+        return jsonify({"error": f"Parámetro q requerido, con al menos una palabra de {TASKS_SEARCH_MIN_WORD} letras"}), 400
+    try:
+        limit = _page_limit()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     connection = get_db_connection()
     if not connection:
         return jsonify({"error": "Error de conexión a la base de datos"}), 500
     
     cursor = connection.cursor(dictionary=True)
     try:
-        cursor.execute('SELECT COUNT(*) as count FROM users')
-        total_users = cursor.fetchone()['count']
-        
-        cursor.execute('SELECT COUNT(*) as count FROM roles')
-        total_roles = cursor.fetchone()['count']
-        
-        cursor.execute('SELECT COUNT(*) as count FROM permisos')
-        total_permisos = cursor.fetchone()['count']
-        
-        cursor.execute('SELECT COUNT(*) as count FROM tasks WHERE is_alive = TRUE')
-        total_tasks = cursor.fetchone()['count']
-        
-        cursor.execute("""
-            SELECT status, COUNT(*) as count 
-            FROM tasks 
-            WHERE is_alive = TRUE 
-            GROUP BY status
-        """)
-        tasks_por_status = cursor.fetchall()
-        
+        cursor.execute(*search_query(user, terms, limit))
+        tasks = cursor.fetchall()
+        return jsonify({
+            "query": text,
+            "tasks": tasks,
+            "count": len(tasks),
+            "limit": limit
+        })
+    except Error as e:
+        return jsonify({"error": f"Error buscando tareas: {str(e)}"}), 500
+    finally:
+        cursor.close()
+        connection.close()
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Estado del servicio y de su conexión a MySQL (lo usa el API Gateway)"""
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({"status": "DOWN", "database": "DOWN"}), 503
+    connection.close()
+    return jsonify({"status": "UP", "database": "UP"})
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Estadísticas internas del servicio"""
+    return jsonify({
+        "db_pool": pool.snapshot(),
+        "perm_versions": perm_versions.snapshot(),
+        "permissions": permissions.snapshot(),
+        "password_hasher": hasher.snapshot(),
+        "stats_reconciler": reconciler.snapshot(),
+        "deadline_scheduler": deadline_scheduler.snapshot(),
+        "compression": compressor.snapshot(),
+        "tracing": tracing.stats()
+    })
+
+@app.after_request
+def compress_response(response):
+    """Comprimir la respuesta si el cliente lo acepta (gzip o brotli)"""
+    if not COMPRESSION_ENABLED:
+        return response
+    return compressor.compress(response, request.headers.get('Accept-Encoding'), request.method)
+
+@app.route('/admin/permissions/reload', methods=['POST'])
+@token_required
+@requires_permission('update_permission')
+def recargar_permisos(user):
+    """Recargar ya la matriz de permisos (sin esperar a que el poll vea cambiar rbac_version)"""
+    try:
+        permissions.reload()
+    except Error as e:
+        return jsonify({"error": f"Error recargando permisos: {str(e)}"}), 500
+    return jsonify({"message": "Permisos recargados", "permissions": permissions.snapshot()})
+
+@app.route('/info', methods=['GET'])
+@token_required
+def info_sistema(user):
+    """Información general del sistema (contadores mantenidos en stat_counters, ver counters.py)"""
+    connection = get_db_connection()
+    if not connection:
+        return jsonify({"error": "Error de conexión a la base de datos"}), 500
+    
+    cursor = connection.cursor()
+    try:
         return jsonify({
             "sistema": "API de Gestión de Tareas con JWT",
-            "usuario_actual": current_user,
-            "estadisticas": {
-                "total_usuarios": total_users,
-                "total_roles": total_roles,
-                "total_permisos": total_permisos,
-                "total_tareas": total_tasks,
-                "tareas_por_status": {item['status']: item['count'] for item in tasks_por_status}
-            }
+            "usuario_actual": user.username,
+            "estadisticas": counters.read(cursor, user.id)
         })
     except Error as e:
         return jsonify({"error": f"Error obteniendo información: {str(e)}"}), 500
@@ -562,8 +1529,32 @@ def info_sistema(current_user):
         connection.close()
 
 if __name__ == '__main__':
-    if init_db():
-        print("Iniciando Task Service en puerto 5003...")
-        app.run(port=5003, debug=True)
+    port = int(os.getenv('PORT', 5003))
+    if os.getenv('WERKZEUG_RUN_MAIN') != 'true':
+        # Con debug=True este bloque se ejecuta también en el proceso padre del reloader, que solo
+        # vigila los ficheros y relanza el hijo: no atiende peticiones, así que no arranca el pool
+        # de bcrypt ni los hilos de fondo (los eventos de deadline se emitirían dos veces)
+        app.run(port=port, debug=True)
     else:
-        print("Error inicializando la base de datos. No se puede iniciar el servicio.")
\ No newline at end of file
+        # Arrancar los procesos de bcrypt antes de init_db, que ya los usa
+        hasher.start()
+        if init_db():
+            # Abrir las conexiones mínimas del pool antes de atender peticiones
+            pool.warm()
+            # Calcular las estadísticas al arrancar (la primera vez rellena stat_counters) y después periódicamente
+            try:
+                reconciler.reconcile()
+            except Error as e:
+                print(f"Error conciliando estadísticas: {e}")
+            reconciler.start()
+            # Matriz de permisos en memoria: sin ella no se atiende ninguna petición
+            if not permissions.ensure_loaded():
+                print("Error cargando los permisos. No se puede iniciar el servicio.")
+                sys.exit(1)
+            permissions.start()
+            # Avisos de deadline: carga la primera ventana desde el índice en su propio hilo
+            deadline_scheduler.start()
+            print(f"Iniciando Task Service en puerto {port}...")
+            app.run(port=port, debug=True)
+        else:
+            print("Error inicializando la base de datos. No se puede iniciar el servicio.")
\ No newline at end of file
@@ -1,33 +1,312 @@
 # task_service/auth.py
 import jwt
+import base64
+import hashlib
+import hmac
+import json
+import multiprocessing
+import os
+import secrets
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from functools import wraps
-from flask import request, jsonify, current_app
-import bcrypt
+from flask import request, jsonify, current_app, g
+import hashing
+import tracing
 
-def generate_token(username):
+# Cabecera con la identidad ya verificada por el API Gateway
+IDENTITY_HEADER = 'X-Identity'
+
+def generate_token(username, user_id, role_id, perm_version=0):
     """Generar token JWT con expiración de 5 minutos"""
     payload = {
         'exp': datetime.utcnow() + timedelta(minutes=5),
         'iat': datetime.utcnow(),
-        'sub': username
+        'sub': username,
+        # Con el id, el rol y la versión de permisos en el token no hace falta consultar el usuario
+        'uid': user_id,
+        'role': role_id,
+        'pv': perm_version
     }
     return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
 
+# --- REFRESH TOKENS ---
+# Días de validez de un refresh token (cada renovación emite otro: la sesión se desliza)
+# y días máximos de una sesión desde el login, se renueve o no
+REFRESH_TOKEN_TTL_DAYS = float(os.getenv('REFRESH_TOKEN_TTL_DAYS', 14))
+REFRESH_SESSION_MAX_DAYS = float(os.getenv('REFRESH_SESSION_MAX_DAYS', 90))
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+def refresh_token_hash(secret):
+    """HMAC del secreto: es lo único que se guarda, así que la tabla no sirve para renovar sesiones"""
+    return hmac.new(current_app.config['REFRESH_SECRET'].encode('utf-8'), secret, hashlib.sha256).digest()
+
+def new_refresh_token():
+    """(id, HMAC del secreto, token '<id>.<secreto>' para el cliente) de un refresh token nuevo"""
+    token_id = secrets.token_bytes(16)
+    secret = secrets.token_bytes(32)
+    return token_id, refresh_token_hash(secret), f"{_b64encode(token_id)}.{_b64encode(secret)}"
+
+def parse_refresh_token(token):
+    """(id, secreto) del refresh token del cliente, o None si no tiene el formato"""
+    try:
+        token_id, secret = (_b64decode(part) for part in token.split('.'))
+    except (AttributeError, ValueError, UnicodeError):
+        return None
+    if len(token_id) != 16 or len(secret) != 32:
+        return None
+    return token_id, secret
+
+# --- CONTRASEÑAS (bcrypt en un pool de procesos) ---
+# Coste de bcrypt (2^rounds iteraciones); los hashes con otro coste se rehacen en el siguiente login
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+# Procesos que calculan bcrypt: fuera del GIL, no bloquean los hilos que atienden las demás rutas
+BCRYPT_WORKERS = int(os.getenv('BCRYPT_WORKERS', os.cpu_count() or 2))
+# Operaciones en curso o en espera; por encima se responde 503 en vez de encolar más
+BCRYPT_MAX_PENDING = int(os.getenv('BCRYPT_MAX_PENDING', 64))
+# Espera máxima por el resultado de una operación (segundos)
+BCRYPT_TIMEOUT = float(os.getenv('BCRYPT_TIMEOUT', 10))
+
+class HasherBusy(Exception):
+    """Demasiadas operaciones de bcrypt pendientes (o sin respuesta a tiempo): responder 503"""
+
+@contextmanager
+def _without_main_module():
+    """
+    Los procesos spawn creados dentro no vuelven a ejecutar el script del servicio como
+    __mp_main__: multiprocessing solo lo hace si __main__ tiene __spec__ o __file__. Las tareas
+    son funciones de hashing.py, así que los procesos no necesitan nada más.
+    """
+    main = sys.modules['__main__']
+    saved = {name: main.__dict__.pop(name) for name in ('__spec__', '__file__') if name in main.__dict__}
+    main.__spec__ = None
+    try:
+        yield
+    finally:
+        main.__dict__.update(saved)
+
+class PasswordHasher:
+    """
+    Pool de procesos acotado para bcrypt. Un login o registro ocupa un proceso unos cientos
+    de milisegundos de CPU; con BCRYPT_MAX_PENDING operaciones pendientes las siguientes
+    fallan enseguida (HasherBusy) en lugar de acumular latencia.
+    """
+
+    def __init__(self, workers, max_pending, timeout):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def start(self):
+        """Arrancar todos los procesos antes de atender peticiones"""
+        self._get_executor()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # spawn: los procesos no heredan los hilos ni los locks del servicio
+                executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+                # Crear aquí todos los procesos (uno por tarea mientras ninguno esté libre), para que
+                # ninguno se cree después fuera de _without_main_module()
+                with _without_main_module():
+                    warmup = [executor.submit(hashing.ready) for _ in range(self.workers)]
+                for future in warmup:
+                    future.result()
+                self._executor = executor
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HasherBusy("Demasiadas operaciones de bcrypt pendientes")
+        executor = self._get_executor()
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._reset(executor)
+            raise HasherBusy("Pool de bcrypt reiniciándose")
+        # El hueco se libera cuando termina la operación, aunque el cliente ya no espere
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            self.timeouts += 1
+            raise HasherBusy("bcrypt no respondió a tiempo")
+        except BrokenProcessPool:
+            self._reset(executor)
+            raise HasherBusy("Pool de bcrypt reiniciándose")
+        self.completed += 1
+        return result
+
+    def _reset(self, executor):
+        """Algún proceso murió y el pool ya no acepta trabajo: el siguiente intento crea otro"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def hash(self, password, rounds):
+        return self._run(hashing.hashpw, password, rounds)
+
+    def check(self, password, hashed_password):
+        return self._run(hashing.checkpw, password, hashed_password)
+
+    def snapshot(self):
+        return {
+            "workers": self.workers,
+            "rounds": BCRYPT_ROUNDS,
+            "max_pending": self.max_pending,
+            "pending": self.max_pending - self._slots._value,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts
+        }
+
+hasher = PasswordHasher(BCRYPT_WORKERS, BCRYPT_MAX_PENDING, BCRYPT_TIMEOUT)
+
 def hash_password(password):
-    """Hashear contraseña usando bcrypt"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    """Hashear contraseña usando bcrypt (en el pool de procesos); HasherBusy si está saturado"""
+    return hasher.hash(password.encode('utf-8'), BCRYPT_ROUNDS)
 
 def check_password(hashed_password, user_password):
-    """Verificar contraseña hasheada"""
+    """Verificar contraseña hasheada (en el pool de procesos); HasherBusy si está saturado"""
     if isinstance(hashed_password, str):
         hashed_password = hashed_password.encode('utf-8')
-    return bcrypt.checkpw(user_password.encode('utf-8'), hashed_password)
+    return hasher.check(user_password.encode('utf-8'), hashed_password)
+
+def needs_rehash(hashed_password):
+    """¿El hash se calculó con un coste distinto de BCRYPT_ROUNDS? ($2b$<rounds>$...)"""
+    if isinstance(hashed_password, bytes):
+        hashed_password = hashed_password.decode('utf-8')
+    try:
+        return int(hashed_password.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+def verify_identity(header):
+    """Identidad enviada por el API Gateway si la firma es válida y no ha expirado, o None"""
+    try:
+        payload, signature = header.split('.')
+        expected = hmac.new(current_app.config['IDENTITY_SECRET'].encode('utf-8'),
+                            payload.encode('ascii'), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            return None
+        identity = json.loads(_b64decode(payload))
+    except (ValueError, UnicodeError):
+        return None
+    if not isinstance(identity, dict) or identity.get('exp', 0) <= time.time():
+        return None
+    if not all(key in identity for key in ('sub', 'uid', 'role')):
+        return None
+    return identity
+
+class Principal:
+    """Usuario autenticado, tal como lo describen el token o la identidad del gateway"""
+
+    __slots__ = ('id', 'username', 'role_id', 'perm_version')
+
+    def __init__(self, id, username, role_id, perm_version=0):
+        self.id = id
+        self.username = username
+        self.role_id = role_id
+        self.perm_version = perm_version
+
+    @classmethod
+    def from_claims(cls, claims):
+        """Principal de los claims del token o de X-Identity, o None si les faltan datos"""
+        if not all(key in claims for key in ('sub', 'uid', 'role')):
+            return None
+        return cls(claims['uid'], claims['sub'], claims['role'], claims.get('pv', 0))
+
+    def __repr__(self):
+        return f"Principal(id={self.id!r}, username={self.username!r}, role_id={self.role_id!r})"
+
+class PermissionVersions:
+    """
+    Versión de permisos actual de cada usuario. Sube al cambiar su rol (o al revocar sus
+    tokens); los tokens con una versión anterior dejan de aceptarse. Se consulta en la base
+    de datos como mucho una vez cada ttl segundos por usuario.
+    """
+
+    def __init__(self, ttl=30, max_entries=100000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # user_id -> versión actual, o None si el usuario no existe; lo asigna app.py
+        self.loader = None
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.lookups = 0
+
+    def current(self, user_id):
+        """Versión actual del usuario (None si no existe); lanza la excepción del loader si falla"""
+        now = time.monotonic()
+        entry = self._versions.get(user_id)
+        if entry is not None and now - entry[1] < self.ttl:
+            return entry[0]
+        try:
+            version = self.loader(user_id)
+        except Exception:
+            if entry is not None:
+                # Sin base de datos se sigue usando la última versión conocida
+                return entry[0]
+            raise
+        with self._lock:
+            self.lookups += 1
+            if len(self._versions) >= self.max_entries:
+                self._versions.clear()
+            self._versions[user_id] = (version, now)
+        return version
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._versions.pop(user_id, None)
+
+    def snapshot(self):
+        return {"ttl_seconds": self.ttl, "cached_users": len(self._versions), "lookups": self.lookups}
+
+perm_versions = PermissionVersions()
+
+def _authorize(principal, f, args, kwargs):
+    """Comprobar que los permisos del token siguen vigentes y llamar al handler con el principal"""
+    try:
+        current = perm_versions.current(principal.id)
+    except Exception as e:
+        print(f"Error consultando la versión de permisos: {e}")
+        return jsonify({"error": "Error de conexión a la base de datos"}), 500
+    if current is None or principal.perm_version < current:
+        return jsonify({"error": "Token revocado. Por favor, inicie sesión nuevamente"}), 401
+    g.principal = principal
+    return f(principal, *args, **kwargs)
 
 def token_required(f):
-    """Decorador para requerir token JWT válido"""
+    """Decorador para requerir token JWT válido; el handler recibe el Principal"""
     @wraps(f)
     def decorated(*args, **kwargs):
+        # Camino rápido: el gateway ya verificó el token y envía la identidad firmada
+        identity_header = request.headers.get(IDENTITY_HEADER)
+        if identity_header:
+            with tracing.span('identity.verify'):
+                identity = verify_identity(identity_header)
+            if identity is not None:
+                return _authorize(Principal.from_claims(identity), f, args, kwargs)
+        
         token = None
         auth_header = request.headers.get('Authorization')
         
@@ -42,12 +321,16 @@ def token_required(f):
             return jsonify({"error": "Token requerido"}), 401
         
         try:
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-            current_user = data['sub']
+            with tracing.span('jwt.decode'):
+                data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
         except jwt.ExpiredSignatureError:
             return jsonify({"error": "Token expirado. Por favor, inicie sesión nuevamente"}), 401
         except jwt.InvalidTokenError:
             return jsonify({"error": "Token inválido"}), 401
         
-        return f(current_user, *args, **kwargs)
-    return decorated
\ No newline at end of file
+        principal = Principal.from_claims(data)
+        if principal is None:
+            # Token emitido antes de incluir el id y el rol
+            return jsonify({"error": "Token inválido. Por favor, inicie sesión nuevamente"}), 401
+        return _authorize(principal, f, args, kwargs)
+    return decorated
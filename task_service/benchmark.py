@@ -0,0 +1,260 @@
+# task_service/benchmark.py
+# Benchmark de las consultas calientes del Task Service: plan (EXPLAIN) y latencia de cada una.
+#
+#   python benchmark.py --seed --users 500 --tasks 200000   # crear y poblar la base de pruebas
+#   python benchmark.py --runs 50                           # medir
+#
+# Trabaja sobre BENCH_DB_NAME (por defecto task_management_bench), nunca sobre la base real.
+# Termina con código 1 si alguna consulta recorre una tabla entera o necesita filesort, así que
+# sirve como prueba de regresión de los índices al cambiar las consultas de app.py.
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import mysql.connector
+from mysql.connector import Error
+
+from database import DatabaseConfig
+
+BENCH_DB_NAME = os.getenv('BENCH_DB_NAME', 'task_management_bench')
+
+# Reparto de status de las tareas sembradas
+STATUS_WEIGHTS = {'In Progress': 40, 'Completed': 35, 'Revision': 15, 'Paused': 10}
+# No es un hash bcrypt válido: los usuarios sembrados no pueden iniciar sesión
+SEED_PASSWORD = 'benchmark'
+SEED_CHUNK = 1000
+
+
+class CapturingCursor:
+    """Cursor que ejecuta normalmente y guarda cada (sql, params) para poder hacerles EXPLAIN"""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.statements = []
+
+    def execute(self, sql, params=()):
+        self.statements.append((sql, params))
+        return self.cursor.execute(sql, params)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+def create_database(name):
+    """Crear la base de pruebas y apuntar el pool a ella (antes de abrir ninguna conexión)"""
+    if name == 'task_management':
+        sys.exit("El benchmark no se ejecuta sobre la base de datos real")
+    config = {key: value for key, value in DatabaseConfig.DB_CONFIG.items() if key != 'database'}
+    connection = mysql.connector.connect(**config)
+    try:
+        connection.cursor().execute(f"CREATE DATABASE IF NOT EXISTS `{name}`")
+    finally:
+        connection.close()
+    DatabaseConfig.DB_CONFIG['database'] = name
+
+
+def seed(app, users, tasks):
+    """
+    Usuarios y tareas con una distribución realista: pocos usuarios con muchas tareas,
+    la mayoría vivas, fechas repartidas en dos años y deadline en parte de ellas.
+    """
+    connection = app.get_db_connection()
+    cursor = connection.cursor()
+    try:
+        prefix = f"bench_{int(time.time())}"
+        rows = [(f"{prefix}_{i}", SEED_PASSWORD, f"{prefix}_{i}@bench.local", 2) for i in range(users)]
+        for start in range(0, len(rows), SEED_CHUNK):
+            cursor.executemany(
+                'INSERT INTO users (username, password, email, role_id) VALUES (%s, %s, %s, %s)',
+                rows[start:start + SEED_CHUNK]
+            )
+        cursor.execute('SELECT id FROM users WHERE username LIKE %s', (f"{prefix}_%",))
+        user_ids = [row[0] for row in cursor.fetchall()]
+        # Ley de potencias: el 20% de los usuarios tiene la mayoría de las tareas
+        weights = [random.paretovariate(1.2) for _ in user_ids]
+
+        statuses = list(STATUS_WEIGHTS)
+        now = datetime.now()
+        for start in range(0, tasks, SEED_CHUNK):
+            count = min(SEED_CHUNK, tasks - start)
+            owners = random.choices(user_ids, weights, k=count)
+            chunk = []
+            for owner, status in zip(owners, random.choices(statuses, list(STATUS_WEIGHTS.values()), k=count)):
+                created_at = now - timedelta(seconds=random.randint(0, 2 * 365 * 86400))
+                deadline = created_at + timedelta(days=random.randint(1, 60)) if random.random() < 0.7 else None
+                chunk.append((f"Tarea {start + len(chunk)}", 'Tarea generada por benchmark.py', created_at,
+                              deadline, status, random.random() < 0.9, owner))
+            cursor.executemany("""
+                INSERT INTO tasks (name, description, created_at, deadline, status, is_alive, created_by)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, chunk)
+            connection.commit()
+            print(f"  {start + count}/{tasks} tareas", end='\r')
+        print()
+        cursor.execute("ANALYZE TABLE tasks, users")
+        cursor.fetchall()
+    finally:
+        cursor.close()
+        connection.close()
+
+    # Los contadores de /info se rellenan desde las tablas
+    app.reconciler.reconcile()
+
+
+def sample(cursor):
+    """Valores reales para los parámetros: el usuario con más tareas, una tarea y posiciones profundas"""
+    cursor.execute("""
+        SELECT u.id, u.username, u.role_id FROM users u
+        WHERE u.id = (SELECT created_by FROM tasks GROUP BY created_by ORDER BY COUNT(*) DESC LIMIT 1)
+    """)
+    user = cursor.fetchone()
+    if user is None:
+        sys.exit("No hay tareas: ejecute antes con --seed")
+    cursor.execute("SELECT COUNT(*) FROM tasks WHERE is_alive = TRUE")
+    alive = cursor.fetchone()[0]
+    cursor.execute("""
+        SELECT created_at, id FROM tasks WHERE is_alive = TRUE
+        ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET %s
+    """, (alive // 2,))
+    deep = cursor.fetchone()
+    cursor.execute("SELECT COUNT(*) FROM tasks WHERE created_by = %s AND is_alive = TRUE", (user[0],))
+    user_alive = cursor.fetchone()[0]
+    cursor.execute("""
+        SELECT created_at, id FROM tasks WHERE created_by = %s AND is_alive = TRUE
+        ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET %s
+    """, (user[0], user_alive // 2))
+    user_deep = cursor.fetchone()
+    cursor.execute("SELECT id FROM tasks WHERE is_alive = TRUE ORDER BY RAND() LIMIT 100")
+    task_ids = [row[0] for row in cursor.fetchall()]
+    return user, deep, user_deep, task_ids
+
+
+def hot_queries(app, counters, cursor):
+    """[(nombre, sql, params)] de cada consulta de las rutas calientes de app.py"""
+    from auth import Principal
+
+    user_row, deep, user_deep, task_ids = sample(cursor)
+    admin = Principal(0, 'admin', 1)
+    user = Principal(user_row[0], user_row[1], user_row[2])
+    limit = [app.TASKS_PAGE_SIZE + 1]
+    month_ago = datetime.now() - timedelta(days=30)
+
+    queries = []
+    for name, principal, status, after, deadlines in [
+        ('GET /tasks (admin)', admin, None, None, (None, None)),
+        ('GET /tasks (admin, página profunda)', admin, None, deep, (None, None)),
+        ('GET /tasks (usuario)', user, None, None, (None, None)),
+        ('GET /tasks (usuario, página profunda)', user, None, user_deep, (None, None)),
+        ('GET /tasks (usuario, deadline)', user, None, None, (month_ago, None)),
+        ('GET /tasks/status (admin)', admin, 'Revision', None, (None, None)),
+        ('GET /tasks/status (usuario)', user, 'Completed', None, (None, None)),
+    ]:
+        sql, params = app.tasks_query(principal, status, deadlines[0], deadlines[1], after)
+        queries.append((name, sql + "LIMIT %s", params + limit))
+
+    queries.append(('GET /tasks/<id>', """
+            SELECT t.*, u.username as created_by_username
+            FROM tasks t
+            JOIN users u ON t.created_by = u.id
+            WHERE t.id = %s AND t.is_alive = TRUE
+        """, (task_ids[0],)))
+    queries.append(('GET /tasks/search (usuario)', *app.search_query(user, app.search_terms('tarea generada'), limit[0])))
+    now = datetime.now().replace(microsecond=0)
+    queries.append(('GET /tasks/overdue (admin)', *app.deadline_query(admin, None, now, limit[0])))
+    queries.append(('GET /tasks/overdue (usuario)', *app.deadline_query(user, None, now, limit[0])))
+    queries.append(('GET /tasks/upcoming (usuario)', *app.deadline_query(user, now, now + timedelta(days=7), limit[0])))
+    queries.append(('POST /login', 'SELECT * FROM users WHERE username = %s', (user.username,)))
+    queries.append(('token_required (perm_version)', 'SELECT perm_version FROM users WHERE id = %s', (user.id,)))
+
+    # Las consultas que construyen counters.read y _lock_tasks se capturan ejecutándolas
+    capture = CapturingCursor(cursor)
+    counters.read(capture, user.id)
+    app._lock_tasks(capture, admin, task_ids, 'editar')
+    (read_sql, read_params), (lock_sql, lock_params) = capture.statements
+    queries.append(('GET /info', read_sql, read_params))
+    queries.append(('PATCH /tasks/bulk (bloqueo)', lock_sql, lock_params))
+    return queries
+
+
+def explain(cursor, sql, params):
+    """Filas de EXPLAIN y los problemas del plan: recorridos completos y filesort"""
+    cursor.execute("EXPLAIN " + sql, params)
+    columns = [column[0] for column in cursor.description]
+    plan = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    problems = []
+    for row in plan:
+        extra = row.get('Extra') or ''
+        if row.get('type') == 'ALL':
+            problems.append(f"recorrido completo de {row.get('table')}")
+        # Ordenar por relevancia las filas que encuentra el índice FULLTEXT es inevitable
+        if 'Using filesort' in extra and row.get('type') != 'fulltext':
+            problems.append(f"filesort en {row.get('table')}")
+    return plan, problems
+
+
+def measure(cursor, sql, params, runs):
+    """Latencias (ms) de ejecutar la consulta y leer todas sus filas"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return len(rows), timings[len(timings) // 2], timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Planes y latencia de las consultas calientes del Task Service")
+    parser.add_argument('--database', default=BENCH_DB_NAME, help="Base de datos de pruebas")
+    parser.add_argument('--seed', action='store_true', help="Crear el esquema y sembrar datos antes de medir")
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--tasks', type=int, default=200000)
+    parser.add_argument('--runs', type=int, default=20, help="Ejecuciones de cada consulta")
+    args = parser.parse_args()
+
+    create_database(args.database)
+    # app y counters se importan después de apuntar el pool a la base de pruebas
+    import app
+    import counters
+
+    if args.seed:
+        app.init_db()
+        print(f"Sembrando {args.users} usuarios y {args.tasks} tareas en {args.database}...")
+        seed(app, args.users, args.tasks)
+    # El filtro de propietario de los listados depende del permiso read_all_tasks del rol
+    app.permissions.reload()
+
+    connection = app.get_db_connection()
+    cursor = connection.cursor()
+    failed = []
+    try:
+        print(f"{'consulta':<40} {'filas':>6} {'p50 ms':>8} {'p95 ms':>8}  plan")
+        for name, sql, params in hot_queries(app, counters, cursor):
+            plan, problems = explain(cursor, sql, params)
+            rows, p50, p95 = measure(cursor, sql, params, args.runs)
+            keys = ', '.join(f"{row.get('table')}:{row.get('key') or row.get('type')}" for row in plan)
+            print(f"{name:<40} {rows:>6} {p50:>8.2f} {p95:>8.2f}  {keys}")
+            for problem in problems:
+                print(f"{'':<40} REGRESIÓN: {problem}")
+            if problems:
+                failed.append(name)
+        # Nada de lo anterior debe quedar (ni los bloqueos de _lock_tasks)
+        connection.rollback()
+    except Error as e:
+        sys.exit(f"Error ejecutando el benchmark: {e}")
+    finally:
+        cursor.close()
+        connection.close()
+
+    if failed:
+        print(f"\n{len(failed)} consulta(s) con un plan sin índice: {', '.join(failed)}")
+        sys.exit(1)
+    print("\nTodas las consultas usan índices sin filesort")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+# task_service/counters.py
+# Estadísticas de /info mantenidas de forma incremental en la tabla stat_counters
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+
+from mysql.connector import Error
+
+# Filas por contador: las escrituras concurrentes suman en filas distintas y no esperan
+# por el mismo bloqueo de fila. El valor del contador es la suma de sus filas.
+SHARDS = int(os.getenv('STATS_COUNTER_SHARDS', 8))
+# Cada cuánto se comparan los contadores con las tablas reales y se corrigen (segundos)
+RECONCILE_INTERVAL = float(os.getenv('STATS_RECONCILE_INTERVAL', 300))
+
+TASK_STATUSES = ('In Progress', 'Revision', 'Completed', 'Paused')
+TABLES = ('users', 'roles', 'permisos')
+RECONCILED_AT = 'meta:reconciled_at'
+DRIFT = 'meta:drift'
+
+
+def task_counter(user_id, status):
+    """Tareas vivas de un usuario con ese status ('*' = de todos los usuarios)"""
+    return f"tasks:{user_id}:{status}"
+
+
+def add(cursor, deltas):
+    """
+    Sumar {contador: delta} dentro de la transacción del cursor: se confirma o se deshace
+    junto con la escritura que lo provoca.
+    """
+    rows = sorted((name, random.randrange(SHARDS), delta) for name, delta in deltas.items() if delta)
+    if rows:
+        # Orden fijo de filas: dos transacciones no se bloquean en orden inverso
+        cursor.executemany("""
+            INSERT INTO stat_counters (name, shard, value) VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE value = value + VALUES(value)
+        """, rows)
+
+
+def task_deltas(changes):
+    """
+    Deltas de los contadores de tareas a partir de [(user_id, status, +1/-1), ...]:
+    el del usuario y el global de cada status.
+    """
+    deltas = defaultdict(int)
+    for user_id, status, delta in changes:
+        deltas[task_counter(user_id, status)] += delta
+        deltas[task_counter('*', status)] += delta
+    return deltas
+
+
+def read(cursor, user_id):
+    """Estadísticas de /info: unas pocas filas por clave primaria, sin recorrer las tablas"""
+    names = list(TABLES) + [RECONCILED_AT, DRIFT]
+    names += [task_counter('*', status) for status in TASK_STATUSES]
+    names += [task_counter(user_id, status) for status in TASK_STATUSES]
+    cursor.execute(
+        f"SELECT name, SUM(value) FROM stat_counters WHERE name IN ({', '.join(['%s'] * len(names))}) GROUP BY name",
+        names
+    )
+    values = {name: int(value) for name, value in cursor.fetchall()}
+
+    reconciled_at = values.get(RECONCILED_AT)
+    return {
+        "total_usuarios": values.get('users', 0),
+        "total_roles": values.get('roles', 0),
+        "total_permisos": values.get('permisos', 0),
+        "total_tareas": sum(values.get(task_counter('*', status), 0) for status in TASK_STATUSES),
+        "tareas_por_status": {
+            status: values[task_counter('*', status)] for status in TASK_STATUSES
+            if values.get(task_counter('*', status))
+        },
+        "mis_tareas_por_status": {
+            status: values[task_counter(user_id, status)] for status in TASK_STATUSES
+            if values.get(task_counter(user_id, status))
+        },
+        "frescura": {
+            "ultima_conciliacion": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(reconciled_at))
+            if reconciled_at else None,
+            "segundos_desde_conciliacion": int(time.time()) - reconciled_at if reconciled_at else None,
+            "contadores_corregidos": values.get(DRIFT, 0)
+        }
+    }
+
+
+class Reconciler:
+    """Recalcula los agregados desde las tablas reales y corrige los contadores que se desvíen"""
+
+    def __init__(self, get_connection, interval=RECONCILE_INTERVAL):
+        self.get_connection = get_connection
+        self.interval = interval
+        self.runs = 0
+        self.last_drift = None
+        self.last_error = None
+        self._thread = None
+
+    def reconcile(self):
+        """Una conciliación; devuelve cuántos contadores había que corregir"""
+        connection = self.get_connection()
+        if not connection:
+            raise Error(msg="Sin conexión a la base de datos")
+
+        cursor = connection.cursor()
+        try:
+            # Contadores y tablas se leen de la misma instantánea sin bloquear nada: como cada
+            # escritura suma sus deltas en su propia transacción, en la instantánea ambos coinciden
+            # salvo por la desviación real, y counters.add() no espera mientras se recorre tasks
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+            cursor.execute("SELECT name, SUM(value) FROM stat_counters GROUP BY name")
+            current = {name: int(value) for name, value in cursor.fetchall()}
+
+            expected = defaultdict(int)
+            cursor.execute("SELECT created_by, status, COUNT(*) FROM tasks WHERE is_alive = TRUE GROUP BY created_by, status")
+            for user_id, status, count in cursor.fetchall():
+                expected[task_counter(user_id, status)] += count
+                expected[task_counter('*', status)] += count
+            for table in TABLES:
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                expected[table] = cursor.fetchone()[0]
+            connection.commit()
+
+            # La corrección se suma como un delta más: las escrituras posteriores a la instantánea
+            # ya están en los contadores y siguen contando
+            deltas = {
+                name: expected.get(name, 0) - current.get(name, 0)
+                for name in set(current) | set(expected)
+                if not name.startswith('meta:') and current.get(name, 0) != expected.get(name, 0)
+            }
+            add(cursor, deltas)
+            cursor.execute("DELETE FROM stat_counters WHERE name IN (%s, %s)", (RECONCILED_AT, DRIFT))
+            cursor.executemany("INSERT INTO stat_counters (name, shard, value) VALUES (%s, %s, %s)",
+                               [(RECONCILED_AT, 0, int(time.time())), (DRIFT, 0, len(deltas))])
+            connection.commit()
+        except Error:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+        self.runs += 1
+        self.last_drift = len(deltas)
+        return self.last_drift
+
+    def start(self):
+        """Conciliar en segundo plano cada interval segundos"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='stats-reconciler', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.reconcile()
+                self.last_error = None
+            except Error as e:
+                self.last_error = str(e)
+                print(f"Error conciliando estadísticas: {e}")
+
+    def snapshot(self):
+        return {
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "last_drift": self.last_drift,
+            "last_error": self.last_error
+        }
@@ -1,9 +1,52 @@
 # task_service/database.py
 import mysql.connector
 from mysql.connector import Error
+from mysql.connector.errors import PoolError
 import os
+import threading
+import time
+from collections import deque
 from datetime import datetime
 
+# --- CAMBIOS DE ESQUEMA IDEMPOTENTES ---
+# MySQL no admite IF [NOT] EXISTS en ADD COLUMN, CREATE/DROP INDEX ni (antes de 8.0.29) en CREATE TRIGGER, así que
+# se consulta information_schema antes de cada cambio; así funciona igual en MySQL y en MariaDB
+
+def add_column(cursor, table, column, definition):
+    """ALTER TABLE ... ADD COLUMN, si la tabla aún no tiene la columna"""
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+    """, (table, column))
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def create_trigger(cursor, name, definition):
+    """CREATE TRIGGER name definition, si aún no existe"""
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.TRIGGERS
+        WHERE TRIGGER_SCHEMA = DATABASE() AND TRIGGER_NAME = %s
+    """, (name,))
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"CREATE TRIGGER {name} {definition}")
+
+def index_exists(cursor, table, name):
+    cursor.execute("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+    """, (table, name))
+    return cursor.fetchone()[0] > 0
+
+def create_index(cursor, table, name, columns, kind=''):
+    """CREATE [kind] INDEX name ON table(columns), si aún no existe (kind: '' o 'FULLTEXT')"""
+    if not index_exists(cursor, table, name):
+        cursor.execute(f"CREATE {kind + ' ' if kind else ''}INDEX {name} ON {table}({columns})")
+
+def drop_index(cursor, table, name):
+    """DROP INDEX name ON table, si existe"""
+    if index_exists(cursor, table, name):
+        cursor.execute(f"DROP INDEX {name} ON {table}")
+
 class DatabaseConfig:
     """Configuración centralizada de la base de datos"""
     
@@ -17,13 +60,23 @@ class DatabaseConfig:
         'auth_plugin': 'mysql_native_password'
     }
 
+    # --- POOL DE CONEXIONES ---
+    # Conexiones que se abren al arrancar y máximo de conexiones abiertas a la vez
+    POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+    POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+    # Segundos de vida de una conexión antes de cerrarla y abrir otra
+    POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', 1800))
+    # Espera máxima por una conexión libre (segundos) y peticiones que pueden esperar a la vez
+    POOL_WAIT_TIMEOUT = float(os.getenv('DB_POOL_WAIT_TIMEOUT', 5))
+    POOL_MAX_WAITERS = int(os.getenv('DB_POOL_MAX_WAITERS', 50))
+    # Una conexión ociosa más de estos segundos se comprueba (ping) antes de entregarla
+    POOL_VALIDATE_IDLE = float(os.getenv('DB_POOL_VALIDATE_IDLE', 2))
+
     @staticmethod
     def get_connection():
-        """Obtener conexión a la base de datos MySQL"""
+        """Obtener una conexión del pool; close() la devuelve al pool"""
         try:
-            connection = mysql.connector.connect(**DatabaseConfig.DB_CONFIG)
-            if connection.is_connected():
-                return connection
+            return pool.acquire()
         except Error as e:
             print(f"Error conectando a MySQL: {e}")
             return None
@@ -85,11 +138,19 @@ class DatabaseConfig:
                     password VARCHAR(255) NOT NULL,
                     email VARCHAR(100) UNIQUE,
                     role_id INT,
+                    perm_version INT NOT NULL DEFAULT 0,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     FOREIGN KEY (role_id) REFERENCES roles(id)
                 )
             """)
             
+            # Versión de permisos: sube al cambiar el rol y deja sin validez los tokens ya emitidos
+            add_column(cursor, 'users', 'perm_version', 'INT NOT NULL DEFAULT 0')
+            create_trigger(cursor, 'trg_users_perm_version', """
+                BEFORE UPDATE ON users FOR EACH ROW
+                SET NEW.perm_version = IF(NEW.role_id <=> OLD.role_id, NEW.perm_version, OLD.perm_version + 1)
+            """)
+            
             # Crear tabla de relación roles-permisos
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS roles_permisos (
@@ -101,6 +162,21 @@ class DatabaseConfig:
                 )
             """)
             
+            # Versión de la matriz de permisos: la suben los triggers y el servicio recarga la matriz al verla cambiar
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS rbac_version (
+                    id TINYINT PRIMARY KEY,
+                    version BIGINT NOT NULL DEFAULT 0
+                )
+            """)
+            cursor.execute("INSERT IGNORE INTO rbac_version (id, version) VALUES (1, 0)")
+            for table, event in (('roles_permisos', 'INSERT'), ('roles_permisos', 'UPDATE'), ('roles_permisos', 'DELETE'),
+                                 ('permisos', 'UPDATE'), ('permisos', 'DELETE')):
+                create_trigger(cursor, f'trg_{table}_{event.lower()}_rbac', f"""
+                    AFTER {event} ON {table} FOR EACH ROW
+                    UPDATE rbac_version SET version = version + 1 WHERE id = 1
+                """)
+            
             # Crear tabla de TASKS
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS tasks (
@@ -114,15 +190,64 @@ class DatabaseConfig:
                     created_by INT NOT NULL,
                     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                     FOREIGN KEY (created_by) REFERENCES users(id)
-                )
+                ) DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
             """)
             
             # Crear índices para optimización
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_created_by ON tasks(created_by)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_deadline ON tasks(deadline)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_is_alive ON tasks(is_alive)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)")
+            # Índices de la paginación por cursor: filtros de igualdad y después created_at (InnoDB añade id)
+            create_index(cursor, 'tasks', 'idx_tasks_alive_created', 'is_alive, created_at')
+            create_index(cursor, 'tasks', 'idx_tasks_owner_alive_created', 'created_by, is_alive, created_at')
+            create_index(cursor, 'tasks', 'idx_tasks_alive_status_created', 'is_alive, status, created_at')
+            create_index(cursor, 'tasks', 'idx_tasks_owner_alive_status_created', 'created_by, is_alive, status, created_at')
+            # Tareas vencidas y próximas (/tasks/overdue, /tasks/upcoming) y ventanas del scheduler de deadlines.py
+            create_index(cursor, 'tasks', 'idx_tasks_alive_deadline', 'is_alive, deadline')
+            create_index(cursor, 'tasks', 'idx_tasks_owner_alive_deadline', 'created_by, is_alive, deadline')
+            # Tareas cambiadas en cualquier réplica, que el scheduler de deadlines.py relee periódicamente
+            create_index(cursor, 'tasks', 'idx_tasks_updated', 'updated_at')
+            # Búsqueda de texto (/tasks/search); InnoDB lo mantiene al crear, editar y eliminar tareas
+            create_index(cursor, 'tasks', 'ft_tasks_name_description', 'name, description', 'FULLTEXT')
+            # Índices de una columna que ya cubren los compuestos (o el UNIQUE de users): solo encarecían las escrituras
+            for index in ('idx_tasks_status', 'idx_tasks_created_by', 'idx_tasks_is_alive', 'idx_tasks_deadline'):
+                drop_index(cursor, 'tasks', index)
+            for index in ('idx_users_username', 'idx_users_email'):
+                drop_index(cursor, 'users', index)
+            
+            # Contadores de /info (ver counters.py): varias filas (shard) por contador
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS stat_counters (
+                    name VARCHAR(100) NOT NULL,
+                    shard TINYINT UNSIGNED NOT NULL,
+                    value BIGINT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (name, shard)
+                )
+            """)
+            
+            # Hasta dónde se han emitido los eventos de deadline (deadlines.py): al arrancar, el scheduler
+            # emite los de las tareas que vencieron desde entonces mientras ninguna réplica los emitía
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS deadline_watermark (
+                    id TINYINT PRIMARY KEY,
+                    fired_until DATETIME NOT NULL
+                )
+            """)
+            
+            # Refresh tokens: solo el HMAC del secreto; los de una misma sesión comparten family_id
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS refresh_tokens (
+                    id BINARY(16) PRIMARY KEY,
+                    family_id BINARY(16) NOT NULL,
+                    user_id INT NOT NULL,
+                    secret_hash BINARY(32) NOT NULL,
+                    perm_version INT NOT NULL,
+                    expires_at DATETIME NOT NULL,
+                    session_expires_at DATETIME NOT NULL,
+                    used_at DATETIME NULL,
+                    revoked BOOLEAN NOT NULL DEFAULT FALSE,
+                    INDEX idx_refresh_tokens_family (family_id),
+                    INDEX idx_refresh_tokens_user_expires (user_id, session_expires_at),
+                    FOREIGN KEY (user_id) REFERENCES users(id)
+                )
+            """)
             
             # Insertar datos iniciales
             DatabaseConfig._insert_initial_data(cursor)
@@ -163,6 +288,18 @@ class DatabaseConfig:
         for permiso in permisos:
             cursor.execute("INSERT IGNORE INTO permisos (nombre) VALUES (%s)", (permiso,))
         
+        # Permisos de cada rol, solo la primera vez: después se gestionan en roles_permisos.
+        # Mismo comportamiento que cuando se comprobaba role_id == 1: solo admin ve y gestiona
+        # las tareas de todos; manager, como user, solo las suyas
+        cursor.execute("""
+            INSERT INTO roles_permisos (role_id, permiso_id)
+            SELECT r.id, p.id FROM roles r CROSS JOIN permisos p
+            WHERE (r.nombre = 'admin'
+                   OR (r.nombre IN ('user', 'manager')
+                       AND p.nombre IN ('read_user', 'create_task', 'read_task', 'update_task', 'delete_task')))
+              AND NOT EXISTS (SELECT 1 FROM roles_permisos)
+        """)
+        
         # Crear usuario admin inicial
         admin_password = hash_password('admin123')
         cursor.execute("""
@@ -183,6 +320,202 @@ class DatabaseConfig:
         print("Usuario admin: admin / admin123")
         print("Usuario test: testuser / user123")
 
+class PoolExhausted(PoolError):
+    """No hay conexión libre en el tiempo de espera o la cola de espera está llena"""
+
+
+class PooledConnection:
+    """
+    Conexión prestada por el pool. close() la devuelve al pool en vez de cerrarla; con
+    request_scoped=True close() no hace nada y la devuelve release() al terminar la petición.
+    """
+
+    def __init__(self, pool, connection, request_scoped=False):
+        self._pool = pool
+        self._connection = connection
+        self._request_scoped = request_scoped
+
+    def close(self):
+        if not self._request_scoped:
+            self.release()
+
+    def release(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection)
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise PoolError("La conexión ya se devolvió al pool")
+        return getattr(self._connection, name)
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones MySQL con tamaño mínimo y máximo, comprobación al entregar,
+    vida máxima por conexión y una cola de espera acotada con timeout.
+
+    Las conexiones libres se reutilizan en orden LIFO: la última devuelta es la que
+    menos probabilidades tiene de haber sido cerrada por el servidor.
+    """
+
+    def __init__(self, config, min_size, max_size, max_lifetime, wait_timeout, max_waiters, validate_idle):
+        self.config = config
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.wait_timeout = wait_timeout
+        self.max_waiters = max_waiters
+        self.validate_idle = validate_idle
+
+        self._cond = threading.Condition()
+        # (conexión, creada, devuelta) de las conexiones libres
+        self._idle = deque()
+        # Conexiones abiertas (libres + prestadas) y hueco reservado por las que se están abriendo
+        self._size = 0
+        self._waiting = 0
+        # Momento de creación de cada conexión prestada
+        self._created = {}
+        self.stats = {"acquired": 0, "created": 0, "closed": 0, "expired": 0, "invalid": 0,
+                      "waits": 0, "wait_seconds": 0.0, "timeouts": 0, "rejected": 0}
+
+    def warm(self):
+        """Abrir las conexiones mínimas"""
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                connection = self._connect()
+            except Error:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self.stats["created"] += 1
+                self._idle.append((connection, time.monotonic(), time.monotonic()))
+                self._cond.notify()
+
+    def _connect(self):
+        return mysql.connector.connect(**self.config)
+
+    def _discard(self, connection, reason):
+        """Cerrar una conexión y liberar su hueco (llamar sin el lock)"""
+        try:
+            connection.close()
+        except Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self.stats[reason] += 1
+            self.stats["closed"] += 1
+            self._cond.notify()
+
+    def acquire(self, request_scoped=False):
+        """Conexión libre y válida, una nueva si cabe, o esperar a que se devuelva una"""
+        deadline = None
+        while True:
+            with self._cond:
+                connection = created = idle_since = None
+                while connection is None:
+                    if self._idle:
+                        connection, created, idle_since = self._idle.pop()
+                    elif self._size < self.max_size:
+                        # Reservar el hueco y abrir la conexión fuera del lock
+                        self._size += 1
+                        break
+                    else:
+                        if self._waiting >= self.max_waiters:
+                            self.stats["rejected"] += 1
+                            raise PoolExhausted("Demasiadas peticiones esperando una conexión a la base de datos")
+                        if deadline is None:
+                            deadline = time.monotonic() + self.wait_timeout
+                            self.stats["waits"] += 1
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.stats["timeouts"] += 1
+                            raise PoolExhausted("Tiempo de espera agotado para obtener una conexión a la base de datos")
+                        self._waiting += 1
+                        started = time.monotonic()
+                        try:
+                            self._cond.wait(remaining)
+                        finally:
+                            self._waiting -= 1
+                            self.stats["wait_seconds"] += time.monotonic() - started
+
+            if connection is None:
+                try:
+                    connection = self._connect()
+                except Error:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                created = time.monotonic()
+            else:
+                now = time.monotonic()
+                if now - created >= self.max_lifetime:
+                    self._discard(connection, "expired")
+                    continue
+                # is_connected() hace un ping al servidor
+                if now - idle_since >= self.validate_idle and not connection.is_connected():
+                    self._discard(connection, "invalid")
+                    continue
+
+            with self._cond:
+                if idle_since is None:
+                    self.stats["created"] += 1
+                self._created[id(connection)] = created
+                self.stats["acquired"] += 1
+            return PooledConnection(self, connection, request_scoped)
+
+    def release(self, connection):
+        """Devolver la conexión: se deshace lo no confirmado y se cierra si caducó o falló"""
+        with self._cond:
+            created = self._created.pop(id(connection), time.monotonic())
+        try:
+            # Sin transacción abierta la siguiente petición ve datos actuales (REPEATABLE READ)
+            if connection.unread_result:
+                connection.consume_results()
+            if connection.in_transaction:
+                connection.rollback()
+        except Error:
+            self._discard(connection, "invalid")
+            return
+        if time.monotonic() - created >= self.max_lifetime:
+            self._discard(connection, "expired")
+            return
+        with self._cond:
+            self._idle.append((connection, created, time.monotonic()))
+            self._cond.notify()
+
+    def snapshot(self):
+        with self._cond:
+            return dict(
+                self.stats,
+                wait_seconds=round(self.stats["wait_seconds"], 6),
+                size=self._size,
+                idle=len(self._idle),
+                in_use=self._size - len(self._idle),
+                waiting=self._waiting,
+                min_size=self.min_size,
+                max_size=self.max_size
+            )
+
+
+# Pool compartido por app.py y este módulo
+pool = ConnectionPool(
+    DatabaseConfig.DB_CONFIG,
+    min_size=DatabaseConfig.POOL_MIN_SIZE,
+    max_size=DatabaseConfig.POOL_MAX_SIZE,
+    max_lifetime=DatabaseConfig.POOL_MAX_LIFETIME,
+    wait_timeout=DatabaseConfig.POOL_WAIT_TIMEOUT,
+    max_waiters=DatabaseConfig.POOL_MAX_WAITERS,
+    validate_idle=DatabaseConfig.POOL_VALIDATE_IDLE
+)
+
 # Función auxiliar para usar en app.py
 def get_db_connection():
     """Función auxiliar para obtener conexión - compatible con código existente"""
@@ -0,0 +1,373 @@
+# task_service/deadlines.py
+# Avisos de vencimiento de tareas: un heap con los próximos deadlines, sin recorrer la tabla
+import heapq
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from mysql.connector import Error
+
+# Ventana de deadlines que se carga de una vez desde idx_tasks_alive_deadline (horas)
+DEADLINE_HORIZON_HOURS = float(os.getenv('DEADLINE_HORIZON_HOURS', 24))
+# Tareas como máximo por carga: si hay más, la ventana termina en la última cargada
+DEADLINE_LOAD_LIMIT = int(os.getenv('DEADLINE_LOAD_LIMIT', 50000))
+# Fichero con un evento JSON por línea (vacío para no escribirlo)
+DEADLINE_EVENTS_FILE = os.getenv('DEADLINE_EVENTS_FILE', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'logs', 'deadline_events.log'))
+
+# Con varias réplicas solo emite eventos la que tiene este bloqueo de MySQL (GET_LOCK)
+DEADLINE_LOCK_NAME = 'task_service.deadline_scheduler'
+# Cada cuánto se comprueba el bloqueo, o se intenta tomar si lo tiene otra réplica (segundos)
+DEADLINE_LEADER_CHECK = float(os.getenv('DEADLINE_LEADER_CHECK', 30))
+# Cada cuánto la réplica que emite relee las tareas cambiadas (en cualquier réplica) desde la
+# última lectura (segundos), y margen hacia atrás para las transacciones que confirman tarde
+DEADLINE_SYNC_INTERVAL = float(os.getenv('DEADLINE_SYNC_INTERVAL', 5))
+DEADLINE_SYNC_OVERLAP = timedelta(seconds=float(os.getenv('DEADLINE_SYNC_OVERLAP', 10)))
+
+# Tareas que ya no vencen aunque tengan deadline
+CLOSED_STATUSES = ('Completed',)
+
+
+class DeadlineScheduler:
+    """
+    Emite un evento 'task.deadline_reached' cuando una tarea viva y no completada llega a su
+    deadline. Los deadlines de la ventana actual (hasta HORIZON horas) están en un heap; al
+    agotarse la ventana se carga la siguiente con un recorrido de rango del índice. Entre
+    cargas, los handlers de escritura avisan con update()/cancel() tras confirmar el cambio, y
+    cada SYNC_INTERVAL se releen las tareas cambiadas desde otras réplicas (idx_tasks_updated).
+
+    Los eventos van a la cola events (para consumidores del proceso, se descartan si nadie
+    la vacía) y, como JSON por línea, a DEADLINE_EVENTS_FILE. Tras emitirlos se guarda en
+    deadline_watermark hasta qué momento están emitidos; la primera ventana empieza ahí, así
+    que los deadlines que vencieron con el servicio parado se emiten al arrancar.
+
+    Con connect (una conexión propia, fuera del pool) solo emite el proceso que tiene el
+    bloqueo GET_LOCK(DEADLINE_LOCK_NAME); el resto de réplicas esperan por si se cae.
+    """
+
+    def __init__(self, get_connection, connect=None, horizon_hours=DEADLINE_HORIZON_HOURS,
+                 load_limit=DEADLINE_LOAD_LIMIT, events_file=DEADLINE_EVENTS_FILE, max_events=10000,
+                 leader_check=DEADLINE_LEADER_CHECK, sync_interval=DEADLINE_SYNC_INTERVAL):
+        self.get_connection = get_connection
+        self.connect = connect
+        self.leader_check = leader_check
+        self.sync_interval = sync_interval
+        # Conexión que mantiene el bloqueo mientras este proceso es el que emite
+        self._lock_connection = None
+        self.horizon = timedelta(hours=horizon_hours)
+        self.load_limit = load_limit
+        self.events_file = events_file
+        self.events = queue.Queue(maxsize=max_events)
+        # Heap de (deadline, task_id); las entradas que ya no coinciden con _scheduled se ignoran
+        self._heap = []
+        self._scheduled = {}
+        # Hasta dónde está cargado el heap: (deadline, id) de la última tarea de la ventana
+        self._loaded_until = None
+        # Cambios avisados mientras se lee una ventana: ganan a lo leído, que puede ser anterior
+        self._loading = None
+        # Los deadlines hasta aquí ya se emitieron (o se descartaron); se guarda en deadline_watermark
+        self._fired_until = None
+        # Hora de MySQL de la última lectura de tareas cambiadas (updated_at usa el reloj de MySQL)
+        self._synced_at = None
+        self._sync_due = 0.0
+        self._cond = threading.Condition()
+        self._thread = None
+        self.loads = 0
+        self.syncs = 0
+        self.fired = 0
+        self.dropped = 0
+        self.last_error = None
+
+    def _load_next_window(self):
+        """Cargar los deadlines posteriores a _loaded_until, hasta HORIZON más allá"""
+        now = datetime.now()
+        start = self._loaded_until or (self._fired_until, 0)
+        end = max(start[0], now) + self.horizon
+        with self._cond:
+            self._loading = {}
+        connection = self.get_connection()
+        if not connection:
+            raise Error(msg="Sin conexión a la base de datos")
+        cursor = connection.cursor()
+        try:
+            cursor.execute(f"""
+                SELECT deadline, id FROM tasks
+                WHERE is_alive = TRUE AND deadline <= %s AND (deadline > %s OR (deadline = %s AND id > %s))
+                  AND status NOT IN ({', '.join(['%s'] * len(CLOSED_STATUSES))})
+                ORDER BY deadline, id
+                LIMIT %s
+            """, (end, start[0], start[0], start[1], *CLOSED_STATUSES, self.load_limit))
+            rows = cursor.fetchall()
+        except Error:
+            with self._cond:
+                self._loading = None
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
+        with self._cond:
+            changed, self._loading = self._loading, None
+            for deadline, task_id in rows:
+                if task_id not in changed:
+                    self._scheduled[task_id] = deadline
+                    heapq.heappush(self._heap, (deadline, task_id))
+            # Ventana incompleta (LIMIT): la siguiente carga sigue desde la última tarea
+            self._loaded_until = tuple(rows[-1]) if len(rows) >= self.load_limit else (end, 0)
+            for task_id, (deadline, status) in changed.items():
+                self._schedule(task_id, deadline, status)
+            self.loads += 1
+            self._cond.notify()
+
+    def update(self, task_id, deadline, status):
+        """La tarea cambió (o se creó) con este deadline y status"""
+        with self._cond:
+            if self._loading is not None:
+                self._loading[task_id] = (deadline, status)
+            self._schedule(task_id, deadline, status)
+
+    def cancel(self, task_id):
+        """La tarea se eliminó: no se avisa de su deadline"""
+        self.update(task_id, None, None)
+
+    def _schedule(self, task_id, deadline, status):
+        # Con self._cond adquirido. Un deadline ya pasado pero posterior a _fired_until (p. ej.
+        # cambiado en otra réplica justo antes de vencer) aún no se ha emitido: vence ya
+        if deadline is None or status in CLOSED_STATUSES or (self._fired_until is not None
+                                                             and deadline <= self._fired_until):
+            self._scheduled.pop(task_id, None)
+            return
+        if self._loaded_until is None or (deadline, task_id) > self._loaded_until:
+            # Fuera de la ventana (o ventana sin cargar): ya se cargará con la siguiente
+            self._scheduled.pop(task_id, None)
+            return
+        if self._scheduled.get(task_id) == deadline:
+            return
+        self._scheduled[task_id] = deadline
+        heapq.heappush(self._heap, (deadline, task_id))
+        if self._heap[0] == (deadline, task_id):
+            # Vence antes que la que estaba esperando el hilo
+            self._cond.notify()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='deadline-scheduler', daemon=True)
+            self._thread.start()
+
+    def _lead(self):
+        """¿Emite este proceso los eventos? Toma el bloqueo si está libre y comprueba que sigue vivo"""
+        if self.connect is None:
+            return True
+        if self._lock_connection is not None:
+            try:
+                self._lock_connection.ping()
+                return True
+            except Error:
+                # MySQL suelta el bloqueo al caerse su conexión: otra réplica puede tenerlo ya
+                self._lock_connection = None
+                with self._cond:
+                    self._heap, self._scheduled, self._loaded_until = [], {}, None
+                    self._fired_until = None
+        connection = self.connect()
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT GET_LOCK(%s, 0)", (DEADLINE_LOCK_NAME,))
+            acquired = cursor.fetchone()[0] == 1
+            cursor.close()
+        except Error:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        self._lock_connection = connection
+        return True
+
+    def _resume(self):
+        """
+        Al empezar a emitir: continuar desde deadline_watermark (la primera vez, desde ahora).
+        Las tareas abiertas que vencieron después se cargan con la primera ventana y vencen ya.
+        """
+        connection = self.get_connection()
+        if not connection:
+            raise Error(msg="Sin conexión a la base de datos")
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT NOW()")
+            synced_at = cursor.fetchone()[0]
+            cursor.execute("INSERT IGNORE INTO deadline_watermark (id, fired_until) VALUES (1, NOW())")
+            cursor.execute("SELECT fired_until FROM deadline_watermark WHERE id = 1")
+            fired_until = cursor.fetchone()[0]
+            connection.commit()
+        finally:
+            cursor.close()
+            connection.close()
+        with self._cond:
+            self._fired_until = fired_until
+            # Lo cambiado antes de este momento ya lo refleja la primera ventana
+            self._synced_at = synced_at
+            self._sync_due = time.monotonic() + self.sync_interval
+
+    def _sync_changes(self):
+        """Reprogramar las tareas cambiadas desde la última lectura, en este proceso o en otro"""
+        connection = self.get_connection()
+        if not connection:
+            raise Error(msg="Sin conexión a la base de datos")
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT NOW()")
+            synced_at = cursor.fetchone()[0]
+            cursor.execute("SELECT id, deadline, status, is_alive FROM tasks WHERE updated_at >= %s",
+                           (self._synced_at - DEADLINE_SYNC_OVERLAP,))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+            connection.close()
+        with self._cond:
+            for task_id, deadline, status, is_alive in rows:
+                if is_alive:
+                    self._schedule(task_id, deadline, status)
+                else:
+                    self._scheduled.pop(task_id, None)
+            self._synced_at = synced_at
+        self._sync_due = time.monotonic() + self.sync_interval
+        self.syncs += 1
+
+    def _save_watermark(self, fired_until):
+        """Guardar hasta dónde están emitidos los eventos (todos los deadlines <= fired_until)"""
+        connection = self.get_connection()
+        if not connection:
+            raise Error(msg="Sin conexión a la base de datos")
+        cursor = connection.cursor()
+        try:
+            cursor.execute("UPDATE deadline_watermark SET fired_until = GREATEST(fired_until, %s) WHERE id = 1",
+                           (fired_until,))
+            connection.commit()
+        finally:
+            cursor.close()
+            connection.close()
+
+    def _run(self):
+        while True:
+            try:
+                if not self._lead():
+                    # Otra réplica emite los eventos (y relee los cambios de esta)
+                    time.sleep(self.leader_check)
+                    continue
+                if self._fired_until is None:
+                    self._resume()
+                elif time.monotonic() >= self._sync_due:
+                    self._sync_changes()
+                if self._loaded_until is None or self._loaded_until[0] <= datetime.now():
+                    self._load_next_window()
+                due, fired_until = self._wait_due()
+                self._fire(due)
+                self._save_watermark(fired_until)
+                self.last_error = None
+            except Error as e:
+                self.last_error = str(e)
+                print(f"Error en el scheduler de deadlines: {e}")
+                time.sleep(5)
+
+    def _wait_due(self):
+        """
+        Esperar hasta el siguiente deadline (o el final de la ventana, o como mucho hasta la
+        siguiente lectura de cambios, que también comprueba el bloqueo) y devolver
+        (vencidos, momento hasta el que quedan emitidos)
+        """
+        check_at = min(time.monotonic() + self.leader_check, self._sync_due)
+        with self._cond:
+            while True:
+                now = datetime.now()
+                # Entradas obsoletas: la tarea cambió de deadline, se completó o se eliminó
+                while self._heap and self._scheduled.get(self._heap[0][1]) != self._heap[0][0]:
+                    heapq.heappop(self._heap)
+                due = []
+                while self._heap and self._heap[0][0] <= now:
+                    deadline, task_id = heapq.heappop(self._heap)
+                    if self._scheduled.get(task_id) == deadline:
+                        del self._scheduled[task_id]
+                        due.append((task_id, deadline))
+                wake_at = self._loaded_until[0]
+                if self._heap:
+                    wake_at = min(wake_at, self._heap[0][0])
+                remaining = check_at - time.monotonic()
+                if due or wake_at <= now or remaining <= 0:
+                    # Los deadlines hasta now ya salieron del heap: update() no los vuelve a programar
+                    fired_until = min(now, self._loaded_until[0])
+                    self._fired_until = max(self._fired_until, fired_until)
+                    return due, fired_until
+                self._cond.wait(timeout=min((wake_at - now).total_seconds(), remaining))
+
+    def _fire(self, due):
+        """Emitir los eventos de las tareas vencidas que siguen abiertas en la base de datos"""
+        if not due:
+            return
+        deadlines = dict(due)
+        try:
+            connection = self.get_connection()
+            if not connection:
+                raise Error(msg="Sin conexión a la base de datos")
+            cursor = connection.cursor(dictionary=True)
+            try:
+                # Por clave primaria: descarta lo cambiado fuera de este proceso desde que se cargó
+                cursor.execute(f"""
+                    SELECT id, name, created_by, deadline, status FROM tasks
+                    WHERE id IN ({', '.join(['%s'] * len(deadlines))}) AND is_alive = TRUE
+                """, list(deadlines))
+                tasks = cursor.fetchall()
+            finally:
+                cursor.close()
+                connection.close()
+        except Error:
+            # Vuelven al heap (ya vencidas) y se reintentan en la siguiente vuelta de _run,
+            # salvo las que update() haya reprogramado mientras tanto
+            with self._cond:
+                for task_id, deadline in due:
+                    if task_id not in self._scheduled:
+                        self._scheduled[task_id] = deadline
+                        heapq.heappush(self._heap, (deadline, task_id))
+            raise
+
+        fired_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        events = [{
+            "event": "task.deadline_reached",
+            "task_id": task['id'],
+            "name": task['name'],
+            "created_by": task['created_by'],
+            "status": task['status'],
+            "deadline": task['deadline'].strftime('%Y-%m-%d %H:%M:%S'),
+            "fired_at": fired_at
+        } for task in tasks if task['deadline'] == deadlines[task['id']] and task['status'] not in CLOSED_STATUSES]
+
+        for event in events:
+            try:
+                self.events.put_nowait(event)
+            except queue.Full:
+                self.dropped += 1
+        if events and self.events_file:
+            try:
+                with open(self.events_file, 'a', encoding='utf-8') as f:
+                    f.write(''.join(json.dumps(event, ensure_ascii=False) + '\n' for event in events))
+            except OSError as e:
+                print(f"Error escribiendo eventos de deadline: {e}")
+        self.fired += len(events)
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                "leader": self.connect is None or self._lock_connection is not None,
+                "scheduled": len(self._scheduled),
+                "next_deadline": self._heap[0][0].strftime('%Y-%m-%d %H:%M:%S') if self._heap else None,
+                "loaded_until": self._loaded_until[0].strftime('%Y-%m-%d %H:%M:%S') if self._loaded_until else None,
+                "fired_until": self._fired_until.strftime('%Y-%m-%d %H:%M:%S') if self._fired_until else None,
+                "loads": self.loads,
+                "syncs": self.syncs,
+                "fired": self.fired,
+                "queued_events": self.events.qsize(),
+                "dropped_events": self.dropped,
+                "last_error": self.last_error
+            }
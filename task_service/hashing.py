@@ -0,0 +1,16 @@
+# task_service/hashing.py
+# Funciones que ejecutan los procesos de bcrypt (ver auth.PasswordHasher). Este módulo solo
+# importa bcrypt: los procesos lo cargan a él y nunca el servicio ni sus dependencias
+import bcrypt
+
+
+def hashpw(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def checkpw(password, hashed_password):
+    return bcrypt.checkpw(password, hashed_password)
+
+
+def ready():
+    return True
@@ -0,0 +1,129 @@
+# task_service/permissions.py
+# Permisos por rol (tablas roles_permisos y permisos) compilados en memoria
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import jsonify
+
+# Cada cuánto se comprueba rbac_version para recargar la matriz si cambió (segundos)
+RBAC_POLL_INTERVAL = float(os.getenv('RBAC_POLL_INTERVAL', 5))
+
+
+class PermissionMatrix:
+    """
+    Matriz rol -> permisos como un entero por rol: el bit N es el permiso de id N. Comprobar
+    un permiso es un AND en memoria, sin consultas. La matriz se sustituye entera al recargar
+    (cuando cambia rbac_version, que suben los triggers de roles_permisos y permisos, o desde
+    POST /admin/permissions/reload).
+    """
+
+    def __init__(self, poll_interval=RBAC_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        # () -> (versión, {nombre: id}, [(role_id, permiso_id), ...]); lo asigna app.py
+        self.loader = None
+        # () -> versión actual de rbac_version; lo asigna app.py
+        self.version_loader = None
+        # (versión, {nombre: bit}, {role_id: máscara}): se reemplaza de una vez, nunca se modifica
+        self._state = None
+        self._lock = threading.Lock()
+        self._first_load = threading.Lock()
+        self._thread = None
+        self.reloads = 0
+        self.loaded_at = None
+        self.last_error = None
+
+    def reload(self):
+        """Cargar la matriz completa; devuelve su versión"""
+        with self._lock:
+            version, permission_ids, grants = self.loader()
+            bits = {name: 1 << permission_id for name, permission_id in permission_ids.items()}
+            roles = {}
+            for role_id, permission_id in grants:
+                roles[role_id] = roles.get(role_id, 0) | (1 << permission_id)
+            self._state = (version, bits, roles)
+            self.reloads += 1
+            self.loaded_at = time.time()
+        return version
+
+    @property
+    def loaded(self):
+        return self._state is not None
+
+    def ensure_loaded(self):
+        """Cargar la matriz en esta llamada si aún no está cargada; devuelve si lo está"""
+        if self._state is None:
+            with self._first_load:
+                if self._state is None:
+                    try:
+                        self.reload()
+                    except Exception as e:
+                        self.last_error = str(e)
+                        print(f"Error cargando permisos: {e}")
+        return self._state is not None
+
+    def allowed(self, role_id, name):
+        """¿El rol tiene el permiso? Un permiso desconocido (o la matriz sin cargar) no se concede"""
+        state = self._state
+        if state is None:
+            return False
+        bit = state[1].get(name)
+        return bit is not None and state[2].get(role_id, 0) & bit != 0
+
+    def start(self):
+        """Comprobar rbac_version en segundo plano y recargar cuando cambie"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='rbac-poller', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                state = self._state
+                if state is None or self.version_loader() != state[0]:
+                    self.reload()
+                self.last_error = None
+            except Exception as e:
+                # Se sigue usando la última matriz cargada
+                self.last_error = str(e)
+                print(f"Error recargando permisos: {e}")
+
+    def snapshot(self):
+        state = self._state
+        return {
+            "version": state[0] if state else None,
+            "permissions": len(state[1]) if state else 0,
+            "roles": {role_id: sorted(name for name, bit in state[1].items() if mask & bit)
+                      for role_id, mask in state[2].items()} if state else {},
+            "reloads": self.reloads,
+            "loaded_at": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.loaded_at)) if self.loaded_at else None,
+            "poll_interval_seconds": self.poll_interval,
+            "last_error": self.last_error
+        }
+
+
+permissions = PermissionMatrix()
+
+
+def requires_permission(name):
+    """
+    Decorador (debajo de token_required) que exige un permiso al rol del usuario:
+
+        @token_required
+        @requires_permission('read_all_tasks')
+        def handler(user): ...
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(user, *args, **kwargs):
+            # El servicio carga la matriz antes de atender peticiones; si aun así falta, se carga
+            # aquí y solo se responde 503 si la base de datos no contesta
+            if not permissions.ensure_loaded():
+                return jsonify({"error": "Permisos no disponibles, inténtelo de nuevo en unos segundos"}), 503
+            if not permissions.allowed(user.role_id, name):
+                return jsonify({"error": f"No tienes el permiso '{name}'"}), 403
+            return f(user, *args, **kwargs)
+        return decorated
+    return decorator
@@ -0,0 +1,148 @@
+# task_service/tests/conftest.py
+# Las pruebas del servicio importan sus módulos como lo hace app.py (auth, counters...), así que
+# se ejecutan aparte de las del gateway: cd task_service && python -m pytest tests
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime
+
+import pytest
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(SERVICE_DIR))
+sys.path.insert(0, SERVICE_DIR)
+
+# Sin trazas en fichero durante las pruebas, y una clave de JWT de la longitud recomendada
+os.environ.setdefault('TRACE_SAMPLE_RATE', '0')
+os.environ.setdefault('TRACE_FILE', '')
+os.environ.setdefault('SECRET_KEY', 'clave_de_pruebas_del_task_service_0123')
+
+# Tablas de init_db que usan las pruebas, con los tipos equivalentes de SQLite
+SCHEMA = """
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY,
+        username TEXT NOT NULL UNIQUE,
+        role_id INTEGER NOT NULL,
+        perm_version INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE tasks (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        description TEXT,
+        created_at DATETIME NOT NULL,
+        deadline DATETIME,
+        status TEXT NOT NULL DEFAULT 'In Progress',
+        is_alive BOOLEAN NOT NULL DEFAULT TRUE,
+        created_by INTEGER NOT NULL,
+        updated_at DATETIME
+    );
+    CREATE TABLE refresh_tokens (
+        id BLOB PRIMARY KEY,
+        family_id BLOB NOT NULL,
+        user_id INTEGER NOT NULL,
+        secret_hash BLOB NOT NULL,
+        perm_version INTEGER NOT NULL,
+        expires_at DATETIME NOT NULL,
+        session_expires_at DATETIME NOT NULL,
+        used_at DATETIME NULL,
+        revoked BOOLEAN NOT NULL DEFAULT FALSE
+    );
+    CREATE TABLE permisos (id INTEGER PRIMARY KEY, nombre TEXT NOT NULL);
+    CREATE TABLE roles_permisos (role_id INTEGER NOT NULL, permiso_id INTEGER NOT NULL);
+    CREATE TABLE rbac_version (id INTEGER PRIMARY KEY, version INTEGER NOT NULL);
+    INSERT INTO rbac_version VALUES (1, 1);
+    -- Roles de init_db: 1 admin, 2 user
+    INSERT INTO permisos VALUES (14, 'read_task'), (17, 'read_all_tasks');
+    INSERT INTO roles_permisos VALUES (1, 14), (1, 17), (2, 14);
+    INSERT INTO users (id, username, role_id) VALUES (1, 'admin', 1), (2, 'ana', 2), (3, 'luis', 2);
+"""
+
+sqlite3.register_adapter(datetime, lambda value: value.strftime('%Y-%m-%d %H:%M:%S.%f'))
+sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode('ascii')))
+
+
+class FakeCursor:
+    """Cursor de mysql.connector sobre SQLite: placeholders %s, filas como dict y sin FOR UPDATE"""
+
+    def __init__(self, connection, dictionary=False):
+        self._cursor = connection.cursor()
+        self.dictionary = dictionary
+
+    @staticmethod
+    def _sql(query):
+        return re.sub(r'\bFOR UPDATE\b', '', query).replace('%s', '?')
+
+    def execute(self, query, params=()):
+        self._cursor.execute(self._sql(query), tuple(params))
+
+    def executemany(self, query, rows):
+        self._cursor.executemany(self._sql(query), rows)
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def _row(self, row):
+        if row is None or not self.dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class FakeConnection:
+    """Conexión del pool sobre una base de datos SQLite en memoria compartida por la prueba"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self, dictionary=False, buffered=None):
+        return FakeCursor(self.db, dictionary)
+
+    def commit(self):
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+    def close(self):
+        # La devolvería al pool: la base de datos en memoria sigue abierta
+        pass
+
+
+@pytest.fixture
+def db():
+    connection = sqlite3.connect(':memory:', detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+    connection.executescript(SCHEMA)
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def service(db, monkeypatch):
+    """Módulo app con la base de datos de la prueba y las cachés de permisos vacías"""
+    import app as service
+    from auth import perm_versions
+    from permissions import permissions
+
+    monkeypatch.setattr(service, 'get_db_connection', lambda: FakeConnection(db))
+    monkeypatch.setattr(permissions, '_state', None)
+    monkeypatch.setattr(perm_versions, '_versions', {})
+    return service
+
+
+@pytest.fixture
+def auth_headers(service):
+    """Cabeceras con un token válido del usuario de la tabla users"""
+    def headers(user_id, username, role_id):
+        with service.app.app_context():
+            return {'Authorization': f'Bearer {service.generate_token(username, user_id, role_id)}'}
+    return headers
@@ -0,0 +1,43 @@
+# task_service/tests/test_counters.py
+import counters
+
+
+def test_task_deltas_counts_user_and_global():
+    deltas = counters.task_deltas([
+        (2, 'In Progress', -1),
+        (2, 'Completed', +1),
+        (3, 'In Progress', +1)
+    ])
+    assert dict(deltas) == {
+        'tasks:2:In Progress': -1,
+        'tasks:*:In Progress': 0,
+        'tasks:2:Completed': 1,
+        'tasks:*:Completed': 1,
+        'tasks:3:In Progress': 1
+    }
+
+
+def test_task_deltas_accumulates_repeated_changes():
+    deltas = counters.task_deltas([(2, 'Paused', +1)] * 3 + [(2, 'Paused', -1)])
+    assert deltas['tasks:2:Paused'] == 2
+    assert deltas['tasks:*:Paused'] == 2
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.rows = []
+
+    def executemany(self, query, rows):
+        self.rows.extend(rows)
+
+
+def test_add_skips_zero_deltas():
+    cursor = RecordingCursor()
+    counters.add(cursor, counters.task_deltas([(2, 'Paused', +1), (3, 'Paused', -1)]))
+    # El global se compensa: solo se escriben los dos contadores de usuario
+    assert sorted((name, value) for name, _, value in cursor.rows) == [('tasks:2:Paused', 1), ('tasks:3:Paused', -1)]
+    assert all(0 <= shard < counters.SHARDS for _, shard, _ in cursor.rows)
+    # Sin cambios no se escribe nada
+    cursor = RecordingCursor()
+    counters.add(cursor, counters.task_deltas([]))
+    assert cursor.rows == []
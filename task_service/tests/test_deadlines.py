@@ -0,0 +1,138 @@
+# task_service/tests/test_deadlines.py
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import deadlines
+from app import parse_within
+from conftest import FakeConnection
+
+
+@pytest.mark.parametrize('value, within', [
+    ('30m', timedelta(minutes=30)),
+    ('24h', timedelta(hours=24)),
+    (' 7D ', timedelta(days=7)),
+    ('90d', timedelta(days=90))
+])
+def test_parse_within(value, within):
+    assert parse_within(value) == within
+
+
+@pytest.mark.parametrize('value', ['', '0h', '24', 'h', '1.5h', '-1d', '2w', '91d'])
+def test_parse_within_invalid(value):
+    with pytest.raises(ValueError):
+        parse_within(value)
+
+
+NOW = datetime.now().replace(microsecond=0)
+
+
+def add_task(db, task_id, deadline, status='In Progress', is_alive=True):
+    db.execute('INSERT INTO tasks (id, name, created_at, deadline, status, is_alive, created_by) '
+               'VALUES (?, ?, ?, ?, ?, ?, 2)', (task_id, f'Tarea {task_id}', NOW, deadline, status, is_alive))
+    db.commit()
+
+
+@pytest.fixture
+def scheduler(db, tmp_path):
+    """Scheduler que ya emitió los deadlines de hasta hace una hora (como tras _resume)"""
+    scheduler = deadlines.DeadlineScheduler(lambda: FakeConnection(db), horizon_hours=1, load_limit=100,
+                                            events_file=str(tmp_path / 'events.log'))
+    scheduler._fired_until = NOW - timedelta(hours=1)
+    return scheduler
+
+
+def fire_due(scheduler):
+    due, fired_until = scheduler._wait_due()
+    scheduler._fire(due)
+    return sorted(task_id for task_id, _ in due), fired_until
+
+
+def test_missed_deadlines_fire_on_first_window(db, scheduler, tmp_path):
+    add_task(db, 1, NOW - timedelta(minutes=30))
+    add_task(db, 2, NOW - timedelta(hours=2))
+    add_task(db, 3, NOW + timedelta(minutes=30))
+    add_task(db, 4, NOW + timedelta(hours=2))
+    add_task(db, 5, NOW - timedelta(minutes=10), status='Completed')
+    add_task(db, 6, NOW - timedelta(minutes=10), is_alive=False)
+
+    scheduler._load_next_window()
+    # La 2 ya se emitió antes de la marca; la 4 queda para la siguiente ventana
+    assert sorted(scheduler._scheduled) == [1, 3]
+
+    due, fired_until = fire_due(scheduler)
+    assert due == [1]
+    assert fired_until >= NOW and scheduler._fired_until == fired_until
+    event = scheduler.events.get_nowait()
+    assert (event['event'], event['task_id']) == ('task.deadline_reached', 1)
+    with open(tmp_path / 'events.log', encoding='utf-8') as f:
+        assert [json.loads(line)['task_id'] for line in f] == [1]
+    assert scheduler.snapshot()['scheduled'] == 1
+
+
+def test_window_continues_after_load_limit(db, scheduler):
+    scheduler.load_limit = 2
+    for task_id in (1, 2, 3):
+        add_task(db, task_id, NOW + timedelta(minutes=10))
+    scheduler._load_next_window()
+    assert sorted(scheduler._scheduled) == [1, 2]
+    assert scheduler._loaded_until == (NOW + timedelta(minutes=10), 2)
+    scheduler._load_next_window()
+    assert sorted(scheduler._scheduled) == [1, 2, 3]
+    assert scheduler.loads == 2
+
+
+def test_update_and_cancel(db, scheduler):
+    add_task(db, 1, NOW + timedelta(minutes=20))
+    scheduler._load_next_window()
+
+    scheduler.update(2, NOW + timedelta(minutes=5), 'In Progress')
+    scheduler.update(3, NOW + timedelta(hours=3), 'In Progress')
+    scheduler.update(4, NOW + timedelta(minutes=5), 'Completed')
+    assert sorted(scheduler._scheduled) == [1, 2]
+
+    # Cambio de deadline: la entrada anterior del heap queda obsoleta
+    scheduler.update(1, NOW + timedelta(minutes=40), 'In Progress')
+    scheduler.cancel(2)
+    assert scheduler._scheduled == {1: NOW + timedelta(minutes=40)}
+    # Un deadline que ya se emitió no se vuelve a programar
+    scheduler.update(5, scheduler._fired_until, 'In Progress')
+    assert 5 not in scheduler._scheduled
+
+    # Las entradas obsoletas se descartan al esperar, sin emitir nada
+    due, _ = fire_due(scheduler)
+    assert due == []
+    assert scheduler.snapshot()['next_deadline'] == (NOW + timedelta(minutes=40)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def test_fire_skips_tasks_changed_in_database(db, scheduler):
+    add_task(db, 1, NOW - timedelta(minutes=5))
+    add_task(db, 2, NOW - timedelta(minutes=5))
+    scheduler._load_next_window()
+    # Cambiada desde otra réplica después de cargar la ventana
+    db.execute('UPDATE tasks SET status = ? WHERE id = 2', ('Completed',))
+    db.commit()
+
+    due, _ = fire_due(scheduler)
+    assert due == [1, 2]
+    assert scheduler.fired == 1
+    assert scheduler.events.get_nowait()['task_id'] == 1
+    assert scheduler.events.empty()
+
+
+def test_update_wakes_the_waiting_thread(db, scheduler):
+    scheduler._load_next_window()
+    scheduler._sync_due = time.monotonic() + 10
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(scheduler._wait_due()))
+    waiter.start()
+    time.sleep(0.05)
+    assert waiter.is_alive()
+
+    scheduler.update(7, datetime.now() + timedelta(milliseconds=100), 'In Progress')
+    waiter.join(5)
+    assert not waiter.is_alive()
+    assert [task_id for task_id, _ in result[0][0]] == [7]
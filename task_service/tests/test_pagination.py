@@ -0,0 +1,73 @@
+# task_service/tests/test_pagination.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import decode_cursor, encode_cursor
+
+START = datetime(2024, 5, 1, 9, 0, 0)
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor({'created_at': START, 'id': 42})
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (START, 42)
+
+
+@pytest.mark.parametrize('value', ['', 'no-es-base64!', 'bnVsbA', 'WyJheWVyIiwgMV0', 'WzFd'])
+def test_invalid_cursor(value):
+    with pytest.raises(ValueError):
+        decode_cursor(value)
+
+
+@pytest.fixture
+def tasks(db):
+    """Tareas 1..7 de ana (varias con el mismo created_at), una de luis y una eliminada"""
+    rows = [(task_id, f'Tarea {task_id}', START + timedelta(minutes=task_id // 3), 2, True)
+            for task_id in range(1, 8)]
+    rows += [(8, 'De luis', START, 3, True), (9, 'Eliminada', START, 2, False)]
+    db.executemany('INSERT INTO tasks (id, name, created_at, created_by, is_alive) VALUES (?, ?, ?, ?, ?)', rows)
+    db.commit()
+    # De la más reciente a la más antigua; a igual created_at, de mayor a menor id
+    return sorted((row for row in rows if row[3] == 2 and row[4]), key=lambda row: (row[2], row[0]), reverse=True)
+
+
+def test_pages_follow_the_cursor(service, tasks, auth_headers):
+    client = service.app.test_client()
+    headers = auth_headers(2, 'ana', 2)
+    seen = []
+    url = '/tasks?limit=3'
+    while True:
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['limit'] == 3 and data['count'] == len(data['tasks']) <= 3
+        seen += [task['id'] for task in data['tasks']]
+        if data['next'] is None:
+            break
+        url = f"/tasks?limit=3&cursor={data['next']}"
+    # Sin repetir ni saltar tareas aunque compartan created_at, y solo las propias y vivas
+    assert seen == [row[0] for row in tasks]
+
+
+def test_last_full_page_has_no_next(service, tasks, auth_headers):
+    data = service.app.test_client().get('/tasks?limit=7', headers=auth_headers(2, 'ana', 2)).get_json()
+    assert data['count'] == 7 and data['next'] is None
+
+
+def test_without_limit_or_cursor_returns_everything(service, tasks, auth_headers):
+    data = service.app.test_client().get('/tasks', headers=auth_headers(2, 'ana', 2)).get_json()
+    assert [task['id'] for task in data['tasks']] == [row[0] for row in tasks]
+    assert data['count'] == 7
+    assert 'next' not in data and 'limit' not in data
+
+
+def test_read_all_tasks_sees_every_owner(service, tasks, auth_headers):
+    data = service.app.test_client().get('/tasks', headers=auth_headers(1, 'admin', 1)).get_json()
+    assert sorted(task['id'] for task in data['tasks']) == [1, 2, 3, 4, 5, 6, 7, 8]
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=abc', 'cursor=basura'])
+def test_invalid_page_params(service, tasks, auth_headers, query):
+    response = service.app.test_client().get(f'/tasks?{query}', headers=auth_headers(2, 'ana', 2))
+    assert response.status_code == 400
@@ -0,0 +1,92 @@
+# task_service/tests/test_refresh.py
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+
+from conftest import FakeConnection
+
+
+@pytest.fixture
+def login(service, db):
+    """Refresh token de una sesión nueva de ana, como el que devuelve /login"""
+    def issue():
+        connection = FakeConnection(db)
+        cursor = connection.cursor()
+        with service.app.app_context():
+            token = service.issue_refresh_token(cursor, 2, 0)
+        connection.commit()
+        return token
+    return issue
+
+
+def refresh(service, token):
+    return service.app.test_client().post('/refresh', json={'refresh_token': token})
+
+
+def test_refresh_rotates_the_token(service, db, login):
+    first = login()
+    response = refresh(service, first)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['refresh_token'] != first
+    claims = jwt.decode(data['token'], service.app.config['SECRET_KEY'], algorithms=['HS256'])
+    assert (claims['sub'], claims['uid'], claims['role']) == ('ana', 2, 2)
+
+    # El nuevo sigue la misma sesión y el anterior queda marcado como usado
+    rows = db.execute('SELECT family_id, used_at FROM refresh_tokens ORDER BY used_at IS NULL').fetchall()
+    assert len(rows) == 2
+    assert rows[0][0] == rows[1][0]
+    assert rows[0][1] is not None and rows[1][1] is None
+    assert refresh(service, data['refresh_token']).status_code == 200
+
+
+def test_reuse_revokes_the_whole_session(service, db, login):
+    first = login()
+    second = refresh(service, first).get_json()['refresh_token']
+    other_session = login()
+
+    response = refresh(service, first)
+    assert response.status_code == 401
+    assert 'reutilizado' in response.get_json()['error']
+    # El token legítimo de la misma sesión tampoco sirve ya
+    response = refresh(service, second)
+    assert response.status_code == 401
+    assert 'Sesión cerrada' in response.get_json()['error']
+    # Las demás sesiones del usuario siguen activas
+    assert refresh(service, other_session).status_code == 200
+
+
+def test_invalid_tokens(service, login):
+    token = login()
+    token_id, secret = token.split('.')
+    tampered = f"{token_id}.{'A' * len(secret)}"
+    for value in (tampered, 'x.y', 'sin-punto'):
+        assert refresh(service, value).status_code == 401
+    assert service.app.test_client().post('/refresh', json={}).status_code == 400
+    # Un secreto equivocado no consume el token
+    assert refresh(service, token).status_code == 200
+
+
+def test_expired_token(service, db, login):
+    token = login()
+    db.execute('UPDATE refresh_tokens SET expires_at = ?', (datetime.now() - timedelta(seconds=1),))
+    db.commit()
+    response = refresh(service, token)
+    assert response.status_code == 401
+    assert 'expirada' in response.get_json()['error']
+
+
+def test_perm_version_change_invalidates_session(service, db, login):
+    token = login()
+    db.execute('UPDATE users SET perm_version = 1 WHERE id = 2')
+    db.commit()
+    assert refresh(service, token).status_code == 401
+
+
+def test_logout_revokes_session(service, login):
+    token = login()
+    second = refresh(service, token).get_json()['refresh_token']
+    response = service.app.test_client().post('/logout', json={'refresh_token': second})
+    assert response.status_code == 200
+    assert refresh(service, second).status_code == 401
@@ -0,0 +1,25 @@
+# task_service/tests/test_search.py
+import pytest
+
+from app import search_terms
+
+
+@pytest.mark.parametrize('text, terms', [
+    ('informe', '+informe*'),
+    ('Informe Mensual', '+informe* +mensual*'),
+    # Palabras más cortas que TASKS_SEARCH_MIN_WORD no están en el índice
+    ('el informe de ventas', '+informe* +ventas*'),
+    # Los operadores del modo booleano que escriba el cliente se descartan
+    ('-borrador +"informe" (ventas)* ~web <x>', '+borrador* +informe* +ventas* +web*'),
+    ('informe informe INFORME', '+informe*'),
+    ('revisión año', '+revisión* +año*'),
+    ('', ''),
+    ('a b c', '')
+])
+def test_search_terms(text, terms):
+    assert search_terms(text) == terms
+
+
+def test_search_without_terms_is_rejected(service, auth_headers):
+    response = service.app.test_client().get('/tasks/search?q=a', headers=auth_headers(2, 'ana', 2))
+    assert response.status_code == 400
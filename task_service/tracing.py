@@ -0,0 +1,59 @@
+# task_service/tracing.py
+# Trazas del Task Service: las de common/tracing.py más la medición de MySQL y de la serialización JSON
+from flask.json.provider import DefaultJSONProvider
+
+from common.tracing import install, is_sampled, outgoing_headers, span, stats
+
+
+class TracedCursor:
+    """Cursor de MySQL que mide cada execute/executemany como un span"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        with span('db.execute', kind='CLIENT', **{'db.system': 'mysql', 'db.statement': _statement(operation)}):
+            return self._cursor.execute(operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        with span('db.executemany', kind='CLIENT', **{'db.system': 'mysql', 'db.statement': _statement(operation)}):
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class TracedConnection:
+    """Conexión de MySQL cuyos cursores se miden"""
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, *args, **kwargs):
+        return TracedCursor(self._connection.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def _statement(operation):
+    # Solo la plantilla SQL (los valores van aparte en params), recortada
+    return ' '.join(str(operation).split())[:500]
+
+
+def trace_connection(connection):
+    """Envolver la conexión solo si la petición actual se traza: sin muestreo no cuesta nada"""
+    if connection is None or not is_sampled():
+        return connection
+    return TracedConnection(connection)
+
+
+class TracedJSONProvider(DefaultJSONProvider):
+    """Proveedor JSON de Flask que mide la serialización de las respuestas (jsonify)"""
+
+    def response(self, *args, **kwargs):
+        with span('json.serialize'):
+            return super().response(*args, **kwargs)
@@ -1,7 +1,14 @@
+import os
+import sys
+# Módulos compartidos entre el gateway y los servicios (common/, en la raíz del proyecto)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from flask import Flask, jsonify, request
+from common import metrics
 
 # Creamos una instancia de la aplicación Flask
 app = Flask(__name__)
+# Métricas HTTP y ruta GET /metrics
+metrics.install(app)
 
 # Lista en memoria para almacenar usuarios(Simula base ded datos)
 # Cada usuario tiene un id, username y email
@@ -76,6 +83,11 @@ def delete_user(user_id):
     # Devolvemos un mensaje de éxito
     return jsonify({"message": "Usuario eliminado"})
 
-# Iniciamos el servidor en el puerto 5002 en modo debug
+# Ruta para comprobar que el servicio está vivo (la usa el API Gateway)
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({"status": "UP"})
+
+# Iniciamos el servidor en el puerto 5002 (o PORT) en modo debug
 if __name__ == '__main__':
-    app.run(port=5002, debug=True)
\ No newline at end of file
+    app.run(port=int(os.getenv('PORT', 5002)), debug=True)
\ No newline at end of file